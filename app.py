@@ -1,39 +1,28 @@
 import streamlit as st
 import pandas as pd
-from utils import Ch_oi_oi_spurt, most_active_contracts, OI, liquidation_shift, sectorials, sectorial_stock
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from kiteconnect import KiteConnect
-import time
-from tenacity import retry, wait_exponential, stop_after_attempt
-
-# --- Rate Limiter Class ---
-class RateLimiter:
-    def __init__(self, max_calls=3, period=1):
-        self.max_calls = max_calls
-        self.period = timedelta(seconds=period)
-        self.timestamps = []
-
-    def __call__(self):
-        now = datetime.now()
-        self.timestamps = [t for t in self.timestamps if now - t < self.period]
-        if len(self.timestamps) >= self.max_calls:
-            sleep_time = (self.period - (now - self.timestamps[0])).total_seconds()
-            time.sleep(max(sleep_time, 0))
-        self.timestamps.append(now)
-
-rate_limiter = RateLimiter(max_calls=3, period=1)
+# utils modules import only pandas/numpy at load time; Selenium, KiteConnect
+# and the analytics engines load when a page first needs them
+from utils import Ch_oi_oi_spurt, most_active_contracts, OI, liquidation_shift, sectorials, sectorial_stock, \
+    replay, tracing, schema, delivery, rotation, kite_session, oi_tracker, active_history, sector_batch, \
+    ratelimit, kite_chain, alerts, expr, screener, indicators, fetch, dataplane, api_client, config, render, breadth, \
+    quality, chain_ingest
+
+# --- Rate Limiter (shared with every Kite caller in the process) ---
+rate_limiter = ratelimit.kite_limiter
 
 # --- Safe Kite API Wrapper ---
-@retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(3))
-def safe_kite_call(kite, func, *args, **kwargs):
-    rate_limiter()  # Enforce rate limit
-    try:
-        return func(*args, **kwargs)
-    except Exception as e:
-        st.error(f"API Error: {str(e)}")
-        raise
+def safe_kite_call(kite, func, *args, seconds=10, **kwargs):
+    # Circuit breaker per Kite method, retries bounded by `seconds`; pages report the error
+    return fetch.call(f"kite.{getattr(func, '__name__', 'call')}", func, *args, at=fetch.deadline(seconds),
+                      limiter=rate_limiter, **kwargs)
+
+def show_fetch_status(df):
+    status = df.attrs.get("fetch_status")
+    if status is not None and (status["status"] != "ok").any():
+        failed = status[status["status"] != "ok"]
+        st.warning(f"Partial data: {fetch.summarize(status)}")
+        with st.expander("Unavailable instruments"):
+            st.dataframe(failed, use_container_width=True)
 
 # Configuration
 st.set_page_config(
@@ -64,35 +53,144 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- Data API (thin-client mode when TRADE_ANALYST_API is set) ---
+@st.cache_resource(show_spinner=False)
+def cached_api_client():
+    return api_client.from_env()
+
+def remote():
+    # The API server owns the Kite session and fetchers; see utils/api_server.py
+    return cached_api_client()
+
 # --- Updated Cache Decorators with Rate Limiting ---
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_oi_spurts():
+    if remote():
+        return remote().table("oi_spurts")
     return Ch_oi_oi_spurt.get_oi_spurts()
 
+@st.cache_resource(show_spinner=False)
+def cached_oi_tracker():
+    return oi_tracker.OISpurtTracker()
+
 @st.cache_data(ttl=300, show_spinner=False)
-def cached_sectorials():
-    return sectorials.sectorials()
+def cached_sectorials(_kite):
+    if remote():
+        return remote().table("sectorials")
+    return sectorials.sectorials(_kite)
 
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_sector_data(_kite, sector):
-    time.sleep(0.34)  # Rate limiting
-    json_path = r"kite\data\sector_data.json"
+    if remote():
+        return remote().table("sector", sector=sector)
+    replay.sleep(0.34)  # Rate limiting
+    json_path = config.data_path("sector_data.json")
     return sectorial_stock.get_sector_data(_kite, sector, json_path)
 
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_score_cube(_kite):
+    # Every sector scored in one batch; pages slice it with sector_view()
+    if remote():
+        return remote().table("scores")
+    json_path = config.data_path("sector_data.json")
+    return sector_batch.score_all(_kite, json_path)
+
+# Tables published by `python -m utils.dataplane` are mapped, not copied, per session
+PLANE_MAX_AGE = 300
+
+def score_cube(kite):
+    cube = dataplane.read("scores", max_age=PLANE_MAX_AGE)
+    return cube if cube is not None else cached_score_cube(kite)
+
 @st.cache_data(ttl=300, show_spinner=False)
 def cached_active_contracts():
+    if remote():
+        return remote().table("most_active")
     return most_active_contracts.most_active_eq()
 
+@st.cache_resource(show_spinner=False)
+def cached_active_history():
+    return active_history.ActiveHistory()
+
+@st.cache_resource(ttl=300, show_spinner=False)
+def cached_option_payload(index):
+    # One NSE fetch per refresh; the full and the pruned parse both read it (never mutated)
+    return chain_ingest.fetch_payload(index)
+
 @st.cache_data(ttl=300, show_spinner=False)
-def cached_option_data(index):
-    return OI.get_data(index)
+def cached_option_data(index, strike_window=None, nearest=None, min_volume=0):
+    if remote():
+        return remote().table("option_chain", symbol=index, source="nse", strike_window=strike_window,
+                              nearest=nearest, min_volume=min_volume)
+    return chain_ingest.parse(cached_option_payload(index), strike_window, nearest=nearest, min_volume=min_volume,
+                              name=f"option_chain_{index}")
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_kite_chain(_kite, index):
+    # Quotes are batched (<=500 per call), so a refresh costs a couple of API calls
+    if remote():
+        return remote().table("option_chain", symbol=index, source="kite")
+    return kite_chain.build_chain(_kite, index)
+
+@st.cache_resource(show_spinner=False)
+def cached_alert_engine():
+    # One engine per server: rule state (edges, debounce) survives reruns
+    return alerts.AlertEngine(alerts.load_rules(), [alerts.MemorySink(), alerts.FileSink()])
+
+def feed_alerts(source, df):
+    try:
+        cached_alert_engine().update(source, df)
+    except Exception as e:
+        print(f"Alert evaluation failed for {source}: {e}")
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_indicator_scan():
+    if remote():
+        return remote().table("indicators")
+    return indicators.load_bundled().scan()
+
+@st.cache_resource(show_spinner=False)
+def cached_breadth_engine():
+    # Shared by every session: the intraday series grows once per quote refresh
+    return breadth.BreadthEngine.from_files()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def cached_fo_quotes(_kite):
+    if remote():
+        return remote().table("fo_quotes")
+    return sector_batch.get_quotes(_kite, cached_breadth_engine().stocks())
+
+def market_breadth(kite):
+    # Records the cached quotes (no-op until they refresh), or reads what a running poller appended
+    return cached_breadth_engine().sync(lambda: cached_fo_quotes(kite))
+
+@st.cache_resource(show_spinner=False)
+def cached_screener():
+    return screener.Screener.load()
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def cached_rotation_engine():
+    return rotation.load_bundled()
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_delivery_metrics():
+    if remote():
+        return remote().table("delivery")
+    return delivery.load()
 
 # --- Helper Functions ---
+@st.cache_resource(show_spinner=False)
 def gen_ses():
-    key = open(r"kite\data\api.txt","r").read().split()
-    kite = KiteConnect(api_key=key[0])
-    kite.set_access_token(key[2])
-    return kite
+    # Built once per server process, not on every rerun
+    if remote():
+        return api_client.RemoteKite(remote())
+    return kite_session.gen_ses()
+
+def show_table(df, formats=None, signed=(), na_rep=None, **kwargs):
+    """st.dataframe with vectorized sign colors; large tables are formatted by the browser"""
+    data, number_formats = render.table(df, formats, signed, na_rep)
+    column_config = {c: st.column_config.NumberColumn(format=f) for c, f in number_formats.items()}
+    st.dataframe(data, column_config=column_config or None, **kwargs)
 
 def display_metric(label, value, delta=None):
     st.metric(label=label, value=value, delta=delta)
@@ -109,48 +207,174 @@ def main():
     st.title("📈 Trade Analyst")
     
     if 'last_refresh' not in st.session_state:
-        st.session_state.last_refresh = datetime.now()
+        st.session_state.last_refresh = replay.now()
     
     with st.sidebar:
         st.header("Navigation")
-        menu = st.radio("Select Feature", [
+        features = [
             "Indices", "Overview", "Option Apex", 
-            "Intraday Boost", "Market Pulse", "Market Overview"
-        ])
+            "Intraday Boost", "Market Pulse", "Market Overview",
+            "Delivery Analytics", "Screener"
+        ]
+        # Hidden page, opened with ?diagnostics=1
+        if st.query_params.get("diagnostics") == "1":
+            features.append("Diagnostics")
+        menu = st.radio("Select Feature", features)
         
         if st.button('🔄 Refresh Data', use_container_width=True):
-            st.session_state.last_refresh = datetime.now()
+            st.session_state.last_refresh = replay.now()
             st.rerun()
         
         st.caption(f"Last refreshed: {st.session_state.last_refresh.strftime('%Y-%m-%d %H:%M:%S')}")
+        if replay.is_enabled():
+            st.caption(f"⏪ Replay mode - simulated time {replay.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    if menu == "Intraday Boost":
-        show_intraday_boost()
-    elif menu == "Overview":
-        show_overview(kite)
-    elif menu == "Indices":
-        show_indices(kite)
-    elif menu == "Market Pulse":
-        show_market_pulse(kite)
-    elif menu == "Market Overview":
-        show_market_overview(kite)  # Fixed: Removed underscore
-    elif menu == "Option Apex":
-        show_option_apex()
+    with tracing.span(f"page.{menu}"):
+        if menu == "Intraday Boost":
+            show_intraday_boost()
+            show_most_active()
+        elif menu == "Overview":
+            show_overview(kite)
+        elif menu == "Indices":
+            show_indices(kite)
+        elif menu == "Market Pulse":
+            show_market_pulse(kite)
+        elif menu == "Market Overview":
+            show_market_overview(kite)  # Fixed: Removed underscore
+        elif menu == "Option Apex":
+            show_option_apex(kite)
+        elif menu == "Delivery Analytics":
+            show_delivery_analytics()
+        elif menu == "Screener":
+            show_screener(kite)
+    if menu == "Diagnostics":
+        show_diagnostics()
+    show_alerts()
+
+def show_alerts():
+    memory = cached_alert_engine().sinks[0]
+    recent = memory.recent(10)
+    with st.sidebar.expander(f"🔔 Alerts ({len(memory.alerts)})", expanded=bool(recent)):
+        if not recent:
+            st.caption("No alerts yet")
+        for alert in recent:
+            st.markdown(f"**{alert['rule']}** · {alert['time'][11:19]}  \n{alert['message']}")
 
 # Page functions
 def show_intraday_boost():
+    import plotly.express as px
     st.subheader("🔥 OI Spurts in Derivatives")
     with st.spinner("Loading OI spurts data..."):
         try:
             df = cached_oi_spurts()
-            st.dataframe(df.style.format({
-                '% Change': '{:.2f}%',
-                'LTP': '₹{:.2f}'
-            }))
+            tracker = cached_oi_tracker()
+            # Records the cached snapshot (no-op until it refreshes), or re-reads the store a poller owns
+            tracker.sync(df)
+            feed_alerts("oi_spurts", df)
+            summary = tracker.summary()
         except Exception as e:
             st.error(f"Failed to load OI spurts: {str(e)}")
+            return
+
+    if summary.empty:
+        st.warning("No OI spurts data available")
+        return
+
+    snapshots = tracker.history()["time"].nunique()
+    cols = st.columns(len(oi_tracker.BUILDUPS) + 1)
+    cols[0].metric("Snapshots today", snapshots)
+    for col, label in zip(cols[1:], oi_tracker.BUILDUPS):
+        col.metric(label, int((summary["session_buildup"] == label).sum()))
+
+    tab1, tab2, tab3 = st.tabs(["Buildup", "Session Trends", "Latest Snapshot"])
+
+    with tab1:
+        buildup = st.multiselect("Session buildup", oi_tracker.BUILDUPS, default=oi_tracker.BUILDUPS)
+        view = summary[summary["session_buildup"].isin(buildup)] if snapshots > 1 else summary
+        show_table(view, {
+            'cmp': '₹{:.2f}',
+            'volume': '{:,}',
+            'changeInOI': '{:,}',
+            'session_price_%': '{:.2f}%',
+            'session_oi': '{:,.0f}'
+        }, use_container_width=True)
+
+    with tab2:
+        if snapshots < 2:
+            st.info("Trends appear once a second snapshot has been recorded (every 5 minutes)")
+        else:
+            top = summary["session_oi"].abs().nlargest(10).index
+            default = summary.loc[top, "symbol"].tolist()
+            symbols = st.multiselect("Symbols", summary["symbol"].tolist(), default=default)
+            value = st.radio("Series", ["changeInOI", "cmp", "volume"], horizontal=True)
+            trend = render.downsample(tracker.trend(value, symbols))
+
+            def build(trend):
+                fig = px.line(trend, x=trend.index, y=trend.columns, markers=True,
+                              labels={"value": value, "time": "Time", "symbol": "Symbol"})
+                fig.update_layout(plot_bgcolor="#0E1117", paper_bgcolor="#0E1117", font=dict(color="white"))
+                return fig
+            st.plotly_chart(render.figure(f"oi_trend_{value}", trend, build), use_container_width=True)
+
+    with tab3:
+        show_table(df, {
+            'cmp': '₹{:.2f}',
+            'volume': '{:,}',
+            'changeInOI': '{:,}',
+            '%changeInOI': '{:.2f}'
+        }, use_container_width=True)
+
+def show_most_active():
+    st.subheader("💰 Most Active by Value")
+    with st.spinner("Loading most active securities..."):
+        try:
+            history = cached_active_history()
+            scored = history.sync(cached_active_contracts())
+            if scored is None:
+                scored = history.latest()
+            feed_alerts("most_active", scored)
+        except Exception as e:
+            st.error(f"Failed to load most active securities: {str(e)}")
+            return
+
+    if scored is None or scored.empty:
+        st.warning("No most active data available")
+        return
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        z_threshold = st.slider("Turnover z-score", 1.0, 4.0, active_history.Z_THRESHOLD, 0.5)
+        min_days = st.slider("Min. baseline days", 1, active_history.WINDOW, active_history.MIN_DAYS)
+        st.caption(f"Baseline: same {active_history.SLOT_MINUTES}-minute slot over the last "
+                   f"{active_history.WINDOW} sessions ({len(history.slots['day'].unique())} stored)")
+    with col2:
+        anomalies = history.anomalies(scored, z_threshold, min_days)
+        if anomalies.empty:
+            st.info("No turnover anomalies at this time of day")
+        else:
+            st.markdown("**🚨 Turnover anomalies**")
+            show_table(anomalies[["symbol", "lastPrice", "%Change", "totalTradedValue",
+                                  "totalTradedValue_x", "totalTradedValue_z", "volume_z", "baseline_days"]], {
+                'lastPrice': '₹{:.2f}',
+                '%Change': '{:.2f}%',
+                'totalTradedValue': '{:,.0f}',
+                'totalTradedValue_x': '{:.1f}x',
+                'totalTradedValue_z': '{:.2f}',
+                'volume_z': '{:.2f}'
+            }, use_container_width=True)
+
+    show_table(scored[["symbol", "lastPrice", "%Change", "volume", "totalTradedValue",
+                       "totalTradedValue_z", "volume_z"]], {
+        'lastPrice': '₹{:.2f}',
+        '%Change': '{:.2f}%',
+        'volume': '{:,}',
+        'totalTradedValue': '{:,.0f}',
+        'totalTradedValue_z': '{:.2f}',
+        'volume_z': '{:.2f}'
+    }, na_rep="-", use_container_width=True)
 
 def show_overview(kite):
+    import plotly.express as px
     st.subheader("📊 Nifty 50 Overview")
     
     with st.spinner("Loading Nifty 50 data..."):
@@ -158,14 +382,19 @@ def show_overview(kite):
             # Rate limited API call
             rate_limiter()
             df = cached_sector_data(kite, "NIFTY 50")
+            show_fetch_status(df)
             
             if df.empty:
                 st.warning("No data available for NIFTY 50")
                 return
             
             # --- Real-time Index Data ---
-            nifty_quote = safe_kite_call(kite, kite.quote, ["NSE:NIFTY 50"])
-            nifty_data = nifty_quote["NSE:NIFTY 50"]
+            # The index quote failing should not blank the stock table
+            try:
+                nifty_data = safe_kite_call(kite, kite.quote, ["NSE:NIFTY 50"])["NSE:NIFTY 50"]
+            except Exception as e:
+                st.warning(f"NIFTY 50 quote unavailable: {str(e)}")
+                nifty_data = {'last_price': float('nan'), 'ohlc': {'open': 0}}
             
             # Calculate percentage change safely
             nifty_change_pct = 0.0
@@ -190,6 +419,18 @@ def show_overview(kite):
                 display_metric("Advance/Decline", 
                              f"{len(df[df['% Change'] > 0])}:{len(df[df['% Change'] < 0])}")
             
+            # --- F&O universe breadth ---
+            try:
+                fo = market_breadth(kite).snapshot().loc[breadth.SCOPE]
+                cols = st.columns(4)
+                cols[0].metric("F&O Advance/Decline", f"{fo['advancing']:.0f}:{fo['declining']:.0f}",
+                               f"{fo['net_advances']:+.0f}")
+                cols[1].metric("Above VWAP", f"{fo['pct_above_vwap']:.0f}%" if not pd.isna(fo['pct_above_vwap']) else "-")
+                cols[2].metric("New Highs/Lows", f"{fo['new_highs']:.0f}/{fo['new_lows']:.0f}")
+                cols[3].metric("Up/Down Volume", f"{fo['up_down_volume']:.2f}" if not pd.isna(fo['up_down_volume']) else "-")
+            except Exception as e:
+                st.warning(f"F&O breadth unavailable: {str(e)}")
+            
             # --- Enhanced Data Display ---
             tab1, tab2 = st.tabs(["Detailed View", "Performance Analysis"])
             
@@ -209,15 +450,13 @@ def show_overview(kite):
                 # Ensure we have columns before trying to display
                 required_columns = ["Symbol", "Last Price", "% Change", "Volume", "Prev Close"]
                 if all(col in df.columns for col in required_columns):
-                    st.dataframe(
-                        filtered_df.sort_values("% Change", ascending=False)[required_columns]
-                        .style.format({
+                    show_table(
+                        filtered_df.sort_values("% Change", ascending=False)[required_columns], {
                             'Last Price': '₹{:.2f}',
                             '% Change': '{:.2f}%',
                             'Prev Close': '₹{:.2f}',
                             'Volume': '{:,}'
-                        }).applymap(lambda x: 'color: green' if isinstance(x, (int, float)) and x > 0 else 'color: red', 
-                                  subset=['% Change']),
+                        }, signed=['% Change'],
                         height=600,
                         use_container_width=True
                     )
@@ -227,21 +466,26 @@ def show_overview(kite):
             with tab2:
                 # Only plot if we have data
                 if not df.empty and '% Change' in df.columns and 'Volume' in df.columns:
-                    fig = px.scatter(
-                        df,
-                        x="% Change",
-                        y="Volume",
-                        color="% Change",
-                        color_continuous_scale=["red", "white", "green"],
-                        hover_name="Symbol",
-                        size="Volume",
-                        title="Stock Performance Distribution"
-                    )
-                    fig.update_layout(
-                        plot_bgcolor="#0E1117",
-                        paper_bgcolor="#0E1117",
-                        font=dict(color="white")
-                    )
+                    def build(points):
+                        fig = px.scatter(
+                            points,
+                            x="% Change",
+                            y="Volume",
+                            color="% Change",
+                            color_continuous_scale=["red", "white", "green"],
+                            hover_name="Symbol",
+                            size="Volume",
+                            title="Stock Performance Distribution"
+                        )
+                        fig.update_layout(
+                            plot_bgcolor="#0E1117",
+                            paper_bgcolor="#0E1117",
+                            font=dict(color="white")
+                        )
+                        return fig
+                    # Biggest movers only when the universe outgrows a readable scatter
+                    points = render.thin(df, render.MAX_POINTS, by="% Change")
+                    fig = render.figure("overview_scatter", points, build, columns=["Symbol", "% Change", "Volume"])
                     st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.warning("Insufficient data for visualization")
@@ -265,11 +509,14 @@ def show_market_pulse(kite):  # Removed underscore prefix for consistency
     with col1:
         selected_sector = st.selectbox("Select Sector Index", sector_indices)
         
-        with st.spinner(f"Loading {selected_sector} data..."):
+        with st.spinner("Scoring all sectors..."):
             try:
                 # Rate limited API call
                 rate_limiter()
-                df = cached_sector_data(kite, selected_sector)
+                cube = score_cube(kite)
+                show_fetch_status(cube)
+                feed_alerts("sector_scores", cube.reset_index().drop_duplicates("Symbol"))
+                df = sector_batch.sector_view(cube, selected_sector)
                 
                 if df.empty:
                     st.warning(f"No data available for {selected_sector}")
@@ -289,19 +536,38 @@ def show_market_pulse(kite):  # Removed underscore prefix for consistency
                 filtered_df = df[(df["% Change"] >= min_change) & 
                                (df["% Change"] <= max_change)]
                 
-                st.dataframe(
-                    filtered_df.style.format({
+                condition = st.text_input("Filter expression", placeholder="`R-Score` > 60 and Volume > 100000",
+                                          key=f"expr_{selected_sector}")
+                if condition:
+                    try:
+                        filtered_df = filtered_df[expr.compile_expr(condition)(filtered_df)]
+                    except expr.ExpressionError as e:
+                        st.warning(str(e))
+                
+                show_table(
+                    filtered_df, {
                         '% Change': '{:.2f}%',
                         'Last Price': '₹{:.2f}',
                         'Prev Close': '₹{:.2f}',
                         'R-Score' : '{:.2f}',
                         'Volume': '{:,}'
-                    }).applymap(lambda x: 'color: green' if x > 0 else 'color: red', 
-                              subset=['% Change']),
+                    }, signed=['% Change'],
                     height=600,
                     use_container_width=True
                 )
                 
+                with st.expander("All sectors"):
+                    summary = cube.groupby(level="Sector", observed=True).agg(
+                        Stocks=("R-Score", "size"),
+                        Avg_R_Score=("R-Score", "mean"),
+                        Avg_Change=("% Change", "mean"),
+                        Advancing=("% Change", lambda x: int((x > 0).sum())),
+                    ).sort_values("Avg_R_Score", ascending=False)
+                    show_table(summary, {
+                        'Avg_R_Score': '{:.2f}',
+                        'Avg_Change': '{:.2f}%'
+                    }, use_container_width=True)
+                
             except Exception as e:
                 st.error(f"Failed to load sector data: {str(e)}")
     
@@ -311,7 +577,7 @@ def show_market_pulse(kite):  # Removed underscore prefix for consistency
         
         try:
             # Get sector index performance
-            sector_perf = cached_sectorials()
+            sector_perf = cached_sectorials(kite)
             if not sector_perf.empty:
                 # Safely get current sector performance with error handling
                 current_sector_perf = sector_perf[sector_perf["Index"] == selected_sector]
@@ -377,47 +643,53 @@ def show_market_pulse(kite):  # Removed underscore prefix for consistency
             st.warning(f"Couldn't load sector stats: {str(e)}")
 
 def show_indices(_kite):  # Note the underscore prefix
+    import plotly.express as px
     st.subheader("💥 All Sectorial Index Data")
     with st.spinner("Loading sectorial data..."):
         try:
             kite =_kite
-            df = cached_sectorials()
+            df = cached_sectorials(_kite)
             if df.empty:
                 st.warning("No sectorial data available")
                 return
+            show_fetch_status(df)
             
-            st.dataframe(df.style.format({
+            show_table(df, {
                 '% Change': '{:.2f}%',
                 'LTP': '{:.2f}',
                 'net_change': '{:.2f}',
-            }))
+            })
 
             if "% Change" in df.columns:
                 df_sort = df.sort_values(by="% Change", ascending=False)
 
-                fig = px.bar(
-                    df_sort,
-                    x="Index",
-                    y="% Change",
-                    color="% Change",
-                    color_continuous_scale=[(0.0, "red"), (0.5, "lightblue"), (1.0, "blue")],
-                    title="📊 Sectorial Performance",
-                )
+                def build(df_sort):
+                    fig = px.bar(
+                        df_sort,
+                        x="Index",
+                        y="% Change",
+                        color="% Change",
+                        color_continuous_scale=[(0.0, "red"), (0.5, "lightblue"), (1.0, "blue")],
+                        title="📊 Sectorial Performance",
+                    )
 
-                fig.update_layout(
-                    plot_bgcolor="#0E1117",
-                    paper_bgcolor="#0E1117",
-                    font=dict(color="#FFFFFF"),
-                    xaxis=dict(title="Index", tickangle=-45),
-                    yaxis=dict(title="% Change"),
-                )
+                    fig.update_layout(
+                        plot_bgcolor="#0E1117",
+                        paper_bgcolor="#0E1117",
+                        font=dict(color="#FFFFFF"),
+                        xaxis=dict(title="Index", tickangle=-45),
+                        yaxis=dict(title="% Change"),
+                    )
+                    return fig
 
+                fig = render.figure("sectorial_bar", df_sort, build, columns=["Index", "% Change"])
                 st.plotly_chart(fig, use_container_width=True)
         except Exception as e:
             st.error(f"Failed to load sectorial data: {str(e)}")
 
 def show_market_overview(kite):
     """Real-time market overview with rate-limited API calls"""
+    import plotly.express as px
     st.subheader("🌐 Live Market Overview")
     
     try:
@@ -454,7 +726,7 @@ def show_market_overview(kite):
                      f"{vix_change:.2f}%", delta_color="inverse")
         
         # Market Breadth (using cached sectorials)
-        df_sectors = cached_sectorials()
+        df_sectors = cached_sectorials(kite)
         advancing = len(df_sectors[df_sectors["% Change"] > 0])
         declining = len(df_sectors[df_sectors["% Change"] < 0])
         
@@ -466,6 +738,19 @@ def show_market_overview(kite):
         with breadth_cols[1]:
             st.metric("Declining Sectors", declining, 
                      f"{declining/len(df_sectors)*100:.1f}%")
+        # Stock-level breadth over the whole F&O universe; the page still loads without it
+        try:
+            engine = market_breadth(kite)
+            fo = engine.snapshot().loc[breadth.SCOPE]
+            with breadth_cols[2]:
+                st.metric("F&O Advancing", f"{fo['advancing']:.0f}/{fo['stocks']:.0f}",
+                         f"{fo['pct_advancing']:.1f}%" if not pd.isna(fo['pct_advancing']) else None)
+            with breadth_cols[3]:
+                st.metric("F&O Above VWAP", f"{fo['above_vwap']:.0f}/{fo['with_vwap']:.0f}",
+                         f"{fo['pct_above_vwap']:.1f}%" if not pd.isna(fo['pct_above_vwap']) else None)
+            show_breadth(engine)
+        except Exception as e:
+            st.warning(f"F&O breadth unavailable: {str(e)}")
         
         # Top 3 Sectors
         top_sectors = df_sectors.nlargest(3, "% Change")
@@ -483,28 +768,110 @@ def show_market_overview(kite):
         
         # Visualize sector performance
         st.markdown("### 📈 Sector Performance Heatmap")
-        fig = px.imshow(
-            df_sectors.set_index("Index")[["% Change"]].T,
+        fig = render.figure("sector_heatmap", df_sectors, lambda sectors: px.imshow(
+            sectors.set_index("Index")[["% Change"]].T,
             color_continuous_scale="RdYlGn",
             aspect="auto"
-        )
+        ), columns=["Index", "% Change"])
         st.plotly_chart(fig, use_container_width=True)
+
+        show_rotation_map()
         
     except Exception as e:
         st.error(f"Failed to load market overview: {str(e)}")
 
 
-def show_option_apex():
+def show_breadth(engine):
+    import plotly.express as px
+    with st.expander("📶 F&O Breadth by Sector", expanded=False):
+        show_table(engine.snapshot().drop(columns=["with_vwap"]), {
+            'advancing': '{:.0f}', 'declining': '{:.0f}', 'unchanged': '{:.0f}', 'new_highs': '{:.0f}',
+            'new_lows': '{:.0f}', 'above_vwap': '{:.0f}', 'up_volume': '{:,.0f}', 'down_volume': '{:,.0f}',
+            'stocks': '{:.0f}', 'net_advances': '{:+.0f}', 'ad_ratio': '{:.2f}', 'pct_advancing': '{:.1f}%',
+            'pct_above_vwap': '{:.1f}%', 'up_down_volume': '{:.2f}'
+        }, signed=['net_advances'], na_rep="-", use_container_width=True)
+
+        series = engine.series()
+        if len(series) < 2:
+            st.info("The intraday breadth chart appears after the second quote refresh")
+            return
+        metric = st.radio("Breadth series", ["pct_advancing", "pct_above_vwap", "net_advances", "up_down_volume"],
+                          horizontal=True)
+        by_sector = render.downsample(engine.sector_series(metric))
+
+        def build(by_sector):
+            fig = px.line(by_sector, x=by_sector.index, y=by_sector.columns,
+                          labels={"value": metric, "time": "Time", "variable": "Scope"})
+            fig.update_layout(plot_bgcolor="#0E1117", paper_bgcolor="#0E1117", font=dict(color="white"))
+            return fig
+        st.plotly_chart(render.figure(f"breadth_{metric}", by_sector, build), use_container_width=True)
+
+def show_rotation_map():
+    import plotly.express as px
+    st.markdown("### 🔄 Sector Rotation vs NIFTY 50")
+    engine = cached_rotation_engine()
+    interval = st.radio("Interval", ["1d", "30"], horizontal=True,
+                        format_func=lambda x: "Daily" if x == "1d" else "30-min")
+    table = engine.rotation(interval)
+
+    def build(table):
+        fig = px.scatter(
+            table, x="RS-Ratio", y="RS-Momentum", color="Quadrant", text="Sector",
+            color_discrete_map={"Leading": "green", "Weakening": "orange", "Lagging": "red", "Improving": "blue"},
+            title="Relative Rotation Map"
+        )
+        fig.add_hline(y=100, line_dash="dot", line_color="grey")
+        fig.add_vline(x=100, line_dash="dot", line_color="grey")
+        fig.update_traces(textposition="top center")
+        fig.update_layout(plot_bgcolor="#0E1117", paper_bgcolor="#0E1117", font=dict(color="white"))
+        return fig
+    st.plotly_chart(render.figure(f"rotation_{interval}", table, build), use_container_width=True)
+
+    col1, col2 = st.columns([2, 3])
+    with col1:
+        show_table(table, {
+            'RS-Ratio': '{:.2f}', 'RS-Momentum': '{:.2f}', 'Return %': '{:.2f}%', 'Rank': '{:.0f}'
+        }, use_container_width=True)
+    with col2:
+        fig = render.figure(f"correlation_{interval}", engine.correlation(interval).round(2),
+                            lambda corr: px.imshow(corr, color_continuous_scale="RdBu", zmin=-1, zmax=1,
+                                                   aspect="auto", title="Rolling Sector Correlation"))
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def show_option_apex(kite):
     st.subheader("📊 NIFTY Option Chain Overview")
+    sources = ["NSE", "Kite"]
+    if dataplane.current("option_chain_NIFTY"):
+        sources.insert(0, "Shared feed")
+    source = st.radio("Data source", sources, horizontal=True,
+                      help="Shared feed maps the chain published by the data-plane producer; NSE scrapes the "
+                           "option-chain page; Kite builds the nearest strikes of two expiries from batched quotes")
     
     with st.spinner("Loading option chain data..."):
         try:
-            df_oi = cached_option_data("NIFTY")
+            df_oi = dataplane.read("option_chain_NIFTY", max_age=PLANE_MAX_AGE) if source == "Shared feed" else None
+            if df_oi is not None:
+                st.caption(f"Shared feed as of {df_oi.attrs['plane']['as_of'][11:19]}")
+            elif source == "Shared feed":
+                st.warning("Shared feed is stale - falling back to NSE")
+                source = "NSE"
+            elif source == "Kite":
+                df_oi = cached_kite_chain(kite, "NIFTY")
+                if df_oi.empty:
+                    # No NFO options in the instrument master (replay, failed refresh) or no quotes
+                    st.warning("Kite chain unavailable - falling back to NSE")
+                    source = "NSE"
+            if source == "NSE":
+                df_oi = cached_option_data("NIFTY")
             if df_oi.empty:
                 st.warning("No data available for NIFTY options")
                 return
                 
-            results = OI.analyze_option_chain(df_oi)
+            feed_alerts("option_summary", alerts.option_summary("NIFTY", df_oi))
+            # analyze_option_chain keeps the near-ATM strikes with volume itself (and writes to its
+            # input); the PCR summary and liquidation zones read the full chain
+            results = OI.analyze_option_chain(df_oi.copy())
             
             # Create tabs for better organization
             tab1, tab2, tab3, tab4 = st.tabs(["Overview", "OI Analysis", "IV Analysis", "Signals"])
@@ -550,11 +917,11 @@ def show_option_apex():
                 pe_combined = pd.concat([pe_latest, pe_overall]).drop_duplicates()
                 pe_combined["expiryDate"] = pd.to_datetime(pe_combined["expiryDate"]).dt.strftime("%d-%b-%Y")
                 
-                st.dataframe(
-                    pe_combined.style.format({
+                show_table(
+                    pe_combined, {
                         "PE_OI_Change_%": "{:.2f}%",
                         "PE.openInterest": "{:,}"
-                    })
+                    }
                 )
                 
                 st.markdown("#### 🔽 Top CE OI Changes")
@@ -564,11 +931,11 @@ def show_option_apex():
                 ce_combined = pd.concat([ce_latest, ce_overall]).drop_duplicates()
                 ce_combined["expiryDate"] = pd.to_datetime(ce_combined["expiryDate"]).dt.strftime("%d-%b-%Y")
                 
-                st.dataframe(
-                    ce_combined.style.format({
+                show_table(
+                    ce_combined, {
                         "CE_OI_Change_%": "{:.2f}%",
                         "CE.openInterest": "{:,}"
-                    })
+                    }
                 )
             
             with tab3:
@@ -579,15 +946,16 @@ def show_option_apex():
                 iv_combined = pd.concat([iv_latest, iv_overall]).drop_duplicates()
                 iv_combined["expiryDate"] = pd.to_datetime(iv_combined["expiryDate"]).dt.strftime("%d-%b-%Y")
                 
-                st.dataframe(
-                    iv_combined.style.format({
+                show_table(
+                    iv_combined, {
                         "IV_Skew": "{:.2f}"
-                    })
+                    }
                 )
             
             with tab4:
                 st.markdown("#### 💡 Option Signals")
                 signal_df = liquidation_shift.get_liquidation_zones(df_oi).dropna(subset=['action'])
+                feed_alerts("liquidation", signal_df)
                 
                 ce_signals = signal_df[signal_df['type'] == 'CE']
                 pe_signals = signal_df[signal_df['type'] == 'PE']
@@ -595,28 +963,176 @@ def show_option_apex():
                 
                 if not ce_signals.empty:
                     with st.expander("🔴 CE Zone Signals (Resistance)", expanded=True):
-                        st.dataframe(ce_signals.style.format({
+                        show_table(ce_signals, {
                             'Change_in_OI': '{:.2f}%',
                             'strike': '{:.0f}'
-                        }))
+                        })
                 
                 if not pe_signals.empty:
                     with st.expander("🟢 PE Zone Signals (Support)", expanded=True):
-                        st.dataframe(pe_signals.style.format({
+                        show_table(pe_signals, {
                             'Change_in_OI': '{:.2f}%',
                             'strike': '{:.0f}'
-                        }))
+                        })
                 
                 if not conflict_signals.empty:
                     with st.expander("⚠️ Conflict Zones (Potential Reversals)", expanded=True):
-                        st.dataframe(conflict_signals.style.format({
+                        show_table(conflict_signals, {
                             'strike': '{:.0f}'
-                        }))
+                        })
                 else:
                     st.info("No conflict zones detected")
         
         except Exception as e:
             st.error(f"Failed to analyze option chain: {str(e)}")
 
+def show_screener(kite):
+    st.subheader("🔎 Screener")
+    with st.spinner("Building screening universe..."):
+        try:
+            universe = screener.build_universe(score_cube(kite), cached_indicator_scan(),
+                                               cached_oi_spurts())
+        except Exception as e:
+            st.error(f"Failed to build screening universe: {str(e)}")
+            return
+    if universe.empty:
+        st.warning("No data available for screening")
+        return
+
+    saved = cached_screener()
+    tab1, tab2, tab3 = st.tabs(["Saved Screens", "New Screen", "Watchlists"])
+
+    with tab1:
+        results = saved.run(universe)
+        st.caption(f"{len(results)} screens over {len(universe)} stocks")
+        for name, rows in results.items():
+            with st.expander(f"{name} ({len(rows)})", expanded=False):
+                st.code(saved.screens[name].when, language="python")
+                st.dataframe(rows, use_container_width=True)
+                if st.button("Delete screen", key=f"delete_{name}"):
+                    saved.remove(name)
+                    saved.save()
+                    st.rerun()
+
+    with tab2:
+        when = st.text_area("Condition", placeholder="`R-Score` > 70 and rsi_14_1d < 70 and `%changeInOI` > 5")
+        col1, col2, col3 = st.columns(3)
+        sort = col1.selectbox("Sort by", ["R-Score"] + [c for c in universe.columns if c != "R-Score"])
+        limit = col2.number_input("Limit", min_value=0, value=0, help="0 shows every match")
+        watchlist = col3.selectbox("Watchlist", ["All stocks"] + list(saved.watchlists))
+        with st.expander("Available columns"):
+            st.write(", ".join(universe.columns))
+        if when:
+            try:
+                new = screener.Screen("new", when, sort=sort, limit=int(limit) or None,
+                                      watchlist=None if watchlist == "All stocks" else watchlist)
+                rows = screener.Screener([new], saved.watchlists).run(universe).get("new", pd.DataFrame())
+                st.dataframe(rows, use_container_width=True)
+                name = st.text_input("Save as")
+                if name and st.button("💾 Save screen"):
+                    new.name = name
+                    saved.add(new)
+                    saved.save()
+                    st.success(f"Saved screen '{name}'")
+            except expr.ExpressionError as e:
+                st.warning(str(e))
+
+    with tab3:
+        name = st.text_input("Watchlist name")
+        symbols = st.multiselect("Stocks", sorted(universe["Symbol"]),
+                                 default=saved.watchlists.get(name, []))
+        if name and st.button("💾 Save watchlist"):
+            saved.watchlists[name] = symbols
+            saved.save()
+            st.success(f"Saved watchlist '{name}' ({len(symbols)} stocks)")
+        for wl, members in saved.watchlists.items():
+            st.markdown(f"**{wl}**: {', '.join(members)}")
+
+def show_delivery_analytics():
+    st.subheader("📦 Delivery Analytics - Accumulation & Distribution")
+    with st.spinner("Loading delivery data..."):
+        try:
+            metrics = cached_delivery_metrics()
+            z_threshold = st.slider("Delivery % z-score threshold", 0.5, 3.0, 1.5, 0.1)
+            acc, dist = delivery.rank(metrics, z_threshold=z_threshold)
+            st.caption(f"Trading day: {metrics['date'].max():%d-%b-%Y} · "
+                       f"{metrics['symbol'].nunique()} F&O stocks · {delivery.WINDOW}-day baseline")
+
+            formats = {
+                'close': '₹{:.2f}', 'vwap': '₹{:.2f}', 'change_%': '{:.2f}%',
+                'delivery_per': '{:.2f}%', 'delivery_z': '{:.2f}', 'vwap_dev_%': '{:.2f}%',
+                'avg_trade_size': '{:,.0f}', 'trade_size_z': '{:.2f}', 'score': '{:.2f}'
+            }
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("#### 🟢 Accumulation Candidates")
+                if acc.empty:
+                    st.info("No accumulation candidates at this threshold")
+                else:
+                    show_table(acc.drop(columns="date"), formats, use_container_width=True)
+            with col2:
+                st.markdown("#### 🔴 Distribution Candidates")
+                if dist.empty:
+                    st.info("No distribution candidates at this threshold")
+                else:
+                    show_table(dist.drop(columns="date"), formats, use_container_width=True)
+        except Exception as e:
+            st.error(f"Failed to load delivery analytics: {str(e)}")
+
+def show_diagnostics():
+    import plotly.express as px
+    st.subheader("🩺 Diagnostics - Hot Path Timings")
+    breakers = fetch.breaker_frame()
+    if not breakers.empty:
+        st.markdown("#### 🔌 Endpoints")
+        st.dataframe(breakers, use_container_width=True)
+        st.dataframe(fetch.status_frame().style.format({'latency_ms': '{:,.1f}'}), use_container_width=True)
+
+    summary = tracing.to_frame()
+    if summary.empty:
+        st.info("No spans recorded yet - open another page first")
+        return
+
+    st.dataframe(summary.style.format({
+        'total_ms': '{:,.1f}', 'mean_ms': '{:,.1f}', 'min_ms': '{:,.1f}',
+        'p50_ms': '{:,.1f}', 'p95_ms': '{:,.1f}', 'max_ms': '{:,.1f}'
+    }), use_container_width=True)
+
+    selected = st.selectbox("Latency histogram", summary["span"].tolist())
+    buckets = tracing.snapshot()[selected]["buckets"]
+    fig = px.bar(
+        x=[f"≤{b} ms" if b != "inf" else "> 30 s" for b in buckets],
+        y=list(buckets.values()),
+        labels={"x": "Latency", "y": "Count"},
+        title=selected
+    )
+    fig.update_layout(plot_bgcolor="#0E1117", paper_bgcolor="#0E1117", font=dict(color="white"))
+    st.plotly_chart(fig, use_container_width=True)
+
+    savings = schema.memory_savings()
+    if not savings.empty:
+        st.markdown("#### 🗜️ Frame Memory (compact dtypes)")
+        st.dataframe(savings.style.format({
+            'before_mb': '{:.2f} MB', 'after_mb': '{:.2f} MB', 'saved_pct': '{:.1f}%'
+        }), use_container_width=True)
+
+    checks = quality.counters()
+    if not checks.empty:
+        st.markdown("#### 🧪 Data Quality")
+        show_table(checks, {'last_ms': '{:,.1f}', 'bad_pct': '{:.2f}%'}, use_container_width=True)
+        bad = quality.quarantined()
+        if not bad.empty:
+            with st.expander(f"Quarantined rows ({len(bad)})"):
+                st.dataframe(bad, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Export JSON", tracing.export(), file_name="trade_analyst_spans.json",
+                           mime="application/json", use_container_width=True)
+    with col2:
+        if st.button("Reset timings", use_container_width=True):
+            tracing.reset()
+            st.rerun()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,391 @@
+## Benchmark suite for the analytics hot paths
+# Times each function on recorded fixtures at several universe sizes and
+# reports median latency, throughput (rows/s) and peak traced memory.
+'''
+Run from the repo root:
+    python -m benchmarks.bench                      # full suite
+    python -m benchmarks.bench --quick              # smallest sizes only
+    python -m benchmarks.bench --only r_score       # one case
+    python -m benchmarks.bench --compare benchmarks/results/<commit>.json
+
+Results are written to benchmarks/results/<commit>.json.
+'''
+
+import os
+
+# Frozen replay clock: add_prev_data gets a fixed 15:30 cutoff and every
+# replay.sleep() is skipped, so timings measure analytics work only.
+os.environ.setdefault("TRADE_ANALYST_REPLAY", "1")
+os.environ.setdefault("TRADE_ANALYST_REPLAY_START", "2025-05-09 15:30:00")
+os.environ.setdefault("TRADE_ANALYST_REPLAY_SPEED", "0")
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks import fixtures
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+UNIVERSE_SIZES = [25, 100, 215, 860]
+CHAIN_SIZES = [50, 200, 800]
+
+
+def _commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=fixtures.ROOT, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def measure(fn, setup, repeat):
+    """Run setup() then fn(*args) `repeat` times; only fn is timed."""
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+
+# --- Cases: each returns (fn, setup, rows) for a given size ---
+
+def case_r_score(size):
+    from utils import sectorial_stock
+    base = sectorial_stock.add_prev_data(fixtures.candles("30", size))
+    return sectorial_stock.calculate_r_score, lambda: (base.copy(),), len(base)
+
+
+def case_add_prev_data(size):
+    from utils import sectorial_stock
+    base = fixtures.candles("30", size)
+    return sectorial_stock.add_prev_data, lambda: (base.copy(),), len(base)
+
+
+def case_sector_data(size):
+    from utils import sectorial_stock
+    stocks = fixtures.universe(size)
+    folder = tempfile.mkdtemp(prefix="ta_bench_")
+    history = os.path.join(folder, "stock_30.csv")
+    fixtures.candles("30", size).to_csv(history)
+    json_path = fixtures.sector_map_file(stocks, folder)
+    kite = fixtures.StubKite(fixtures.quote_batch(stocks))
+
+    def run(kite):
+        return sectorial_stock.get_sector_data(kite, "BENCH", json_path, history_path=history)
+
+    return run, lambda: (kite,), len(stocks)
+
+
+def case_sector_batch(size):
+    from utils import sector_batch
+    stocks = fixtures.universe(size)
+    folder = tempfile.mkdtemp(prefix="ta_bench_")
+    history = os.path.join(folder, "stock_30.csv")
+    fixtures.candles("30", size).to_csv(history)
+    # Four overlapping sectors, like the real sector_data.json
+    step = max(len(stocks) // 4, 1)
+    sectors = {f"BENCH_{i}": stocks[i * step:(i + 2) * step] for i in range(4)}
+    json_path = os.path.join(folder, "sector_data.json")
+    with open(json_path, "w") as f:
+        json.dump(sectors, f)
+    kite = fixtures.StubKite(fixtures.quote_batch(stocks))
+
+    def run(kite):
+        return sector_batch.score_all(kite, json_path, history_path=history)
+
+    return run, lambda: (kite,), len(stocks)
+
+
+def case_json_normalize(size):
+    data = fixtures.option_chain(n_strikes=size)["records"]["data"]
+    return pd.json_normalize, lambda: (data,), len(data)
+
+
+def case_chain_pushdown(size):
+    from utils import chain_ingest
+    payload = fixtures.option_chain(n_strikes=size)
+
+    def run(payload):
+        return chain_ingest.parse(payload, strike_window=500, nearest=2, min_volume=1)
+
+    return run, lambda: (payload,), len(payload["records"]["data"])
+
+
+def case_instrument_index(size):
+    from utils import instruments
+    dump = pd.DataFrame(fixtures.instrument_dump(n_strikes=size, n_expiries=8))
+    return instruments.InstrumentMaster, lambda: (dump,), len(dump)
+
+
+def case_analyze_option_chain(size):
+    from utils import OI
+    base = pd.json_normalize(fixtures.option_chain(n_strikes=size)["records"]["data"])
+    return OI.analyze_option_chain, lambda: (base.copy(),), len(base)
+
+
+def case_liquidation_zones(size):
+    from utils import liquidation_shift
+    base = pd.json_normalize(fixtures.option_chain(n_strikes=size)["records"]["data"])
+    return liquidation_shift.get_liquidation_zones, lambda: (base,), len(base)
+
+
+def case_alerts(size):
+    from utils import alerts
+    import numpy as np
+    rng = np.random.default_rng(0)
+    rules = [alerts.Rule(f"rule {i}", "sector_scores", f"`R-Score` > {50 + i % 40} and `Z-Volume` > {i % 3}")
+             for i in range(200)]
+    frame = pd.DataFrame({"Symbol": [f"S{i}" for i in range(size)], "R-Score": rng.uniform(0, 100, size),
+                          "Z-Volume": rng.normal(0, 1.5, size)})
+
+    def update(engine):
+        return engine.update("sector_scores", frame)
+
+    # Fresh engine per call: every row is new, the worst case for a refresh
+    return update, lambda: (alerts.AlertEngine(rules),), size * len(rules)
+
+
+def case_screener(size):
+    from utils import screener
+    import numpy as np
+    rng = np.random.default_rng(0)
+    universe = pd.DataFrame({"Symbol": [f"S{i}" for i in range(size)], "% Change": rng.normal(0, 1.5, size),
+                             "R-Score": rng.uniform(0, 100, size), "rsi_14_1d": rng.uniform(10, 90, size),
+                             "%changeInOI": rng.normal(0, 10, size)})
+    screens = screener.Screener([
+        {"name": f"screen {i}", "when": f"`R-Score` > {i} and rsi_14_1d < {40 + i} and `%changeInOI` > {i % 5}",
+         "sort": "R-Score", "limit": 20} for i in range(50)])
+    return screens.run, lambda: (universe,), size * 50
+
+
+def case_dataplane_map(size):
+    from utils import chain_ingest, dataplane
+    root = tempfile.mkdtemp(prefix="ta_bench_")
+    chain = chain_ingest.parse(fixtures.option_chain(n_strikes=size))
+    dataplane.publish("option_chain_BENCH", chain, root)
+
+    # Sessions share one Reader; what one caller adds must not reach the next
+    shared = dataplane.Reader(root)
+    first = shared.read("option_chain_BENCH")
+    first["CE.totalTradedVolume"] = first["CE.totalTradedVolume"].fillna(0)
+    first["leak"] = 1
+    assert "leak" not in shared.read("option_chain_BENCH"), "Reader.read() leaked a caller's column"
+
+    def read():
+        # A new reader maps the published columns the way a fresh session would
+        return dataplane.Reader(root).read("option_chain_BENCH")
+
+    return read, lambda: (), len(chain)
+
+
+def case_api_page(size):
+    from utils import api_server, chain_ingest
+    chain = chain_ingest.parse(fixtures.option_chain(n_strikes=size))
+
+    def serve_page(df):
+        # Server-side filter + sort + one page, serialized the way the API sends it
+        meta, rows = api_server.page(df, {"where": "`CE.openInterest` > 0", "sort": "strikePrice", "limit": "500"})
+        return api_server._body(meta, rows)
+
+    return serve_page, lambda: (chain,), len(chain)
+
+
+def case_indicators(size):
+    from utils import indicators
+    base = fixtures.candles("30", size)
+    return indicators.IndicatorEngine().load, lambda: ("30", base), len(base)
+
+
+def case_render(size):
+    from utils import render
+    import numpy as np
+    rng = np.random.default_rng(0)
+    # One session of 1-minute OI snapshots for `size` symbols, as the trend chart plots it
+    trend = pd.DataFrame(rng.normal(0, 1, (375 * 4, size)).cumsum(axis=0),
+                         index=pd.date_range("2025-05-09 09:15", periods=375 * 4, freq="15s"),
+                         columns=[f"S{i}" for i in range(size)])
+    cache = render.FigureCache()
+
+    def prepare(frame):
+        # Rerun with unchanged data: downsample, fingerprint, cached figure
+        points = render.downsample(frame)
+        return cache.get("trend", points, lambda d: d.shape), render.sign_css(frame.iloc[-200:])
+
+    return prepare, lambda: (trend,), trend.size
+
+
+def case_breadth(size):
+    from utils import breadth, schema, sectorial_stock
+    import numpy as np
+    stocks = fixtures.universe(size)
+    sectors = {f"SECTOR {i}": stocks[i::8] for i in range(8)}
+    quotes = fixtures.quote_batch(stocks)
+    base = schema.compact_quotes(pd.DataFrame(
+        [sectorial_stock.quote_row(s["symbol"], s["instrument_token"], quotes[str(s["instrument_token"])])
+         for s in stocks]))
+    # Next refresh: a fifth of the universe ticks down through its previous close
+    moved = base.copy()
+    rows = np.random.default_rng(0).choice(len(moved), max(len(moved) // 5, 1), replace=False)
+    moved.loc[rows, "last_price"] = moved.loc[rows, "close"] * np.float32(0.99)
+
+    def setup():
+        engine = breadth.BreadthEngine(stocks, sectors, store_dir=None)
+        engine.record(base, "2025-05-09 15:28:00")
+        return engine, moved, "2025-05-09 15:29:00"
+
+    def update(engine, quotes, at):
+        engine.record(quotes, at)
+        return engine.snapshot()
+
+    return update, setup, len(stocks)
+
+
+def case_backfill_gaps(size):
+    from utils import backfill, schema
+    import numpy as np
+    base = schema.compact_candles(fixtures.candles("30", size))
+    # Every fifth instrument is missing a random session; the store ends a week early
+    days = base["date"].dt.normalize()
+    rng = np.random.default_rng(0)
+    tokens = base["instrument_token"].unique()[::5]
+    holes = dict(zip(tokens, rng.choice(days.unique()[1:-1], len(tokens))))
+    store = base[days != base["instrument_token"].map(holes)]
+    end = days.max() + pd.Timedelta(days=7)
+
+    def plan(candles):
+        return backfill.plan(backfill.find_gaps(candles, "30", end=end), "30")
+
+    return plan, lambda: (store,), len(store)
+
+
+def case_quality(size):
+    from utils import quality
+    raw = fixtures.candles("30", size)
+    # A duplicated tail, a zero close and a swapped high/low, as in real files
+    bad = raw.sample(frac=0.01, random_state=0)
+    bad.iloc[::3, bad.columns.get_loc("close")] = 0
+    bad.iloc[1::3, [bad.columns.get_loc("high"), bad.columns.get_loc("low")]] = bad.iloc[1::3][["low", "high"]].to_numpy()
+    raw = pd.concat([raw, bad], ignore_index=True)
+
+    def check(df):
+        return quality.validate(df, "candles", "bench_candles")
+
+    return check, lambda: (raw,), len(raw)
+
+
+CASES = {
+    "r_score": (case_r_score, UNIVERSE_SIZES),
+    "add_prev_data": (case_add_prev_data, UNIVERSE_SIZES),
+    "sector_data": (case_sector_data, UNIVERSE_SIZES),
+    "sector_batch": (case_sector_batch, UNIVERSE_SIZES),
+    "json_normalize": (case_json_normalize, CHAIN_SIZES),
+    "chain_pushdown": (case_chain_pushdown, CHAIN_SIZES),
+    "instrument_index": (case_instrument_index, CHAIN_SIZES),
+    "analyze_option_chain": (case_analyze_option_chain, CHAIN_SIZES),
+    "liquidation_zones": (case_liquidation_zones, CHAIN_SIZES),
+    "indicators": (case_indicators, UNIVERSE_SIZES),
+    "alerts": (case_alerts, UNIVERSE_SIZES),
+    "screener": (case_screener, UNIVERSE_SIZES),
+    "dataplane_map": (case_dataplane_map, CHAIN_SIZES),
+    "api_page": (case_api_page, CHAIN_SIZES),
+    "render": (case_render, UNIVERSE_SIZES),
+    "breadth": (case_breadth, UNIVERSE_SIZES),
+    "backfill_gaps": (case_backfill_gaps, UNIVERSE_SIZES),
+    "quality": (case_quality, UNIVERSE_SIZES),
+}
+
+
+def run(only=None, quick=False, repeat=5):
+    results = []
+    for name, (builder, sizes) in CASES.items():
+        if only and name not in only:
+            continue
+        for size in sizes[:1] if quick else sizes:
+            try:
+                fn, setup, rows = builder(size)
+                timings, peak = measure(fn, setup, repeat)
+            except AssertionError:
+                # A failed correctness check is a regression, not a missing dependency
+                raise
+            except Exception as e:
+                print(f"{name:<22} {size:>6}  skipped: {e}")
+                continue
+            median = statistics.median(timings)
+            row = {
+                "case": name,
+                "size": size,
+                "rows": rows,
+                "median_s": median,
+                "min_s": min(timings),
+                "rows_per_s": rows / median if median else float("inf"),
+                "peak_mb": peak / 2**20,
+            }
+            results.append(row)
+            print(f"{name:<22} {size:>6}  {median * 1000:>10.2f} ms  {row['rows_per_s']:>12,.0f} rows/s"
+                  f"  {row['peak_mb']:>8.2f} MB")
+    return results
+
+
+def save(results, path=None):
+    commit = _commit()
+    path = path or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    base = {(r["case"], r["size"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline['commit']} (ratio < 1 is faster):")
+    for r in results:
+        b = base.get((r["case"], r["size"]))
+        if b:
+            print(f"{r['case']:<22} {r['size']:>6}  time x{r['median_s'] / b['median_s']:.2f}"
+                  f"  mem x{r['peak_mb'] / max(b['peak_mb'], 1e-9):.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Trade Analyst analytics hot paths")
+    parser.add_argument("--only", nargs="*", choices=list(CASES), help="cases to run")
+    parser.add_argument("--quick", action="store_true", help="smallest size of each case only")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="results file (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="baseline results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.quick, args.repeat)
+    print(f"\nSaved {save(results, args.out)}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
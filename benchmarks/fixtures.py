@@ -0,0 +1,165 @@
+## Benchmark fixtures
+# Recorded inputs for the analytics hot paths. Option-chain and quote payloads
+# come from data/replay when a recording exists and are otherwise synthesized
+# in the exact NSE / Kite response shape with a fixed seed, so runs are
+# comparable across commits.
+
+import os
+import json
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from utils import replay
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "data")
+SEED = 7
+
+
+def candles(interval, n_symbols):
+    """Bundled candle file (30/1h/1d) resized to `n_symbols` instruments.
+
+    Universes larger than the bundled 215 F&O stocks are built by cloning
+    existing symbols under new tokens.
+    """
+    df = pd.read_csv(os.path.join(DATA_DIR, f"stock_{interval}.csv"), index_col=0)
+    symbols = df["Symbol"].unique()
+    if n_symbols <= len(symbols):
+        return df[df["Symbol"].isin(symbols[:n_symbols])].reset_index(drop=True)
+
+    frames = [df]
+    copies = -(-n_symbols // len(symbols))
+    for i in range(1, copies):
+        clone = df.copy()
+        clone["Symbol"] = clone["Symbol"] + f"_{i}"
+        clone["instrument_token"] = clone["instrument_token"] + i * 10_000_000
+        frames.append(clone)
+    out = pd.concat(frames, ignore_index=True)
+    keep = out["Symbol"].unique()[:n_symbols]
+    return out[out["Symbol"].isin(keep)].reset_index(drop=True)
+
+
+def universe(n_symbols):
+    """[{'symbol', 'instrument_token'}] list in the sector_data.json shape."""
+    df = candles("1d", n_symbols)[["Symbol", "instrument_token"]].drop_duplicates("Symbol")
+    return [{"symbol": s, "instrument_token": int(t)} for s, t in zip(df["Symbol"], df["instrument_token"])]
+
+
+def quote_batch(stocks, when=None):
+    """Kite quote() response for `stocks`, keyed by str(token)."""
+    rng = np.random.default_rng(SEED)
+    when = when or datetime(2025, 5, 9, 15, 29, 59)
+    out = {}
+    for stock in stocks:
+        close = float(rng.uniform(100, 5000))
+        last = close * (1 + rng.normal(0, 0.015))
+        out[str(stock["instrument_token"])] = {
+            "instrument_token": stock["instrument_token"],
+            "timestamp": when,
+            "last_trade_time": when,
+            "last_price": round(last, 2),
+            "average_price": round((close * 1.001 + last) / 2, 2),
+            "volume": int(rng.integers(10_000, 5_000_000)),
+            "buy_quantity": int(rng.integers(1_000, 500_000)),
+            "sell_quantity": int(rng.integers(1_000, 500_000)),
+            "oi": int(rng.integers(0, 20_000_000)),
+            "net_change": round(last - close, 2),
+            "ohlc": {"open": round(close * 1.001, 2), "high": round(max(close, last) * 1.01, 2),
+                     "low": round(min(close, last) * 0.99, 2), "close": round(close, 2)},
+        }
+    return out
+
+
+class StubKite:
+    """Offline KiteConnect stand-in serving a fixed quote batch."""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.calls = 0
+
+    def quote(self, *instruments):
+        if len(instruments) == 1 and isinstance(instruments[0], (list, tuple)):
+            instruments = instruments[0]
+        self.calls += 1
+        return {str(i): self.quotes[str(i)] for i in instruments if str(i) in self.quotes}
+
+
+def _leg(rng, strike, expiry, underlying, kind):
+    oi = float(rng.integers(0, 200_000))
+    ltp = max(0.05, (underlying - strike if kind == "CE" else strike - underlying) + rng.uniform(5, 150))
+    bid = round(ltp - rng.uniform(0.05, 3), 2)
+    return {
+        "strikePrice": strike, "expiryDate": expiry, "underlying": "NIFTY",
+        "identifier": f"OPTIDXNIFTY{expiry}{kind}{strike:.2f}",
+        "openInterest": oi, "changeinOpenInterest": float(rng.integers(-20_000, 20_000)),
+        "pchangeinOpenInterest": float(rng.normal(0, 25)),
+        "totalTradedVolume": float(rng.integers(0, 500_000)),
+        "impliedVolatility": float(rng.uniform(8, 40)), "lastPrice": round(ltp, 2),
+        "change": float(rng.normal(0, 10)), "pChange": float(rng.normal(0, 5)),
+        "totalBuyQuantity": float(rng.integers(0, 2_000_000)),
+        "totalSellQuantity": float(rng.integers(0, 2_000_000)),
+        "bidQty": float(rng.integers(0, 5_000)), "bidprice": bid,
+        "askQty": float(rng.integers(0, 5_000)), "askPrice": round(bid + rng.uniform(0.05, 4), 2),
+        "underlyingValue": underlying,
+    }
+
+
+def option_chain(n_strikes=100, n_expiries=4, symbol="NIFTY"):
+    """NSE option-chain-indices payload with `n_strikes` per expiry."""
+    try:
+        recorded = replay.load_snapshot(f"option_chain_{symbol}")
+        rows = recorded.get("records", {}).get("data", [])
+        if len(rows) >= n_strikes * n_expiries:
+            return recorded
+    except FileNotFoundError:
+        pass
+
+    rng = np.random.default_rng(SEED)
+    underlying = 24850.0
+    strikes = underlying - (n_strikes // 2) * 50 + 50 * np.arange(n_strikes)
+    first = datetime(2025, 5, 15)
+    expiries = [(first + timedelta(weeks=i)).strftime("%d-%b-%Y") for i in range(n_expiries)]
+    data = []
+    for expiry in expiries:
+        for strike in strikes:
+            data.append({
+                "strikePrice": float(strike), "expiryDate": expiry,
+                "CE": _leg(rng, float(strike), expiry, underlying, "CE"),
+                "PE": _leg(rng, float(strike), expiry, underlying, "PE"),
+            })
+    return {"records": {"expiryDates": expiries, "data": data, "underlyingValue": underlying},
+            "filtered": {}}
+
+
+def instrument_dump(n_strikes=100, n_expiries=4, name="NIFTY", underlying=24850.0):
+    """kite.instruments("NFO") style rows: weekly CE/PE ladders plus one future."""
+    first = date(2025, 5, 15)
+    strikes = underlying - (n_strikes // 2) * 50 + 50 * np.arange(n_strikes)
+    rows, token = [], 10_000_000
+    for i in range(n_expiries):
+        expiry = first + timedelta(weeks=i)
+        for strike in strikes:
+            for kind in ("CE", "PE"):
+                token += 1
+                rows.append({
+                    "instrument_token": token, "exchange_token": token // 256,
+                    "tradingsymbol": f"{name}{expiry:%y%b}{int(strike)}{kind}".upper(), "name": name,
+                    "last_price": 0.0, "expiry": expiry, "strike": float(strike), "tick_size": 0.05,
+                    "lot_size": 75, "instrument_type": kind, "segment": "NFO-OPT", "exchange": "NFO",
+                })
+    token += 1
+    rows.append({"instrument_token": token, "exchange_token": token // 256,
+                 "tradingsymbol": f"{name}{first:%y%b}FUT".upper(), "name": name, "last_price": 0.0,
+                 "expiry": first + timedelta(weeks=2), "strike": 0.0, "tick_size": 0.05, "lot_size": 75,
+                 "instrument_type": "FUT", "segment": "NFO-FUT", "exchange": "NFO"})
+    return rows
+
+
+def sector_map_file(stocks, folder, name="BENCH"):
+    """Write a one-sector sector_data.json for get_sector_data()."""
+    path = os.path.join(folder, "sector_data.json")
+    with open(path, "w") as f:
+        json.dump({name: stocks}, f)
+    return path
@@ -0,0 +1,72 @@
+## Import-time benchmark
+# Cold-imports each module in a fresh interpreter and reports the wall time
+# and which heavy dependencies the import dragged in.
+'''
+python -m benchmarks.import_time            # utils modules, cli and app
+python -m benchmarks.import_time --repeat 5
+'''
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from benchmarks import fixtures
+from benchmarks.bench import RESULTS_DIR, _commit
+
+HEAVY = ("selenium", "webdriver_manager", "kiteconnect", "plotly", "streamlit")
+MODULES = [
+    "utils.Ch_oi_oi_spurt", "utils.OI", "utils.liquidation_shift", "utils.most_active_contracts",
+    "utils.sectorials", "utils.sectorial_stock", "utils.update_csv", "utils.historic_data_30",
+    "utils.indicators", "utils.delivery", "utils.rotation", "utils.oi_tracker", "utils.active_history", "utils.sector_batch", "utils.chain_ingest", "utils.instruments", "utils.kite_chain", "utils.expr", "utils.alerts", "utils.screener", "utils.fetch", "utils.dataplane", "utils.api_server", "utils.api_client", "utils.config", "utils.render", "utils.breadth", "utils.backfill", "utils.quality", "utils.lease", "cli", "app",
+]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def measure(module, repeat):
+    timings, heavy = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+                             capture_output=True, text=True, cwd=fixtures.ROOT, timeout=120)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "failed"
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        heavy = result["heavy"]
+    return statistics.median(timings), heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import time per module")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="results file (default benchmarks/results/import_<commit>.json)")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for module in args.modules:
+        seconds, heavy = measure(module, args.repeat)
+        if seconds is None:
+            print(f"{module:<32} failed: {heavy}")
+            continue
+        rows.append({"module": module, "seconds": seconds, "heavy": heavy})
+        print(f"{module:<32} {seconds * 1000:>9.1f} ms  {', '.join(heavy) or '-'}")
+
+    path = args.out or os.path.join(RESULTS_DIR, f"import_{_commit()}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"commit": _commit(), "results": rows}, f, indent=2)
+    print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
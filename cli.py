@@ -0,0 +1,283 @@
+## Headless command-line runner
+# Runs any combination of scans non-interactively and in parallel and writes
+# the results as Parquet, CSV or JSON. Scan modules are imported inside each
+# scan, so `import cli` never pulls in Streamlit, Plotly or Selenium.
+'''
+Examples (from the repo root):
+    python cli.py sectors sector --sector "NIFTY 50" --sector "NIFTY IT" --format csv
+    python cli.py option_chain liquidation --symbol NIFTY --format parquet --out reports
+    python cli.py all --workers 6
+    python cli.py sector_cube liquidation --alerts    # evaluate alert rules on the results
+
+Cron at market open (09:20 IST, Mon-Fri):
+    20 9 * * 1-5  cd /opt/trade_analyst && python cli.py all --out reports >> reports/cron.log 2>&1
+'''
+
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import config
+
+FORMATS = ("parquet", "csv", "json")
+DEFAULT_SECTOR_JSON = config.data_path("sector_data.json")
+
+_chain_lock = threading.Lock()     # guards _symbol_locks and the shared Kite session
+_symbol_locks = {}
+_chain_cache = {}
+_session = None
+
+
+def _option_chain(symbol, source="nse"):
+    """Fetch each option chain once even when several scans need it.
+
+    Scans of the same symbol wait for one fetch; different symbols fetch in parallel.
+    """
+    with _chain_lock:
+        lock = _symbol_locks.setdefault(symbol, threading.Lock())
+    with lock:
+        if symbol not in _chain_cache:
+            if source == "kite":
+                from utils import kite_chain
+                _chain_cache[symbol] = kite_chain.build_chain(_shared_kite(), symbol)
+            else:
+                from utils import OI
+                _chain_cache[symbol] = OI.get_data(symbol)
+        return _chain_cache[symbol]
+
+
+def _shared_kite():
+    """One Kite session for all chain fetches, created by the first caller."""
+    global _session
+    with _chain_lock:
+        if _session is None:
+            _session = _kite()
+        return _session
+
+
+def _kite():
+    from utils import sectorial_stock
+    return sectorial_stock.gen_ses()
+
+
+# --- Scans: each returns {result name: DataFrame} ---
+
+def scan_sectors(args):
+    from utils import sectorials
+    return _with_status({}, "sectors", sectorials.sectorials(_kite()))
+
+
+def _with_status(out, name, df):
+    """Add `name` to `out`, plus a `<name>_fetch_status` file when some instruments failed."""
+    from utils import fetch
+    out[name] = df
+    status = df.attrs.get("fetch_status")
+    if status is not None and (status["status"] != "ok").any():
+        print(f"⚠️ {name}: {fetch.summarize(status)}", file=sys.stderr)
+        out[f"{name}_fetch_status"] = status
+    return out
+
+
+def scan_sector(args):
+    from utils import sectorial_stock
+    kite = _kite()
+    out = {}
+    for sector in args.sector:
+        df = sectorial_stock.get_sector_data(kite, sector, args.sector_json)
+        _with_status(out, f"sector_{sector.replace(' ', '_').replace('&', 'and')}", df)
+    return out
+
+
+def scan_sector_cube(args):
+    from utils import sector_batch
+    cube = sector_batch.score_all(_kite(), args.sector_json, workers=args.workers)
+    return _with_status({}, "sector_cube", cube.reset_index())
+
+
+def scan_option_chain(args):
+    from utils import OI
+    out = {}
+    for symbol in args.symbol:
+        df = _option_chain(symbol, args.chain_source)
+        if df.empty:
+            raise RuntimeError(f"No option chain data for {symbol}")
+        results = OI.analyze_option_chain(df.copy(), range_width=args.range_width)
+        for name, frame in results.items():
+            out[f"option_chain_{symbol}_{name.lower().replace(' ', '_')}"] = frame
+    return out
+
+
+def scan_liquidation(args):
+    from utils import liquidation_shift
+    out = {}
+    for symbol in args.symbol:
+        df = _option_chain(symbol, args.chain_source)
+        if df.empty:
+            raise RuntimeError(f"No option chain data for {symbol}")
+        out[f"liquidation_{symbol}"] = liquidation_shift.get_liquidation_zones(df).dropna(subset=["action"])
+        if args.alerts:
+            from utils import alerts
+            out[f"option_summary_{symbol}"] = alerts.option_summary(symbol, df)
+    return out
+
+
+def scan_oi_spurts(args):
+    from utils import Ch_oi_oi_spurt
+    return {"oi_spurts": Ch_oi_oi_spurt.get_oi_spurts()}
+
+
+def scan_most_active(args):
+    from utils import most_active_contracts, active_history
+    df = most_active_contracts.most_active_eq()
+    history = active_history.ActiveHistory()
+    # The dashboard leaves the day file alone while a scan writes it
+    history.lease.acquire(ttl=120)
+    try:
+        scored = history.record(df)
+    finally:
+        history.lease.release()
+    if scored is None:
+        scored = history.latest()
+    out = {"most_active": df}
+    if scored is not None:
+        out["most_active_anomalies"] = history.anomalies(scored)
+        if args.alerts:
+            out["most_active_scored"] = scored
+    return out
+
+
+def scan_delivery(args):
+    from utils import delivery
+    acc, dist = delivery.rank(delivery.load())
+    return {"delivery_accumulation": acc, "delivery_distribution": dist}
+
+
+def scan_indicators(args):
+    from utils import indicators
+    return {"indicators": indicators.load_bundled().scan().reset_index()}
+
+
+def scan_screens(args):
+    from utils import Ch_oi_oi_spurt, indicators, screener, sector_batch
+    try:
+        spurts = Ch_oi_oi_spurt.get_oi_spurts()
+    except Exception as e:
+        print(f"OI spurts unavailable, screening without them: {e}", file=sys.stderr)
+        spurts = None
+    universe = screener.build_universe(sector_batch.score_all(_kite(), args.sector_json, workers=args.workers),
+                                       indicators.load_bundled().scan(), spurts)
+    results = screener.Screener.load(args.screens).run(universe)
+    return {f"screen_{name.lower().replace(' ', '_')}": rows for name, rows in results.items()}
+
+
+def scan_rotation(args):
+    from utils import rotation
+    engine = rotation.load_bundled(args.sector_json)
+    return {"rotation_1d": engine.rotation("1d"), "rotation_30": engine.rotation("30")}
+
+
+SCANS = {
+    "sectors": scan_sectors,
+    "sector": scan_sector,
+    "sector_cube": scan_sector_cube,
+    "option_chain": scan_option_chain,
+    "liquidation": scan_liquidation,
+    "oi_spurts": scan_oi_spurts,
+    "most_active": scan_most_active,
+    "delivery": scan_delivery,
+    "indicators": scan_indicators,
+    "rotation": scan_rotation,
+    "screens": scan_screens,
+}
+
+
+# Result name prefix -> alert source (see utils/alerts.py)
+ALERT_SOURCES = {
+    "sector_cube": "sector_scores",
+    "liquidation_": "liquidation",
+    "option_summary_": "option_summary",
+    "oi_spurts": "oi_spurts",
+    "most_active_scored": "most_active",
+}
+
+
+def evaluate_alerts(frames, rules_path):
+    """Run the alert rules over scan results; fired alerts go to data/cache/alerts.jsonl."""
+    from utils import alerts
+    engine = alerts.AlertEngine(alerts.load_rules(rules_path), [alerts.FileSink()])
+    fired = []
+    for name, df in frames.items():
+        source = next((s for prefix, s in ALERT_SOURCES.items() if name.startswith(prefix)), None)
+        if source:
+            fired += engine.update(source, df)
+    for alert in fired:
+        print(f"🔔 {alert['rule']}: {alert['message']}")
+    return fired
+
+
+def write(df, folder, name, fmt, stamp):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{name}_{stamp}.{fmt}")
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records", date_format="iso", indent=2)
+    return path
+
+
+def run(scans, args):
+    """Run scans in parallel; returns {scan: [paths]} and {scan: error}."""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    written, failed, results = {}, {}, {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(SCANS[name], args): name for name in scans}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                frames = future.result()
+                results.update(frames)
+                written[name] = [write(df, args.out, key, args.format, stamp) for key, df in frames.items()]
+                print(f"✅ {name}: {', '.join(written[name])}")
+            except Exception as e:
+                failed[name] = str(e)
+                print(f"❌ {name}: {e}", file=sys.stderr)
+    if getattr(args, "alerts", False):
+        evaluate_alerts(results, args.alert_rules)
+    return written, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Trade Analyst scans headlessly")
+    parser.add_argument("scans", nargs="+", choices=list(SCANS) + ["all"], help="scans to run")
+    parser.add_argument("--symbol", action="append", help="option-chain symbol (repeatable, default NIFTY)")
+    parser.add_argument("--sector", action="append", help="sector for the 'sector' scan (repeatable, default NIFTY 50)")
+    parser.add_argument("--sector-json", default=DEFAULT_SECTOR_JSON)
+    parser.add_argument("--range-width", type=int, default=500, help="strike window for option_chain")
+    parser.add_argument("--chain-source", choices=("nse", "kite"), default="nse",
+                        help="option chains from the NSE page or from batched Kite quotes")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--out", default=config.reports_path())
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--screens", default=config.data_path("screens.json"), help="saved screens file")
+    parser.add_argument("--alerts", action="store_true", help="evaluate alert rules on the scan results")
+    parser.add_argument("--alert-rules", default=config.data_path("alert_rules.json"))
+    args = parser.parse_args(argv)
+
+    args.symbol = args.symbol or ["NIFTY"]
+    args.sector = args.sector or ["NIFTY 50"]
+    scans = list(SCANS) if "all" in args.scans else list(dict.fromkeys(args.scans))
+
+    start = time.perf_counter()
+    written, failed = run(scans, args)
+    print(f"Finished {len(written)}/{len(scans)} scans in {time.perf_counter() - start:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
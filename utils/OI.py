@@ -1,48 +1,13 @@
 ## Test for OI data and analysis
 
 import pandas as pd
-import json
-import time
-from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-
-def get_data(symbol):
-    try:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("start-maximized")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
-
-        driver = webdriver.Chrome(options=options)
-
-        driver.get("https://www.nseindia.com")
-        time.sleep(3)
-
-        url = f"https://www.nseindia.com/api/option-chain-indices?symbol={symbol}"
-        
-        driver.get(url)
-        time.sleep(2)
-
-        text = driver.find_element("tag name", "pre").text
-        response = json.loads(text)
-        data = response.get("records", {}).get("data", [])
-
-        driver.quit()
-        if data:
-            df = pd.json_normalize(data)
-
-            return df
-        else:
-            return pd.DataFrame()
-    
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        return pd.DataFrame()
+from utils import tracing, chain_ingest
+
+def get_data(symbol, strike_window=None, expiries=None, nearest=None, min_volume=0):
+    """Option chain for `symbol`; filters are pushed down into the parse (see chain_ingest)."""
+    return chain_ingest.get_chain(symbol, strike_window, expiries, nearest, min_volume)
 
+@tracing.traced("analytics.analyze_option_chain")
 def analyze_option_chain(df, range_width=500):
     #Fill missing volume data
     df["CE.totalTradedVolume"] = df["CE.totalTradedVolume"].fillna(0)
@@ -120,7 +85,7 @@ def analyze_option_chain(df, range_width=500):
 
 if __name__ == "__main__":
     df = get_data("NIFTY")
-    #df = pd.read_csv(r"C:\Users\SRI SAI\Desktop\trade-analyst\test_in_progress\oi_data.csv")
+    #df = pd.read_csv("test_in_progress/oi_data.csv")
     if not df.empty:
         results = analyze_option_chain(df)
 
@@ -0,0 +1,247 @@
+## Most-active securities history
+# Records every most-active-by-value snapshot and keeps per-symbol baselines of
+# turnover and volume by time of day, so a snapshot can be scored against how
+# much that symbol usually trades by the same time of the session.
+'''
+NSE reports cumulative day turnover/volume, so a snapshot taken at 11:05 is
+compared with the same symbol's 11:00-11:15 slot on the previous WINDOW days.
+
+Storage (data/cache/most_active):
+<YYYY-mm-dd>.pkl   every snapshot row of that day
+slots.pkl          completed days only, one row per (day, slot, symbol) holding
+                   the last value seen in the slot
+
+A day file is folded into slots.pkl once the next day starts. Recording only
+rewrites the current day file and baselines are rebuilt once per day from
+slots.pkl, so the cost per snapshot does not grow with months of history.
+Z-scores use log turnover/volume, which are far closer to normal than the raw
+values.
+
+One writer per store (utils/lease.py): a scheduled `cli.py most_active` scan
+claims the folder while it records, the dashboard then only re-reads the day
+file, and every writer re-reads the file before appending if it changed.
+'''
+
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import config, lease, most_active_contracts, replay, schema, tracing
+
+STORE_DIR = config.cache_path("most_active")
+SLOT_MINUTES = 15
+WINDOW = 20          # prior trading days in the baseline
+MIN_DAYS = 5
+Z_THRESHOLD = 2.0
+METRICS = ["totalTradedValue", "volume"]
+SLOT_COLUMNS = ["day", "slot", "symbol"] + METRICS
+
+
+def _atomic_dump(obj, path):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def slot_of(times, minutes=SLOT_MINUTES):
+    """Minutes since midnight, floored to the slot size (int16)."""
+    times = pd.DatetimeIndex(times)
+    return ((times.hour * 60 + times.minute) // minutes * minutes).to_numpy("int16")
+
+
+def baselines(slots, day, window=WINDOW):
+    """Mean/std of log turnover and volume per (symbol, slot) over the `window` days before `day`."""
+    days = np.sort(slots["day"].unique())
+    prior = days[days < np.datetime64(day)][-window:]
+    past = slots[slots["day"].isin(prior)]
+    logs = np.log1p(past[METRICS].astype("float64"))
+    logs[["symbol", "slot"]] = past[["symbol", "slot"]]
+    grouped = logs.groupby(["symbol", "slot"], observed=True)
+    stats = grouped[METRICS].agg(["mean", "std"])
+    stats.columns = [f"{metric}_{stat}" for metric, stat in stats.columns]
+    stats["days"] = grouped.size()
+    return stats
+
+
+def score(snapshot, base, slot_minutes=SLOT_MINUTES):
+    """Turnover/volume z-scores of each snapshot row against its time-of-day baseline."""
+    df = snapshot.copy()
+    df["slot"] = slot_of(df["time"], slot_minutes)
+    df["symbol"] = df["symbol"].astype(str)
+    keys = pd.MultiIndex.from_arrays([df["symbol"], df["slot"]])
+    stats = base.reindex(keys)
+    for metric in METRICS:
+        log_value = np.log1p(df[metric].to_numpy("float64"))
+        mean = stats[f"{metric}_mean"].to_numpy()
+        std = stats[f"{metric}_std"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            df[f"{metric}_z"] = np.where(std > 0, (log_value - mean) / std, np.nan)
+        # Multiple of the typical (geometric mean) value at this time of day
+        df[f"{metric}_x"] = np.expm1(log_value) / np.expm1(mean)
+    df["baseline_days"] = stats["days"].fillna(0).to_numpy("int16")
+    return df
+
+
+class ActiveHistory:
+    """Snapshot store and time-of-day turnover baselines for most-active securities."""
+
+    def __init__(self, store_dir=STORE_DIR, slot_minutes=SLOT_MINUTES, window=WINDOW):
+        self.store_dir = store_dir
+        self.slot_minutes = slot_minutes
+        self.window = window
+        self.day = None
+        self.lease = lease.Lease(store_dir)
+        self._today = None
+        self._base = None
+        self._stamp = None   # (mtime, size) of the day file as last read or written
+        self._lock = threading.RLock()
+        self.slots = self._load(os.path.join(store_dir, "slots.pkl") if store_dir else None)
+        if self.slots is None:
+            self.slots = pd.DataFrame(columns=SLOT_COLUMNS)
+
+    @staticmethod
+    def _load(path):
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        return None
+
+    def _slot_rows(self, day, rows):
+        """(day, slot, symbol) rows of one day; later snapshots in a slot win."""
+        fresh = pd.DataFrame({"day": pd.Timestamp(day), "slot": slot_of(rows["time"], self.slot_minutes),
+                              "symbol": rows["symbol"].astype(str).to_numpy()})
+        fresh[METRICS] = rows[METRICS].to_numpy()
+        return fresh.drop_duplicates(["slot", "symbol"], keep="last")
+
+    def _path(self, day):
+        return os.path.join(self.store_dir, f"{day}.pkl") if self.store_dir else None
+
+    def _file_stamp(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        info = os.stat(path)
+        return info.st_mtime_ns, info.st_size
+
+    def _fold(self, before):
+        """Move finished day files (older than `before`) into the slot table."""
+        with self._lock:
+            done = set(self.slots["day"].dt.strftime("%Y-%m-%d")) if len(self.slots) else set()
+            pending = sorted(name[:-4] for name in os.listdir(self.store_dir)
+                             if name.endswith(".pkl") and name != "slots.pkl") if os.path.isdir(self.store_dir) else []
+            frames = [self._slot_rows(day, self._load(os.path.join(self.store_dir, f"{day}.pkl")))
+                      for day in pending if day < before and day not in done]
+            if not frames:
+                return
+            slots = pd.concat([self.slots] + frames if len(self.slots) else frames, ignore_index=True)
+            slots["day"] = pd.to_datetime(slots["day"])
+            slots["slot"] = slots["slot"].astype("int16")
+            slots["symbol"] = slots["symbol"].astype(str).astype("category")
+            for metric, dtype in zip(METRICS, ("float64", "int64")):
+                slots[metric] = slots[metric].astype(dtype)
+            self.slots = slots
+            _atomic_dump(self.slots, os.path.join(self.store_dir, "slots.pkl"))
+
+    def _start_day(self, day):
+        """Load `day`'s snapshots from disk; the slot table is rebuilt only when the day changes."""
+        with self._lock:
+            path = self._path(day)
+            self._stamp = self._file_stamp(path)
+            self._today = self._load(path)
+            if day != self.day:
+                self.day = day
+                if self.store_dir:
+                    self._fold(day)
+                self._base = None
+
+    def _save(self):
+        if not self.store_dir:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = self._path(self.day)
+        _atomic_dump(self._today, path)
+        self._stamp = self._file_stamp(path)
+
+    def refresh(self, at=None):
+        """Re-read the day file if another process (a scheduled scan) wrote it since."""
+        day = pd.Timestamp(at or replay.now()).strftime("%Y-%m-%d")
+        with self._lock:
+            if day != self.day or self._file_stamp(self._path(day)) != self._stamp:
+                self._start_day(day)
+        return self
+
+    def sync(self, snapshot, at=None):
+        """Dashboard entry point: record `snapshot` unless a scan owns the store, then read it.
+
+        Returns the scored snapshot, or None when nothing new was recorded (see latest()).
+        """
+        self.refresh(at)
+        if self.lease.held_by_other():
+            return None
+        return self.record(snapshot, at)
+
+    def baseline(self):
+        """Baseline for the current day, built once and reused for every snapshot."""
+        with self._lock:
+            if self._base is None:
+                self._base = baselines(self.slots, self.day, self.window)
+            return self._base
+
+    @tracing.traced("analytics.active_history.record")
+    def record(self, snapshot, at=None):
+        """Store one snapshot and return it scored; None if it was already recorded."""
+        if snapshot is None or snapshot.empty:
+            return None
+        df = schema.compact_active(snapshot)
+        stamp = df["lastUpdateTime"].max() if "lastUpdateTime" in df else pd.NaT
+        at = pd.Timestamp(stamp if pd.notna(stamp) else (at or replay.now())).floor("s")
+        day = at.strftime("%Y-%m-%d")
+        with self._lock:
+            # Appending to a stale copy would drop what another writer saved since
+            if day != self.day or self._file_stamp(self._path(day)) != self._stamp:
+                self._start_day(day)
+            if self._today is not None and at <= self._today["time"].max():
+                return None
+
+            df.insert(0, "time", at)
+            df["symbol"] = df["symbol"].astype(str)
+            scored = score(df, self.baseline(), self.slot_minutes)
+
+            rows = df.drop(columns=["lastUpdateTime"], errors="ignore")
+            self._today = rows if self._today is None else pd.concat([self._today, rows], ignore_index=True)
+            self._save()
+            return scored
+
+    def today(self):
+        """Every snapshot row recorded today."""
+        return self._today if self._today is not None else pd.DataFrame(columns=["time", "symbol"] + METRICS)
+
+    def anomalies(self, scored, z_threshold=Z_THRESHOLD, min_days=MIN_DAYS):
+        """Rows whose turnover is unusually high for the time of day, strongest first."""
+        if scored is None or scored.empty:
+            return pd.DataFrame()
+        hits = scored[(scored["baseline_days"] >= min_days) & (scored["totalTradedValue_z"] >= z_threshold)]
+        return hits.sort_values("totalTradedValue_z", ascending=False).reset_index(drop=True)
+
+    def latest(self):
+        """Latest recorded snapshot of today, scored against the baseline."""
+        today = self.today()
+        if today.empty:
+            return None
+        last = today[today["time"] == today["time"].max()]
+        return score(last, self.baseline(), self.slot_minutes)
+
+
+if __name__ == "__main__":
+    history = ActiveHistory()
+    scored = history.record(most_active_contracts.most_active_eq())
+    if scored is None:
+        scored = history.latest()
+    if scored is None:
+        print("No most-active snapshot available")
+    else:
+        print(scored[["symbol", "totalTradedValue", "totalTradedValue_z", "volume_z", "baseline_days"]])
+        print(history.anomalies(scored))
@@ -0,0 +1,286 @@
+## Alerting engine
+# Evaluates user-defined rules on every data refresh and delivers alerts to
+# pluggable sinks. Only rows whose watched values changed since the previous
+# refresh are evaluated, and every rule on a source shares one set of column
+# arrays, so hundreds of rules over the F&O universe cost a few milliseconds.
+'''
+A rule fires when its condition turns true for a key (edge-triggered), so a
+condition that stays true alerts once. After firing, a key is muted for
+`debounce` seconds even if the condition flaps off and on again.
+
+Sources fed by the app and CLI (key column in brackets):
+sector_scores   Market Pulse score cube rows              [Symbol]
+liquidation     get_liquidation_zones() signals           [strike, signal]
+option_summary  one row per underlying (pcr, underlying)  [symbol]
+oi_spurts       OI spurts with buildup labels             [symbol]
+most_active     scored most-active snapshot               [symbol]
+
+Rules live in data/alert_rules.json:
+[{"name": "...", "source": "sector_scores", "when": "`R-Score` > 70",
+  "key": "Symbol", "message": "{Symbol} R-Score {R-Score:.1f}", "debounce": 900}]
+'''
+
+import os
+import re
+import json
+import urllib.request
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils import config, expr, replay, tracing
+
+RULES_PATH = config.data_path("alert_rules.json")
+ALERT_LOG = config.cache_path("alerts.jsonl")
+DEFAULT_DEBOUNCE = 900
+_FIELD = re.compile(r"\{([^{}:!]+)")
+
+DEFAULT_RULES = [
+    {"name": "R-Score momentum", "source": "sector_scores", "key": "Symbol",
+     "when": "`Z-Volume` > 1 and `Z-Turnover` > 1 and `Z-Return` > 0.6",
+     "message": "{Symbol}: volume z {Z-Volume:.2f}, turnover z {Z-Turnover:.2f}, return z {Z-Return:.2f}"},
+    {"name": "PCR extreme", "source": "option_summary", "key": "symbol",
+     "when": "pcr > 1.5 or pcr < 0.5", "message": "{symbol} PCR at {pcr:.2f} (possible reversal)"},
+    {"name": "Liquidation signal", "source": "liquidation", "key": ["strike", "signal"],
+     "when": "action not in ['No Action']", "message": "{strike:.0f} {signal} -> {action}"},
+    {"name": "Turnover anomaly", "source": "most_active", "key": "symbol",
+     "when": "totalTradedValue_z >= 2 and baseline_days >= 5",
+     "message": "{symbol} turnover {totalTradedValue_x:.1f}x its usual for this time (z {totalTradedValue_z:.1f})"},
+]
+
+
+class Rule:
+    """A named condition on one source, keyed by one or more columns."""
+
+    def __init__(self, name, source, when, key="Symbol", message=None, debounce=DEFAULT_DEBOUNCE,
+                 severity="info"):
+        self.name = name
+        self.source = source
+        self.when = when
+        self.key = [key] if isinstance(key, str) else list(key)
+        self.message = message or name
+        self.debounce = debounce
+        self.severity = severity
+        self.condition = expr.compile_expr(when)
+        self._template = _FIELD.sub(lambda m: "{" + _field(m.group(1)), self.message)
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+    def to_dict(self):
+        return {"name": self.name, "source": self.source, "when": self.when,
+                "key": self.key[0] if len(self.key) == 1 else self.key, "message": self.message,
+                "debounce": self.debounce, "severity": self.severity}
+
+    def render(self, fields):
+        """Message for one row; "{R-Score:.1f}" style fields may name any column.
+
+        `fields` maps _field(column) -> value, as built by AlertEngine.
+        """
+        try:
+            return self._template.format(**fields)
+        except (KeyError, ValueError, IndexError, TypeError):
+            return f"{self.name}: {', '.join(f'{k}={v}' for k, v in fields.items())}"
+
+
+def _field(name):
+    # str.format cannot address names such as "R-Score" or "% Change"
+    return re.sub(r"\W", "_", str(name))
+
+
+# --- Sinks: callables that receive a list of alert dicts ---
+
+class FileSink:
+    """Append alerts as JSON lines."""
+
+    def __init__(self, path=ALERT_LOG):
+        self.path = path
+
+    def __call__(self, alerts):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, default=str) + "\n")
+
+
+class WebhookSink:
+    """POST alerts as JSON; with url=None it only keeps the payloads (stand-in for tests/offline)."""
+
+    def __init__(self, url=None, timeout=3):
+        self.url = url
+        self.timeout = timeout
+        self.sent = deque(maxlen=500)
+
+    def __call__(self, alerts):
+        payload = json.dumps({"alerts": alerts}, default=str).encode()
+        self.sent.append(payload)
+        if not self.url:
+            return
+        request = urllib.request.Request(self.url, data=payload, headers={"Content-Type": "application/json"})
+        try:
+            with tracing.span("alerts.webhook"):
+                urllib.request.urlopen(request, timeout=self.timeout).close()
+        except Exception as e:
+            print(f"Webhook delivery failed: {e}")
+
+
+class MemorySink:
+    """Keep the latest alerts in memory for the dashboard."""
+
+    def __init__(self, maxlen=200):
+        self.alerts = deque(maxlen=maxlen)
+
+    def __call__(self, alerts):
+        self.alerts.extend(alerts)
+
+    def recent(self, n=20):
+        return list(self.alerts)[-n:][::-1]
+
+
+def _changed(prev, new, columns):
+    """Mask of rows in `new` that are new keys or differ from `prev` in `columns`."""
+    if prev is None:
+        return np.ones(len(new), dtype=bool)
+    old = prev.reindex(new.index)
+    mask = old.index.isin(prev.index)
+    changed = ~mask
+    for column in columns:
+        if column not in new.columns:
+            continue
+        a = new[column].to_numpy(dtype=object) if column in old.columns else None
+        if a is None:
+            return np.ones(len(new), dtype=bool)
+        b = old[column].to_numpy(dtype=object)
+        same = (a == b) | (pd.isna(a) & pd.isna(b))
+        changed |= ~same.astype(bool)
+    return changed
+
+
+class AlertEngine:
+    """Incremental rule evaluation with edge triggering, debounce and sinks."""
+
+    def __init__(self, rules=(), sinks=(), clock=None):
+        self.rules = []
+        self.sinks = list(sinks)
+        self.clock = clock or replay.now
+        self._frames = {}      # (source, key) -> last frame indexed by key
+        self._active = {}      # rule name -> keys whose condition is currently true
+        self._muted = {}       # (rule name, key value) -> muted until
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        rule = rule if isinstance(rule, Rule) else Rule.from_dict(rule)
+        self.remove_rule(rule.name)
+        self.rules.append(rule)
+        return rule
+
+    def remove_rule(self, name):
+        self.rules = [r for r in self.rules if r.name != name]
+        self._active.pop(name, None)
+
+    def groups(self, source):
+        """Rules of a source grouped by key columns."""
+        out = {}
+        for rule in self.rules:
+            if rule.source == source:
+                out.setdefault(tuple(rule.key), []).append(rule)
+        return out
+
+    @tracing.traced("analytics.alerts.update")
+    def update(self, source, frame):
+        """Evaluate every rule of `source` on the changed rows of `frame`; returns fired alerts."""
+        if frame is None or frame.empty:
+            return []
+        now = pd.Timestamp(self.clock())
+        stamp = now.isoformat()
+        fired = []
+        for key, rules in self.groups(source).items():
+            if not set(key) <= set(frame.columns):
+                continue
+            watched = sorted(set().union(*(r.condition.columns for r in rules)) & set(frame.columns))
+            new = frame.drop_duplicates(list(key), keep="last").set_index(list(key))
+            prev = self._frames.get((source, key))
+            changed = _changed(prev, new, watched)
+            self._frames[(source, key)] = new[watched].copy()
+            if not changed.any():
+                continue
+            rows = new[changed]
+            arrays = expr.column_arrays(rows, watched)
+            keys = rows.index.tolist()
+            checked = set(keys)
+            records = None
+            for rule in rules:
+                try:
+                    mask = rule.condition.evaluate(arrays, len(rows))
+                except expr.ExpressionError as e:
+                    print(f"Alert rule '{rule.name}' skipped: {e}")
+                    continue
+                hits = np.flatnonzero(mask)
+                debounce = pd.Timedelta(seconds=rule.debounce)
+                active = self._active.get(rule.name, set())
+                now_true = {keys[i] for i in hits}
+                self._active[rule.name] = (active - checked) | now_true
+                for i in hits:
+                    k = keys[i]
+                    state = (rule.name, k)
+                    if k in active or self._muted.get(state, now) > now:
+                        continue
+                    self._muted[state] = now + debounce
+                    if records is None:
+                        records = rows.reset_index().rename(columns=_field).to_dict("records")
+                    fired.append({"time": stamp, "rule": rule.name, "source": source,
+                                  "key": str(k), "severity": rule.severity, "message": rule.render(records[i])})
+        if fired:
+            for sink in self.sinks:
+                try:
+                    sink(fired)
+                except Exception as e:
+                    print(f"Alert sink {type(sink).__name__} failed: {e}")
+        return fired
+
+
+def load_rules(path=RULES_PATH):
+    """Rules from `path`, or the built-in defaults when it does not exist."""
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return [Rule.from_dict(spec) for spec in json.load(f)]
+    return [Rule.from_dict(spec) for spec in DEFAULT_RULES]
+
+
+def save_rules(rules, path=RULES_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump([r.to_dict() for r in rules], f, indent=2)
+
+
+def option_summary(symbol, chain):
+    """One-row option_summary frame (PCR and spot) from an option chain."""
+    ce = chain["CE.openInterest"].sum()
+    pe = chain["PE.openInterest"].sum()
+    spot = chain["CE.underlyingValue"].dropna() if "CE.underlyingValue" in chain else pd.Series(dtype="float64")
+    return pd.DataFrame([{"symbol": symbol, "pcr": pe / ce if ce else np.nan,
+                          "underlying": spot.iloc[0] if len(spot) else np.nan}])
+
+
+if __name__ == "__main__":
+    import time
+
+    rng = np.random.default_rng(0)
+    n_stocks, n_rules = 215, 300
+    rules = [Rule(f"rule {i}", "sector_scores", f"`R-Score` > {50 + i % 40} and `Z-Volume` > {i % 3}")
+             for i in range(n_rules)]
+    memory = MemorySink()
+    engine = AlertEngine(rules, [memory])
+    frame = pd.DataFrame({"Symbol": [f"S{i}" for i in range(n_stocks)],
+                          "R-Score": rng.uniform(0, 100, n_stocks), "Z-Volume": rng.normal(0, 1.5, n_stocks)})
+    start = time.perf_counter()
+    engine.update("sector_scores", frame)
+    first = time.perf_counter() - start
+    frame.loc[rng.choice(n_stocks, 10, replace=False), "R-Score"] += 20
+    start = time.perf_counter()
+    engine.update("sector_scores", frame)
+    print(f"{n_rules} rules x {n_stocks} stocks: full {first * 1000:.1f} ms, "
+          f"10 changed {(time.perf_counter() - start) * 1000:.1f} ms, {len(memory.alerts)} alerts")
@@ -0,0 +1,147 @@
+## Data API client
+# Thin client for utils/api_server.py. Keeps one persistent HTTP connection
+# per thread (TCP or Unix socket) and rebuilds DataFrames with their dtypes,
+# so app.py pages work unchanged whether data is local or served.
+'''
+TRADE_ANALYST_API=http://127.0.0.1:8765        TCP
+TRADE_ANALYST_API=unix:/tmp/trade_analyst.sock  Unix socket
+'''
+
+import os
+import json
+import socket
+import threading
+import http.client
+from urllib.parse import urlencode, urlsplit
+
+import pandas as pd
+
+from utils import tracing
+
+ENV = "TRADE_ANALYST_API"
+PAGE_SIZE = 5000
+
+
+class ApiError(RuntimeError):
+    pass
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def _restore(frame, meta):
+    df = pd.DataFrame(frame["data"], columns=frame["columns"])
+    for column, dtype in meta["dtypes"].items():
+        if column not in df:
+            continue
+        try:
+            if dtype.startswith("datetime"):
+                df[column] = pd.to_datetime(df[column])
+            elif dtype == "category":
+                df[column] = df[column].astype("category")
+            elif dtype not in ("object", "str", "string"):
+                df[column] = df[column].astype(dtype)
+        except (TypeError, ValueError):
+            pass    # e.g. an integer column with missing values stays float
+    return df
+
+
+def _with_status(df, meta):
+    # Set after concat: pandas compares attrs of concatenated frames, which fails on DataFrames
+    if meta.get("fetch_status") is not None:
+        df.attrs["fetch_status"] = pd.DataFrame(meta["fetch_status"])
+    return df
+
+
+class DataClient:
+    """Tables and quotes from the data API, over a reused connection per thread."""
+
+    def __init__(self, address, timeout=60):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.address.startswith("unix:"):
+                conn = _UnixConnection(self.address[5:], self.timeout)
+            else:
+                url = urlsplit(self.address)
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def get(self, path, params=None):
+        """Decoded JSON of GET `path`; reconnects once if the kept-alive socket was closed."""
+        target = path + ("?" + urlencode(params, doseq=True) if params else "")
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                with tracing.span("api.request"):
+                    conn.request("GET", target)
+                    response = conn.getresponse()
+                    body = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 2:
+                    raise
+        payload = json.loads(body)
+        if response.status != 200:
+            raise ApiError(f"{path}: {payload.get('error', response.status)}")
+        return payload
+
+    def page(self, name, offset=0, limit=PAGE_SIZE, **params):
+        """(DataFrame, total rows) for one page of table `name`."""
+        payload = self.get(f"/tables/{name}", dict(params, offset=offset, limit=limit))
+        meta = payload["meta"]
+        return _with_status(_restore(payload["frame"], meta), meta), meta["total"]
+
+    def table(self, name, **params):
+        """The whole table, fetched page by page, with its index restored."""
+        params = {k: v for k, v in params.items() if v is not None}
+        payload = self.get(f"/tables/{name}", dict(params, offset=0, limit=PAGE_SIZE))
+        meta = payload["meta"]
+        parts = [_restore(payload["frame"], meta)]
+        for offset in range(PAGE_SIZE, meta["total"], PAGE_SIZE):
+            parts.append(self.page(name, offset, PAGE_SIZE, **params)[0])
+        df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        df = df.set_index(meta["index"]) if meta["index"] else df
+        return _with_status(df, meta)
+
+    def quote(self, instruments):
+        return self.get("/quote", {"i": list(instruments)})
+
+    def status(self):
+        return self.get("/status")
+
+
+class RemoteKite:
+    """Just enough of KiteConnect for the pages: quote() and ltp() through the API."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def quote(self, *instruments):
+        if len(instruments) == 1 and isinstance(instruments[0], (list, tuple)):
+            instruments = instruments[0]
+        return self.client.quote([str(i) for i in instruments])
+
+    def ltp(self, *instruments):
+        return {k: {"last_price": v["last_price"]} for k, v in self.quote(*instruments).items()}
+
+
+def from_env():
+    """DataClient for $TRADE_ANALYST_API, or None when the app should fetch locally."""
+    address = os.environ.get(ENV)
+    return DataClient(address) if address else None
@@ -0,0 +1,297 @@
+## Data API server
+# One asyncio process owns the Kite session, the caches and every fetcher and
+# serves tables as JSON over HTTP (TCP or a Unix socket). Dashboards become
+# thin clients (utils/api_client.py), so many Streamlit instances share one
+# session, one cache and one set of API rate limits.
+'''
+python -m utils.api_server --port 8765                 # http://127.0.0.1:8765
+python -m utils.api_server --unix /tmp/trade_analyst.sock
+TRADE_ANALYST_API=http://127.0.0.1:8765 streamlit run app.py
+
+GET /health                         liveness and table list
+GET /tables/<name>?param=value      one page of a table, parameters per table (TABLES)
+      &where=<expression>            server-side filter (utils/expr.py syntax)
+      &sort=<column>&ascending=1     server-side sort
+      &offset=0&limit=1000           pagination (limit <= MAX_PAGE)
+      &columns=a,b                   projection
+GET /quote?i=NSE:NIFTY 50&i=...     kite.quote() passthrough
+GET /status                         fetch status and circuit breakers
+
+Fetchers run on worker threads. Concurrent requests for the same table and
+parameters share one fetch (single flight), and results are cached for the
+table's TTL, so N dashboards cost the same API calls as one.
+'''
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+
+from utils import config, expr, fetch, ratelimit, replay, tracing
+
+PAGE_SIZE = 1000
+MAX_PAGE = 10000
+SECTOR_JSON = config.data_path("sector_data.json")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error", 502: "Bad Gateway"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --- Table loaders: (service, params) -> DataFrame, run on a worker thread ---
+
+def _scores(service, params):
+    from utils import dataplane, sector_batch
+    cube = dataplane.read("scores", max_age=300)
+    if cube is None:
+        cube = sector_batch.score_all(service.kite(), params.get("json", service.sector_json))
+    return cube
+
+
+def _sector(service, params):
+    from utils import sector_batch
+    if "sector" not in params:
+        raise ApiError(400, "sector is required")
+    return sector_batch.sector_view(service.table("scores", {}), params["sector"])
+
+
+def _option_chain(service, params):
+    symbol = params.get("symbol", "NIFTY")
+    if params.get("source", "nse") == "kite":
+        from utils import kite_chain
+        return kite_chain.build_chain(service.kite(), symbol)
+    from utils import OI
+    window = params.get("strike_window")
+    nearest = params.get("nearest")
+    return OI.get_data(symbol, strike_window=int(window) if window else None,
+                       nearest=int(nearest) if nearest else None, min_volume=int(params.get("min_volume", 0)))
+
+
+def _liquidation(service, params):
+    from utils import liquidation_shift
+    chain = service.table("option_chain", {k: v for k, v in params.items() if k in ("symbol", "source")})
+    return liquidation_shift.get_liquidation_zones(chain).dropna(subset=["action"])
+
+
+def _oi_spurts(service, params):
+    from utils import Ch_oi_oi_spurt
+    return Ch_oi_oi_spurt.get_oi_spurts()
+
+
+def _most_active(service, params):
+    from utils import most_active_contracts
+    return most_active_contracts.most_active_eq()
+
+
+def _sectorials(service, params):
+    from utils import sectorials
+    return sectorials.sectorials(service.kite())
+
+
+def _indicators(service, params):
+    from utils import indicators
+    return indicators.load_bundled().scan()
+
+
+def _fo_quotes(service, params):
+    from utils import breadth, sector_batch
+    return sector_batch.get_quotes(service.kite(), breadth.BreadthEngine.from_files(store_dir=None).stocks())
+
+
+def _delivery(service, params):
+    from utils import delivery
+    return delivery.load()
+
+
+# name -> (loader, ttl seconds, parameters that select the data)
+TABLES = {
+    "scores": (_scores, 300, ()),
+    "sector": (_sector, 300, ("sector",)),
+    "option_chain": (_option_chain, 60, ("symbol", "source", "strike_window", "nearest", "min_volume")),
+    "liquidation": (_liquidation, 60, ("symbol", "source")),
+    "oi_spurts": (_oi_spurts, 300, ()),
+    "most_active": (_most_active, 300, ()),
+    "sectorials": (_sectorials, 300, ()),
+    "indicators": (_indicators, 3600, ()),
+    "delivery": (_delivery, 3600, ()),
+    "fo_quotes": (_fo_quotes, 60, ()),
+}
+
+
+class DataService:
+    """Kite session, TTL caches and single-flight loading shared by every request."""
+
+    def __init__(self, sector_json=SECTOR_JSON, kite_factory=None):
+        self.sector_json = sector_json
+        self._kite_factory = kite_factory
+        self._kite = None
+        self._cache = {}        # (name, params) -> (expires, DataFrame)
+        self._inflight = {}     # (name, params) -> threading.Event
+        self._lock = threading.Lock()
+
+    def kite(self):
+        with self._lock:
+            if self._kite is None:
+                from utils import kite_session
+                self._kite = (self._kite_factory or kite_session.gen_ses)()
+            return self._kite
+
+    def table(self, name, params):
+        """Cached table; concurrent callers with the same key wait for one load."""
+        if name not in TABLES:
+            raise ApiError(404, f"unknown table '{name}'")
+        loader, ttl, selectors = TABLES[name]
+        selected = {k: params[k] for k in selectors if params.get(k) not in (None, "")}
+        key = (name, tuple(sorted(selected.items())))
+        while True:
+            with self._lock:
+                hit = self._cache.get(key)
+                if hit and hit[0] > time.monotonic():
+                    return hit[1]
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    break
+            event.wait()
+        try:
+            with tracing.span(f"api.load.{name}"):
+                df = loader(self, selected)
+            with self._lock:
+                self._cache[key] = (time.monotonic() + ttl, df)
+            return df
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def quote(self, keys):
+        return fetch.call("kite.quote", self.kite().quote, keys, at=fetch.deadline(10),
+                          limiter=ratelimit.kite_limiter)
+
+
+def page(df, params):
+    """(meta, frame) for one page of `df` after filter, sort and projection."""
+    index = [n for n in df.index.names if n is not None]
+    if index:
+        df = df.reset_index()
+    if params.get("where"):
+        try:
+            df = df[expr.compile_expr(params["where"])(df)]
+        except expr.ExpressionError as e:
+            raise ApiError(400, str(e))
+    if params.get("sort") in df.columns:
+        df = df.sort_values(params["sort"], ascending=params.get("ascending", "0") in ("1", "true"))
+    if params.get("columns"):
+        wanted = [c for c in params["columns"].split(",") if c in df.columns]
+        df = df[list(dict.fromkeys(index + wanted))]
+    try:
+        offset = max(int(params.get("offset", 0)), 0)
+        limit = min(max(int(params.get("limit", PAGE_SIZE)), 1), MAX_PAGE)
+    except ValueError:
+        raise ApiError(400, "offset and limit must be integers")
+    rows = df.iloc[offset:offset + limit]
+    meta = {"total": len(df), "offset": offset, "limit": limit, "index": index,
+            "dtypes": {str(c): str(t) for c, t in rows.dtypes.items()}, "as_of": replay.now().isoformat()}
+    status = df.attrs.get("fetch_status")
+    if status is not None:
+        # Per-instrument fetch outcome, so thin clients can still show partial-data warnings
+        meta["fetch_status"] = json.loads(status.to_json(orient="records", date_format="iso"))
+    return meta, rows
+
+
+def _body(meta, rows):
+    # to_json writes the rows straight to text; only the small meta goes through json.dumps
+    # double_precision=15 (pandas' maximum) sends 15 decimals; the default of 10 visibly rounds prices and greeks
+    frame = rows.to_json(orient="split", index=False, date_format="iso", date_unit="s", double_precision=15)
+    return ('{"meta": ' + json.dumps(meta, default=str) + ', "frame": ' + frame + "}").encode()
+
+
+class Server:
+    """Minimal HTTP/1.1 keep-alive JSON server on asyncio streams."""
+
+    def __init__(self, service=None):
+        self.service = service or DataService()
+
+    async def dispatch(self, method, target):
+        if method != "GET":
+            raise ApiError(400, f"unsupported method {method}")
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [p for p in url.path.split("/") if p]
+        if parts == ["health"]:
+            return json.dumps({"ok": True, "tables": list(TABLES), "as_of": replay.now().isoformat()}).encode()
+        if parts == ["status"]:
+            return json.dumps({"fetch": fetch.status_frame().to_dict("records"),
+                               "breakers": fetch.breaker_frame().to_dict("records")}, default=str).encode()
+        if parts == ["quote"]:
+            keys = parse_qs(url.query).get("i", [])
+            if not keys:
+                raise ApiError(400, "no instruments (?i=...)")
+            quotes = await asyncio.to_thread(self.service.quote, keys)
+            return json.dumps(quotes, default=str).encode()
+        if len(parts) == 2 and parts[0] == "tables":
+            df = await asyncio.to_thread(self.service.table, parts[1], params)
+            return _body(*page(df, params))
+        raise ApiError(404, f"no route for {url.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+                try:
+                    status, body = 200, await self.dispatch(method, target)
+                except ApiError as e:
+                    status, body = e.status, json.dumps({"error": str(e)}).encode()
+                except Exception as e:
+                    print(f"API error for {target}: {e}")
+                    status, body = 502, json.dumps({"error": str(e)}).encode()
+                keep = headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                              f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep else 'close'}"
+                              "\r\n\r\n").encode() + body)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None):
+        if unix:
+            if os.path.exists(unix):
+                os.remove(unix)
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        print(f"Data API listening on {unix or f'http://{host}:{port}'}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Trade Analyst data over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--sector-json", default=SECTOR_JSON)
+    args = parser.parse_args()
+    asyncio.run(Server(DataService(args.sector_json)).serve(args.host, args.port, args.unix))
@@ -0,0 +1,336 @@
+## Candle backfill
+# Keeps data/stock_30.csv, stock_1h.csv and stock_1d.csv current from Kite's
+# historical_data API. Finds the sessions each instrument is missing (or has
+# only partly) per interval, turns them into as few requests as the API's
+# per-request span allows, fetches them on a worker pool under the shared
+# historical rate limit, and merges the results into the store.
+'''
+python -m utils.backfill --dry-run                 # list the gaps and the requests
+python -m utils.backfill --interval 30 --since 2025-01-01 --workers 3
+
+Gap detection: the session calendar is every day that any instrument has
+candles for, plus weekdays outside the stored range (learned holidays
+excluded). An instrument is missing a session when it has no candles that
+day, or fewer bars than a full session (the most common bar count in the
+store). Today counts only after the close.
+
+Requests: gap ranges of one instrument less than MERGE_DAYS sessions apart are
+fetched together (one request instead of several), then split at the API's
+MAX_DAYS span per interval.
+
+Progress (data/cache/backfill): every finished request is saved as a part
+file and logged in progress.json. An interrupted run picks up from there:
+the same gaps give the same request ids and finished ones are skipped.
+merge() folds the parts into the store CSV (atomically) and clears them;
+requests that returned nothing stay logged and are not repeated.
+Weekdays inside the stored range of 3+ requested instruments on which no
+instrument has candles are recorded in holidays.json.
+'''
+
+import os
+import json
+import pickle
+import argparse
+import threading
+from datetime import time as dtime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils import config, fetch, ratelimit, replay, schema, tracing
+
+INTERVALS = {"30": "30minute", "1h": "60minute", "1d": "day"}
+# Longest span Kite serves per historical_data request, in calendar days
+MAX_DAYS = {"30": 200, "1h": 400, "1d": 2000}
+MERGE_DAYS = 5
+WORK_DIR = config.cache_path("backfill")
+FO_PATH = config.data_path("data_stock_fo.csv")
+SESSION_CLOSE = dtime(15, 30)
+CANDLE_COLUMNS = ["Symbol", "instrument_token", "date", "open", "high", "low", "close", "volume"]
+JOB_COLUMNS = ["id", "instrument_token", "Symbol", "interval", "start", "end"]
+
+
+def store_path(interval):
+    return config.data_path(f"stock_{interval}.csv")
+
+
+def last_session(now=None):
+    """Latest day whose session has closed."""
+    now = pd.Timestamp(now or replay.now())
+    day = now.normalize()
+    return day if now.time() >= SESSION_CLOSE else day - timedelta(days=1)
+
+
+def calendar(candles, start, end, holidays=()):
+    """Expected session days in [start, end]."""
+    traded = pd.DatetimeIndex(candles["date"].dt.normalize().unique()) if not candles.empty else pd.DatetimeIndex([])
+    weekdays = pd.bdate_range(start, end)
+    if len(traded):
+        # Inside the stored range a weekday nobody traded on was a holiday
+        weekdays = weekdays[(weekdays < traded.min()) | (weekdays > traded.max())]
+    days = traded.union(weekdays).difference(pd.DatetimeIndex(pd.to_datetime(list(holidays))))
+    return days[(days >= start) & (days <= end)].sort_values()
+
+
+def find_gaps(candles, interval, start=None, end=None, universe=None, holidays=()):
+    """Missing session ranges per instrument: instrument_token, Symbol, start, end, sessions."""
+    end = pd.Timestamp(end) if end is not None else last_session()
+    start = pd.Timestamp(start) if start is not None else (
+        candles["date"].min().normalize() if not candles.empty else end - timedelta(days=30))
+    days = calendar(candles, start, end, holidays)
+
+    symbols = {}
+    if not candles.empty:
+        symbols.update(candles.drop_duplicates("instrument_token").set_index("instrument_token")["Symbol"]
+                       .astype(str).to_dict())
+    for stock in universe or []:
+        symbols.setdefault(int(stock["instrument_token"]), stock["symbol"])
+    if not symbols or not len(days):
+        return pd.DataFrame(columns=["instrument_token", "Symbol", "start", "end", "sessions"])
+
+    tokens = np.array(list(symbols), dtype="int64")
+    have = np.zeros((len(tokens), len(days)), dtype=bool)
+    if not candles.empty:
+        bars = candles.groupby([candles["instrument_token"].astype("int64"), candles["date"].dt.normalize()],
+                               observed=True).size()
+        full = 1 if interval == "1d" else int(bars.mode().iloc[0])
+        complete = bars[bars >= full].index
+        row = pd.Index(tokens).get_indexer(complete.get_level_values(0))
+        col = days.get_indexer(complete.get_level_values(1))
+        ok = (row >= 0) & (col >= 0)
+        have[row[ok], col[ok]] = True
+
+    # Runs of consecutive missing sessions per instrument
+    missing = np.argwhere(~have)
+    if not len(missing):
+        return pd.DataFrame(columns=["instrument_token", "Symbol", "start", "end", "sessions"])
+    row, col = missing[:, 0], missing[:, 1]
+    new_run = np.r_[True, (row[1:] != row[:-1]) | (col[1:] != col[:-1] + 1)]
+    run = np.cumsum(new_run) - 1
+    first = np.flatnonzero(new_run)
+    last = np.r_[first[1:] - 1, len(row) - 1]
+    return pd.DataFrame({
+        "instrument_token": tokens[row[first]],
+        "Symbol": [symbols[t] for t in tokens[row[first]]],
+        "start": days[col[first]],
+        "end": days[col[last]],
+        "sessions": np.bincount(run),
+    })
+
+
+def plan(gaps, interval, merge_days=MERGE_DAYS, max_days=None):
+    """Request list (JOB_COLUMNS) covering `gaps`: nearby ranges joined, long ones split."""
+    max_days = max_days or MAX_DAYS[interval]
+    jobs = []
+    for token, ranges in gaps.sort_values(["instrument_token", "start"]).groupby("instrument_token", sort=False):
+        symbol = ranges["Symbol"].iloc[0]
+        spans = []
+        for start, end in zip(ranges["start"], ranges["end"]):
+            if spans and np.busday_count(spans[-1][1].date(), start.date()) <= merge_days \
+                    and (end - spans[-1][0]).days < max_days:
+                spans[-1][1] = end
+            else:
+                spans.append([start, end])
+        for start, end in spans:
+            while start <= end:
+                stop = min(end, start + timedelta(days=max_days - 1))
+                jobs.append((f"{interval}_{token}_{start:%Y%m%d}_{stop:%Y%m%d}", int(token), symbol, interval,
+                             start, stop))
+                start = stop + timedelta(days=1)
+    return pd.DataFrame(jobs, columns=JOB_COLUMNS)
+
+
+def to_candles(rows, token, symbol, interval):
+    """historical_data() rows in the store layout (naive exchange-time dates)."""
+    df = pd.DataFrame(rows, columns=["date", "open", "high", "low", "close", "volume"])
+    dates = pd.to_datetime(df["date"])
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    df["date"] = dates.dt.normalize() if interval == "1d" else dates
+    df.insert(0, "instrument_token", token)
+    df.insert(0, "Symbol", symbol)
+    return df[CANDLE_COLUMNS]
+
+
+class Backfill:
+    """Runs planned requests on a worker pool with resumable progress."""
+
+    def __init__(self, kite, work_dir=WORK_DIR, workers=3, limiter=None, seconds=60):
+        self.kite = kite
+        self.work_dir = work_dir
+        self.workers = workers
+        self.limiter = limiter or ratelimit.historical_limiter
+        self.seconds = seconds
+        self._lock = threading.Lock()
+        self.progress = self._load("progress.json", {})
+        self.holidays = set(self._load("holidays.json", []))
+
+    def _load(self, name, default):
+        path = os.path.join(self.work_dir, name)
+        if not os.path.exists(path):
+            return default
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _dump(self, name, value):
+        os.makedirs(self.work_dir, exist_ok=True)
+        path = os.path.join(self.work_dir, name)
+        with open(path + ".tmp", "w") as f:
+            json.dump(value, f, indent=1, default=str)
+        os.replace(path + ".tmp", path)
+
+    def _part(self, job_id):
+        return os.path.join(self.work_dir, job_id.split("_", 1)[0], f"{job_id}.pkl")
+
+    def pending(self, jobs):
+        """Jobs not finished by an earlier (possibly interrupted) run."""
+        done = {k for k, v in self.progress.items() if v["status"] in ("done", "empty")}
+        return jobs[~jobs["id"].isin(done)]
+
+    def _fetch(self, job):
+        rows = fetch.call("kite.historical", self.kite.historical_data, job.instrument_token,
+                          job.start.to_pydatetime(), (job.end + timedelta(days=1) - timedelta(seconds=1)).to_pydatetime(),
+                          INTERVALS[job.interval], key=job.id, at=fetch.deadline(self.seconds),
+                          limiter=self.limiter)
+        candles = to_candles(rows, job.instrument_token, job.Symbol, job.interval)
+        if not candles.empty:
+            path = self._part(job.id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(candles, f)
+            os.replace(path + ".tmp", path)
+        return candles
+
+    def _finish(self, job, status, rows=0, error=None):
+        with self._lock:
+            self.progress[job.id] = {"status": status, "rows": rows, "error": error,
+                                     "start": f"{job.start:%Y-%m-%d}", "end": f"{job.end:%Y-%m-%d}"}
+            self._dump("progress.json", self.progress)
+
+    @tracing.traced("backfill.run")
+    def run(self, jobs):
+        """Fetch every pending job; returns the jobs with status and row counts."""
+        todo = self.pending(jobs)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as pool:
+            futures = {pool.submit(self._fetch, job): job for job in todo.itertuples(index=False)}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    candles = future.result()
+                    self._finish(job, "done" if len(candles) else "empty", len(candles))
+                except Exception as e:
+                    print(f"Backfill {job.Symbol} {job.interval} {job.start:%Y-%m-%d}..{job.end:%Y-%m-%d} failed: {e}")
+                    self._finish(job, "error", error=str(e))
+        status = pd.DataFrame.from_dict(self.progress, orient="index")
+        return jobs.merge(status, left_on="id", right_index=True, how="left")
+
+    def merge(self, interval, path=None):
+        """Fold the fetched parts into the store CSV; returns the rows added."""
+        path = path or store_path(interval)
+        folder = os.path.join(self.work_dir, interval)
+        parts = [os.path.join(folder, f) for f in sorted(os.listdir(folder))] if os.path.isdir(folder) else []
+        if not parts:
+            return 0
+        frames = []
+        for part in parts:
+            with open(part, "rb") as f:
+                frames.append(pickle.load(f))
+        fetched = pd.concat(frames, ignore_index=True)
+        store = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame(columns=CANDLE_COLUMNS)
+        store = store.drop(columns=[c for c in store.columns if c.startswith("Unnamed:")])
+        store["date"] = pd.to_datetime(store["date"])
+        combined = pd.concat([store[CANDLE_COLUMNS], fetched], ignore_index=True)
+        combined["instrument_token"] = combined["instrument_token"].astype("int64")
+        before = len(store)
+        # Instruments keep their order in the store; new ones go last
+        rank = combined["instrument_token"].map({t: i for i, t in enumerate(combined["instrument_token"].unique())})
+        combined = combined.drop_duplicates(["instrument_token", "date"], keep="last") \
+            .assign(_rank=rank).sort_values(["_rank", "date"], kind="stable") \
+            .drop(columns="_rank").reset_index(drop=True)
+        self._learn_holidays(interval, combined)
+        combined["date"] = combined["date"].dt.strftime("%Y-%m-%d" if interval == "1d" else "%Y-%m-%d %H:%M:%S")
+        combined.to_csv(path + ".tmp", index=True)
+        os.replace(path + ".tmp", path)
+        for part in parts:
+            os.remove(part)
+        with self._lock:
+            # Empty results stay logged so the same range is not asked for again
+            self.progress = {k: v for k, v in self.progress.items()
+                             if not (k.startswith(f"{interval}_") and v["status"] == "done")}
+            self._dump("progress.json", self.progress)
+        return len(combined) - before
+
+    def _learn_holidays(self, interval, candles):
+        """Record weekdays that 3+ finished requests asked for and no instrument traded on.
+
+        `candles` is the merged store. A request only counts between its instrument's
+        first and last candle, so days before a listing (or after a delisting) are not
+        taken for holidays; a learned holiday that has candles after all is dropped.
+        """
+        days = candles["date"].dt.normalize()
+        traded = set(days.unique())
+        span = days.groupby(candles["instrument_token"]).agg(["min", "max"])
+        covered = []
+        for k, v in self.progress.items():
+            if not k.startswith(f"{interval}_") or v["status"] not in ("done", "empty"):
+                continue
+            token = int(k.split("_")[1])
+            if token not in span.index:
+                continue
+            first, last = span.loc[token]
+            start, end = max(pd.Timestamp(v["start"]), first), min(pd.Timestamp(v["end"]), last)
+            if start <= end:
+                covered.append(pd.bdate_range(start, end).to_numpy())
+        learned = set(self.holidays)
+        if covered:
+            counts = pd.Series(np.concatenate(covered)).value_counts()
+            learned.update(f"{d:%Y-%m-%d}" for d, n in counts.items() if n >= 3 and d not in traded)
+        learned -= {f"{d:%Y-%m-%d}" for d in traded}
+        if learned != self.holidays:
+            self.holidays = learned
+            self._dump("holidays.json", sorted(self.holidays))
+
+
+def load_universe(path=FO_PATH):
+    fo = pd.read_csv(path).dropna(subset=["instrument_token"])
+    return [{"symbol": s, "instrument_token": int(t)} for s, t in zip(fo["Symbol"], fo["instrument_token"])]
+
+
+def backfill(kite, intervals=("30", "1h", "1d"), since=None, until=None, workers=3, work_dir=WORK_DIR,
+             universe=None, dry_run=False):
+    """Detect gaps, fetch them and merge; returns the job table of every interval."""
+    runner = Backfill(kite, work_dir, workers)
+    universe = load_universe() if universe is None else universe
+    results = []
+    for interval in intervals:
+        path = store_path(interval)
+        candles = schema.load_candles(path) if os.path.exists(path) else pd.DataFrame(columns=CANDLE_COLUMNS)
+        gaps = find_gaps(candles, interval, since, until, universe, runner.holidays)
+        jobs = plan(gaps, interval)
+        print(f"{interval}: {int(gaps['sessions'].sum()) if len(gaps) else 0} missing sessions in "
+              f"{len(gaps)} ranges -> {len(jobs)} requests ({len(runner.pending(jobs))} pending)")
+        if dry_run or jobs.empty:
+            results.append(jobs)
+            continue
+        done = runner.run(jobs)
+        added = runner.merge(interval, path)
+        print(f"{interval}: {added} candles added, {int((done['status'] == 'error').sum())} requests failed")
+        results.append(done)
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=JOB_COLUMNS)
+
+
+if __name__ == "__main__":
+    from utils import kite_session
+
+    parser = argparse.ArgumentParser(description="Backfill the candle store from Kite historical data")
+    parser.add_argument("--interval", action="append", choices=list(INTERVALS), help="repeatable (default all)")
+    parser.add_argument("--since", help="first session to check (default: the store's first date)")
+    parser.add_argument("--until", help="last session to check (default: the last closed session)")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true", help="only list gaps and requests")
+    args = parser.parse_args()
+    kite = None if args.dry_run else kite_session.gen_ses()
+    jobs = backfill(kite, args.interval or list(INTERVALS), args.since, args.until, args.workers,
+                    dry_run=args.dry_run)
+    print(jobs.head(20).to_string())
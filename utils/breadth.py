@@ -0,0 +1,304 @@
+## Market breadth
+# Advance/decline, new intraday highs and lows, % above VWAP and up/down volume
+# for the whole F&O universe and every sector, kept incrementally: each quote
+# update recomputes only the stocks whose quote changed and adds the
+# difference to the running totals. Every update also appends one row per
+# scope to an intraday series, so charts read stored numbers.
+'''
+Per stock (from its latest quote):
+advancing / declining / unchanged   last price vs previous close
+new_highs / new_lows                last price at the day's high / low so far
+above_vwap / with_vwap              last price above average_price (VWAP); with_vwap counts
+                                    the stocks that report one
+up_volume / down_volume             day volume of advancing / declining stocks
+stocks                              stocks with at least one quote
+
+Scopes: "F&O" (data/data_stock_fo.csv plus every sector member) and each
+sector in sector_data.json; a stock counts in every sector that lists it.
+Stocks missing from an update keep their last state.
+
+Storage (data/cache/breadth/<YYYY-mm-dd>.pkl): an append-only log of
+pickles, a header (tokens, scopes) then one small record per update (time,
+the changed stocks' rows, scope totals). A restart replays it to resume the
+series. One writer per store (utils/lease.py): the poller below owns it while
+it runs and the dashboard reads the records it appends.
+
+python -m utils.breadth                  # poll every minute until 15:30
+python -m utils.breadth --interval 30 --polls 10
+'''
+
+import os
+import json
+import pickle
+import argparse
+import threading
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils import config, lease, replay, tracing
+
+FO_PATH = config.data_path("data_stock_fo.csv")
+JSON_PATH = config.data_path("sector_data.json")
+STORE_DIR = config.cache_path("breadth")
+POLL_SECONDS = 60
+SESSION_END = dtime(15, 30)
+SCOPE = "F&O"
+COUNTS = ["advancing", "declining", "unchanged", "new_highs", "new_lows", "above_vwap", "with_vwap",
+          "up_volume", "down_volume", "stocks"]
+RATIOS = ["net_advances", "ad_ratio", "pct_advancing", "pct_above_vwap", "up_down_volume"]
+
+
+def load_universe(fo_path=FO_PATH, json_path=JSON_PATH):
+    """(stocks, sector_map) from the F&O list and sector_data.json."""
+    with open(json_path, "r") as f:
+        sector_map = json.load(f)
+    fo = pd.read_csv(fo_path).dropna(subset=["instrument_token"])
+    stocks = [{"symbol": s, "instrument_token": int(t)} for s, t in zip(fo["Symbol"], fo["instrument_token"])]
+    return stocks, sector_map
+
+
+def contributions(last, close, high, low, volume, vwap):
+    """One row of COUNTS per stock (float64 matrix); NaN prices count nowhere."""
+    last, close = np.asarray(last, "float64"), np.asarray(close, "float64")
+    high, low = np.asarray(high, "float64"), np.asarray(low, "float64")
+    volume, vwap = np.nan_to_num(np.asarray(volume, "float64")), np.asarray(vwap, "float64")
+    quoted = ~np.isnan(last) & (last > 0)
+    advancing = quoted & (last > close)
+    declining = quoted & (last < close)
+    with_vwap = quoted & (vwap > 0)
+    return np.column_stack([
+        advancing,
+        declining,
+        quoted & ~advancing & ~declining,
+        quoted & (high > 0) & (last >= high),
+        quoted & (low > 0) & (last <= low),
+        with_vwap & (last > vwap),
+        with_vwap,
+        np.where(advancing, volume, 0.0),
+        np.where(declining, volume, 0.0),
+        quoted,
+    ]).astype("float64")
+
+
+def derive(counts):
+    """COUNTS frame plus the RATIOS columns."""
+    out = counts.copy()
+    out["net_advances"] = counts["advancing"] - counts["declining"]
+    out["ad_ratio"] = counts["advancing"] / counts["declining"].replace(0, np.nan)
+    out["pct_advancing"] = counts["advancing"] / counts["stocks"].replace(0, np.nan) * 100
+    out["pct_above_vwap"] = counts["above_vwap"] / counts["with_vwap"].replace(0, np.nan) * 100
+    out["up_down_volume"] = counts["up_volume"] / counts["down_volume"].replace(0, np.nan)
+    return out
+
+
+class BreadthEngine:
+    """Incremental breadth totals per scope with an intraday series."""
+
+    def __init__(self, stocks, sector_map=None, store_dir=STORE_DIR):
+        sector_map = sector_map or {}
+        members = {int(s["instrument_token"]): s["symbol"] for s in stocks}
+        for listed in sector_map.values():
+            for s in listed:
+                members.setdefault(int(s["instrument_token"]), s["symbol"])
+        self.tokens = pd.Index(list(members), dtype="int64")
+        self.symbols = np.array(list(members.values()), dtype=object)
+        self.scopes = [SCOPE] + list(sector_map)
+        # (scope, stock) membership pairs; every stock is in scope 0
+        position = {t: i for i, t in enumerate(self.tokens)}
+        pairs = [(0, i) for i in range(len(self.tokens))]
+        pairs += [(k, position[int(s["instrument_token"])]) for k, listed in enumerate(sector_map.values(), 1)
+                  for s in listed]
+        self._pair_scope = np.array([p[0] for p in pairs], dtype="int64")
+        self._pair_stock = np.array([p[1] for p in pairs], dtype="int64")
+        self.store_dir = store_dir
+        self.day = None
+        self.lease = lease.Lease(store_dir)
+        self._lock = threading.RLock()
+        self._reset()
+
+    @classmethod
+    def from_files(cls, fo_path=FO_PATH, json_path=JSON_PATH, store_dir=STORE_DIR):
+        return cls(*load_universe(fo_path, json_path), store_dir=store_dir)
+
+    def _reset(self):
+        self._state = np.zeros((len(self.tokens), len(COUNTS)))
+        self._totals = np.zeros((len(self.scopes), len(COUNTS)))
+        self._times, self._rows = [], []
+        self._series = None
+        self._offset = 0     # bytes of the day's store applied so far; None = start the file over
+
+    def _path(self, day):
+        return os.path.join(self.store_dir, f"{day}.pkl") if self.store_dir else None
+
+    def _start_day(self, day):
+        self.day = day
+        self._reset()
+        self._read_new()
+
+    def _read_new(self):
+        """Apply the records appended to the day's store since the last read."""
+        path = self._path(self.day)
+        if self._offset is None or not path or not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            while True:
+                try:
+                    entry = pickle.load(f)
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break    # end of the log, or a record still being written
+                if "tokens" in entry:
+                    if list(entry["tokens"]) != list(self.tokens) or entry["scopes"] != self.scopes:
+                        self._offset = None    # another universe; the first save starts the file over
+                        return
+                else:
+                    self._state[entry["stock"]] = entry["state"]
+                    self._totals = entry["totals"].copy()    # updated in place by record()
+                    self._times.append(entry["at"])
+                    self._rows.append(entry["totals"])
+                    self._series = None
+                self._offset = f.tell()
+
+    def _save(self, at, stock):
+        """Append one update (the changed stocks and the new totals) to the day's store."""
+        path = self._path(self.day)
+        if not path:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        fresh = self._offset is None or not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "wb" if fresh else "ab") as f:
+            if fresh:
+                pickle.dump({"tokens": list(self.tokens), "scopes": self.scopes}, f)
+            pickle.dump({"at": at, "stock": stock, "state": self._state[stock], "totals": self._totals.copy()}, f)
+            self._offset = f.tell()
+
+    def refresh(self, at=None):
+        """Apply what another process (the poller) appended to the day's store."""
+        day = pd.Timestamp(at or replay.now()).strftime("%Y-%m-%d")
+        with self._lock:
+            if day != self.day:
+                self._start_day(day)
+            else:
+                self._read_new()
+        return self
+
+    def sync(self, fetch, at=None):
+        """Dashboard entry point: record fetch() unless a poller owns the store, then read it."""
+        self.refresh(at)
+        if not self.lease.held_by_other():
+            self.record(fetch(), at)
+        return self
+
+    @tracing.traced("analytics.breadth.record")
+    def record(self, quotes, at=None):
+        """Apply one quote frame; returns the number of stocks that changed, or None if none did.
+
+        `quotes` has instrument_token, last_price, close (previous close),
+        high, low, volume and optionally average_price, as returned by
+        sector_batch.get_quotes(). A cached frame served twice changes nothing
+        and adds no point to the series.
+        """
+        if quotes is None or quotes.empty:
+            return None
+        with self._lock:
+            at = pd.Timestamp(at or replay.now()).floor("s")
+            day = at.strftime("%Y-%m-%d")
+            if day != self.day:
+                self._start_day(day)
+            if self._times and at <= self._times[-1]:
+                return None
+
+            found = self.tokens.get_indexer(pd.to_numeric(quotes["instrument_token"]).astype("int64"))
+            keep = (found >= 0) & ~pd.Series(found).duplicated(keep="last").to_numpy()
+            rows, stock = quotes[keep], found[keep]
+            vwap = rows["average_price"] if "average_price" in rows else np.full(len(rows), np.nan)
+            new = contributions(rows["last_price"], rows["close"], rows["high"], rows["low"], rows["volume"], vwap)
+            changed = (new != self._state[stock]).any(axis=1)
+            if not changed.any():
+                return None
+            stock, new = stock[changed], new[changed]
+
+            delta = np.zeros_like(self._state)
+            delta[stock] = new - self._state[stock]
+            self._state[stock] = new
+            touched = np.isin(self._pair_stock, stock)
+            np.add.at(self._totals, self._pair_scope[touched], delta[self._pair_stock[touched]])
+
+            self._times.append(at)
+            self._rows.append(self._totals.copy())
+            self._series = None
+            self._save(at, stock)
+            return len(stock)
+
+    def snapshot(self):
+        """Latest COUNTS and RATIOS, one row per scope."""
+        with self._lock:
+            totals = self._totals.copy()
+        counts = pd.DataFrame(totals, index=pd.Index(self.scopes, name="Scope"), columns=COUNTS)
+        return derive(counts)
+
+    def _stack(self):
+        """(time x scope x COUNTS array, matching update times)."""
+        with self._lock:
+            if self._series is None:
+                self._series = np.stack(self._rows) if self._rows else np.zeros((0, len(self.scopes), len(COUNTS)))
+            return self._series, pd.DatetimeIndex(self._times, name="time")
+
+    def series(self, scope=SCOPE):
+        """Intraday COUNTS and RATIOS of one scope, indexed by update time."""
+        stack, times = self._stack()
+        counts = pd.DataFrame(stack[:, self.scopes.index(scope), :], columns=COUNTS, index=times)
+        return derive(counts)
+
+    def sector_series(self, metric="pct_advancing"):
+        """time x scope matrix of one COUNTS or RATIOS column."""
+        stack, times = self._stack()
+        if metric in COUNTS:
+            values = stack[:, :, COUNTS.index(metric)]
+        else:
+            # One derive() over every (time, scope) row at once
+            flat = derive(pd.DataFrame(stack.reshape(-1, len(COUNTS)), columns=COUNTS))[metric]
+            values = flat.to_numpy().reshape(len(stack), len(self.scopes))
+        return pd.DataFrame(values, columns=self.scopes, index=times)
+
+    def stocks(self):
+        """The universe as sector_batch.get_quotes() expects it."""
+        return [{"symbol": s, "instrument_token": int(t)} for t, s in zip(self.tokens, self.symbols)]
+
+    def poll_once(self, kite):
+        from utils import sector_batch
+        return self.record(sector_batch.get_quotes(kite, self.stocks()))
+
+    def run(self, kite, interval=POLL_SECONDS, until=SESSION_END, polls=None):
+        """Poll every `interval` seconds until `until` (or `polls` updates), owning the store meanwhile."""
+        done = 0
+        try:
+            while replay.now().time() < until and (polls is None or done < polls):
+                # Claimed before the store is re-read, so what the dashboard appended until now is kept
+                self.lease.acquire(ttl=3 * interval + 60)
+                try:
+                    changed = self.refresh().poll_once(kite)
+                    if changed is not None:
+                        latest = self.snapshot().loc[SCOPE]
+                        print(f"{replay.now():%H:%M:%S} {changed} changed - A/D {latest['advancing']:.0f}/"
+                              f"{latest['declining']:.0f}, {latest['pct_above_vwap']:.0f}% above VWAP")
+                except Exception as e:
+                    print(f"Breadth poll failed: {e}")
+                done += 1
+                replay.sleep(interval)
+        finally:
+            self.lease.release()
+        return self
+
+
+if __name__ == "__main__":
+    from utils import kite_session
+
+    parser = argparse.ArgumentParser(description="Track intraday market breadth over the F&O universe")
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS)
+    parser.add_argument("--polls", type=int)
+    args = parser.parse_args()
+    engine = BreadthEngine.from_files().run(kite_session.gen_ses(), args.interval, polls=args.polls)
+    print(engine.snapshot().round(2))
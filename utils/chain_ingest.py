@@ -0,0 +1,158 @@
+## Option-chain ingest with pushdown filters
+# Parses NSE option-chain payloads straight from the raw records, applying the
+# strike window, expiry set and minimum volume before any row is flattened,
+# so the full chain never becomes a DataFrame when a page needs only near-ATM
+# strikes of the nearest expiries.
+'''
+Filters (all optional, applied per raw record before flattening):
+strike_window   keep strikes within +/- window of the underlying
+expiries        keep these expiry strings ("15-May-2025") or dates
+nearest         keep only the N nearest expiries
+min_volume      keep strikes where CE or PE traded at least this volume
+
+parse(payload, ...)    -> one DataFrame in the pd.json_normalize() layout
+iter_expiries(payload, ...) -> (expiry, DataFrame) chunks, nearest expiry first
+get_chain(symbol, ...) / stream(symbol, ...) fetch (or replay) and then do the same
+'''
+
+from datetime import datetime
+
+import pandas as pd
+
+from utils import fetch, nse, quality, replay, schema, tracing
+
+URL = "https://www.nseindia.com/api/option-chain-indices?symbol={symbol}"
+EXPIRY_FORMAT = "%d-%b-%Y"
+LEGS = ("CE", "PE")
+
+
+def _expiry_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, EXPIRY_FORMAT).date()
+    return pd.Timestamp(value).date()
+
+
+def underlying_value(payload):
+    """Spot from the payload, falling back to the first leg that carries it."""
+    records = payload.get("records", {})
+    if records.get("underlyingValue"):
+        return float(records["underlyingValue"])
+    for row in records.get("data", []):
+        for leg in LEGS:
+            if row.get(leg, {}).get("underlyingValue"):
+                return float(row[leg]["underlyingValue"])
+    return None
+
+
+def expiry_order(payload):
+    """Expiry strings of the payload, nearest first."""
+    records = payload.get("records", {})
+    expiries = records.get("expiryDates") or list(dict.fromkeys(r.get("expiryDate") for r in records.get("data", [])))
+    return sorted((e for e in expiries if e), key=_expiry_date)
+
+
+def _wanted_expiries(payload, expiries=None, nearest=None):
+    order = expiry_order(payload)
+    if expiries is not None:
+        wanted = {_expiry_date(e) for e in expiries}
+        order = [e for e in order if _expiry_date(e) in wanted]
+    return order[:nearest] if nearest is not None else order
+
+
+def _keep(row, low, high, min_volume):
+    strike = row.get("strikePrice")
+    if low is not None and not (low <= strike <= high):
+        return False
+    if min_volume:
+        volume = max(row.get(leg, {}).get("totalTradedVolume") or 0 for leg in LEGS)
+        if volume < min_volume:
+            return False
+    return True
+
+
+def _flatten(row):
+    """One record flattened like json_normalize: legs become LEG.field, in key order."""
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            for field, item in value.items():
+                flat[f"{key}.{field}"] = item
+        else:
+            flat[key] = value
+    return flat
+
+
+def _frame(rows, name=None):
+    if not rows:
+        return pd.DataFrame()
+    df = schema.compact_option_chain(pd.DataFrame.from_records(rows), name)
+    return quality.validate(df, "option_chain", name or "option_chain")
+
+
+def _filtered(payload, strike_window=None, expiries=None, nearest=None, min_volume=0):
+    """Raw records passing every filter, in NSE's order."""
+    wanted = None
+    if expiries is not None or nearest is not None:
+        wanted = set(_wanted_expiries(payload, expiries, nearest))
+    low = high = None
+    if strike_window is not None:
+        spot = underlying_value(payload)
+        if spot is not None:
+            low, high = spot - strike_window, spot + strike_window
+    for row in payload.get("records", {}).get("data", []):
+        if (wanted is None or row.get("expiryDate") in wanted) and _keep(row, low, high, min_volume):
+            yield row
+
+
+@tracing.traced("parse.option_chain_pushdown")
+def parse(payload, strike_window=None, expiries=None, nearest=None, min_volume=0, name=None):
+    """Filtered option chain in the json_normalize() layout (PE.*/CE.* columns)."""
+    rows = [_flatten(row) for row in _filtered(payload, strike_window, expiries, nearest, min_volume)]
+    return _frame(rows, name)
+
+
+def iter_expiries(payload, strike_window=None, expiries=None, nearest=None, min_volume=0, name=None):
+    """Yield (expiry, DataFrame) per expiry, nearest first; each chunk is flattened on demand."""
+    buckets = {expiry: [] for expiry in _wanted_expiries(payload, expiries, nearest)}
+    for row in _filtered(payload, strike_window, expiries, nearest, min_volume):
+        buckets.setdefault(row.get("expiryDate"), []).append(row)
+    for expiry, bucket in buckets.items():
+        if bucket:
+            with tracing.span("parse.option_chain_chunk"):
+                yield expiry, _frame([_flatten(row) for row in bucket], name)
+
+
+def fetch_payload(symbol, api_wait=2):
+    """Raw NSE option-chain payload (replayed in replay mode).
+
+    A failing fetch serves the last good payload for `symbol`; {} when there is none.
+    """
+    if replay.is_enabled():
+        return replay.load_snapshot(f"option_chain_{symbol}")
+    try:
+        response = fetch.call("nse.option_chain", nse.fetch_json, URL.format(symbol=symbol), api_wait=api_wait,
+                              key=symbol, at=fetch.deadline(60), attempts=2, stale=True)
+        replay.record_snapshot(f"option_chain_{symbol}", response)
+        return response
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return {}
+
+
+@tracing.traced("fetch.option_chain")
+def get_chain(symbol, strike_window=None, expiries=None, nearest=None, min_volume=0, api_wait=2):
+    """Fetch an option chain and parse it with the given pushdown filters."""
+    payload = fetch_payload(symbol, api_wait)
+    return parse(payload, strike_window, expiries, nearest, min_volume, name=f"option_chain_{symbol}")
+
+
+def stream(symbol, strike_window=None, expiries=None, nearest=None, min_volume=0, api_wait=2):
+    """Streaming get_chain(): yields (expiry, DataFrame) chunks, nearest expiry first."""
+    payload = fetch_payload(symbol, api_wait)
+    yield from iter_expiries(payload, strike_window, expiries, nearest, min_volume, name=f"option_chain_{symbol}")
+
+
+if __name__ == "__main__":
+    for expiry, chunk in stream("NIFTY", strike_window=500, nearest=2, min_volume=1):
+        print(f"{expiry}: {len(chunk)} strikes")
+        print(chunk[["strikePrice", "CE.openInterest", "PE.openInterest"]].head())
@@ -0,0 +1,128 @@
+## Configuration and paths
+# Resolves data, cache and report directories and Kite credentials from the
+# environment or a JSON config file, with per-environment profiles, so the
+# same tree runs on a Windows desktop and in Linux containers unchanged.
+'''
+Lookup order for every setting:
+1. TRADE_ANALYST_<KEY> environment variable (e.g. TRADE_ANALYST_DATA_DIR)
+2. the active profile in the config file
+3. "default" in the config file
+4. DEFAULTS below
+
+Config file: $TRADE_ANALYST_CONFIG, else trade_analyst.json in the repo root.
+{"default":  {"data_dir": "data"},
+ "profiles": {"worker1": {"cache_dir": "/var/cache/trade_analyst/worker1"},
+              "prod":    {"data_dir": "/srv/trade_analyst/data", "reports_dir": "/srv/reports"}}}
+
+Profile: $TRADE_ANALYST_PROFILE (default "default"). A non-default profile
+gets its own cache and reports folders (<cache_dir>/<profile>, ...) unless it
+sets them, so several workers on one host never share state.
+
+Relative paths resolve against home (the repo root), not the working
+directory. Credentials: KITE_API_KEY / KITE_ACCESS_TOKEN, or api_key_file.
+
+Settings are read once per process and modules bind their paths (STORE_DIR,
+PLANE_DIR, ALERT_LOG, CACHE_DIR, ...) at import, so set the profile and any
+TRADE_ANALYST_* variables before starting the process; switch profiles by
+starting another one.
+'''
+
+import os
+import json
+
+HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PREFIX = "TRADE_ANALYST_"
+DEFAULTS = {
+    "home": HOME,
+    "data_dir": "data",
+    "cache_dir": None,          # <data_dir>/cache
+    "reports_dir": "reports",
+    "api_key_file": None,       # <data_dir>/api.txt
+}
+# Settings that are per-profile folders when a profile does not set them
+ISOLATED = ("cache_dir", "reports_dir")
+
+_settings = None
+
+
+def profile():
+    return os.environ.get(ENV_PREFIX + "PROFILE", "default")
+
+
+def config_file():
+    return os.environ.get(ENV_PREFIX + "CONFIG", os.path.join(HOME, "trade_analyst.json"))
+
+
+def _load():
+    path = config_file()
+    if not os.path.exists(path):
+        return {}, {}
+    with open(path, "r") as f:
+        raw = json.load(f)
+    return raw.get("default", {}), raw.get("profiles", {}).get(profile(), {})
+
+
+def settings():
+    """All resolved settings for the active profile, read once per process."""
+    global _settings
+    if _settings is None:
+        base, chosen = _load()
+        name = profile()
+        out = {}
+        for key, default in DEFAULTS.items():
+            value = os.environ.get(ENV_PREFIX + key.upper())
+            if value is None:
+                value = chosen.get(key, base.get(key, default))
+            out[key] = value
+        home = out["home"]
+        out["data_dir"] = _absolute(home, out["data_dir"])
+        out["cache_dir"] = _absolute(home, out["cache_dir"] or os.path.join(out["data_dir"], "cache"))
+        out["reports_dir"] = _absolute(home, out["reports_dir"])
+        out["api_key_file"] = _absolute(home, out["api_key_file"] or os.path.join(out["data_dir"], "api.txt"))
+        if name != "default":
+            for key in ISOLATED:
+                if key not in chosen and os.environ.get(ENV_PREFIX + key.upper()) is None:
+                    out[key] = os.path.join(out[key], name)
+        out["profile"] = name
+        _settings = out
+    return _settings
+
+
+def _absolute(home, path):
+    return os.path.normpath(os.path.join(home, os.path.expanduser(path)))
+
+
+def get(key, default=None):
+    return settings().get(key, default)
+
+
+def data_path(*parts):
+    """Path under the data directory."""
+    return os.path.join(settings()["data_dir"], *parts)
+
+
+def cache_path(*parts):
+    """Path under the (per-profile) cache directory."""
+    return os.path.join(settings()["cache_dir"], *parts)
+
+
+def reports_path(*parts):
+    return os.path.join(settings()["reports_dir"], *parts)
+
+
+def kite_credentials():
+    """(api_key, access_token) from KITE_API_KEY/KITE_ACCESS_TOKEN or api_key_file.
+
+    api_key_file holds "api_key api_secret access_token" separated by whitespace.
+    """
+    key, token = os.environ.get("KITE_API_KEY"), os.environ.get("KITE_ACCESS_TOKEN")
+    if key and token:
+        return key, token
+    with open(settings()["api_key_file"], "r") as f:
+        parts = f.read().split()
+    return parts[0], parts[2]
+
+
+if __name__ == "__main__":
+    for key, value in settings().items():
+        print(f"{key:<14}{value}")
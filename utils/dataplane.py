@@ -0,0 +1,233 @@
+## Shared data plane
+# One producer process publishes the latest tables (quotes, the R-Score cube,
+# option chains) as memory-mapped column files; every Streamlit session and
+# worker maps them read-only. The OS page cache holds one copy of each table
+# however many sessions are open, so memory stays flat as users grow.
+'''
+Layout (<cache_dir>/plane, see utils/config.py):
+<table>/CURRENT                 name of the latest complete version
+<table>/<version>/meta.json     columns, dtypes, categories, index names, publish time
+<table>/<version>/<n>.npy       one array per column; categoricals and strings as codes
+
+A version directory is complete before CURRENT points at it (atomic rename),
+so readers never see a half-written table. The last KEEP versions are kept
+because a session may still have an older one mapped.
+
+Run the producer next to the app (one per machine):
+    python -m utils.dataplane --interval 60 --symbol NIFTY --symbol BANKNIFTY
+
+Arrow IPC would allow the same zero-copy mapping, but pyarrow is optional
+here; .npy columns need only NumPy and map the same way.
+'''
+
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import config, replay, tracing
+
+PLANE_DIR = config.cache_path("plane")
+KEEP = 3
+
+
+def _encode(series):
+    """(array, column meta) for one column; strings become categorical codes."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        cat = series.array
+    elif series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        cat = pd.Categorical(series.astype("object").where(series.notna(), None))
+    else:
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            series = series.dt.tz_localize(None)
+        values = series.to_numpy()
+        if values.dtype == object:
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+        return values, {"kind": "array"}
+    categories = cat.categories
+    meta = {"kind": "category", "categories": [c.item() if hasattr(c, "item") else c for c in categories],
+            "categories_dtype": str(categories.dtype), "ordered": bool(cat.ordered)}
+    return np.asarray(cat.codes), meta
+
+
+def _decode(array, meta):
+    if meta["kind"] == "array":
+        return array
+    categories = pd.Index(meta["categories"])
+    if meta["categories_dtype"].startswith("datetime"):
+        categories = pd.to_datetime(categories)
+    dtype = pd.CategoricalDtype(categories, ordered=meta["ordered"])
+    # String columns come back as categoricals too, so the codes stay mapped
+    return pd.Categorical.from_codes(array, dtype=dtype)
+
+
+def publish(name, df, root=PLANE_DIR):
+    """Write `df` as the new version of table `name`; returns the version."""
+    table = os.path.join(root, name)
+    version = f"{time.time_ns()}"
+    tmp = os.path.join(table, f".{version}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    index_names = [n for n in df.index.names if n is not None]
+    frame = df.reset_index() if index_names else df.reset_index(drop=True)
+    columns = []
+    with tracing.span("dataplane.publish"):
+        for i, column in enumerate(frame.columns):
+            array, meta = _encode(frame[column])
+            np.save(os.path.join(tmp, f"{i}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            columns.append(dict(meta, name=str(column)))
+        status = df.attrs.get("fetch_status")
+        meta = {"name": name, "version": version, "rows": len(frame), "columns": columns, "index": index_names,
+                "published": time.time(), "as_of": replay.now().isoformat(),
+                "fetch_status": status.to_dict("records") if status is not None else None}
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp, os.path.join(table, version))
+        pointer = os.path.join(table, "CURRENT.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(table, "CURRENT"))
+    _prune(table)
+    return version
+
+
+def _prune(table, keep=KEEP):
+    versions = sorted(v for v in os.listdir(table) if v.isdigit())
+    for old in versions[:-keep]:
+        # Windows refuses to delete a mapped file; it is retried on the next publish
+        shutil.rmtree(os.path.join(table, old), ignore_errors=True)
+
+
+def current(name, root=PLANE_DIR):
+    """Latest published version of `name`, or None."""
+    try:
+        with open(os.path.join(root, name, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def meta(name, root=PLANE_DIR, version=None):
+    version = version or current(name, root)
+    if version is None:
+        return None
+    with open(os.path.join(root, name, version, "meta.json")) as f:
+        return json.load(f)
+
+
+class Reader:
+    """Maps published tables read-only; one mapping per version per process."""
+
+    def __init__(self, root=PLANE_DIR):
+        self.root = root
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def read(self, name, max_age=None):
+        """Latest version of `name` as a DataFrame over the mapped columns.
+
+        Each caller gets its own shallow copy, so adding or replacing columns
+        never touches the shared frame. The mapped values are read-only:
+        writing into a cell raises, so take .copy() first for that. None when
+        nothing is published or the latest version is older than `max_age`
+        seconds.
+        """
+        version = current(name, self.root)
+        if version is None:
+            return None
+        with self._lock:
+            cached = self._frames.get(name)
+            if cached is None or cached[0] != version:
+                cached = (version, *self._load(name, version))
+                self._frames[name] = cached
+        _, df, published = cached
+        if max_age is not None and time.time() - published > max_age:
+            return None
+        return df.copy(deep=False)
+
+    @tracing.traced("dataplane.map")
+    def _load(self, name, version):
+        folder = os.path.join(self.root, name, version)
+        with open(os.path.join(folder, "meta.json")) as f:
+            info = json.load(f)
+        data = {}
+        for i, column in enumerate(info["columns"]):
+            # Plain read-only ndarray view over the mapping (memmap subclasses leak into results)
+            array = np.load(os.path.join(folder, f"{i}.npy"), mmap_mode="r", allow_pickle=False).view(np.ndarray)
+            data[column["name"]] = _decode(array, column)
+        df = pd.DataFrame(data, copy=False)
+        if info["index"]:
+            df = df.set_index(info["index"])
+        if info.get("fetch_status") is not None:
+            df.attrs["fetch_status"] = pd.DataFrame(info["fetch_status"])
+        df.attrs["plane"] = {"version": version, "as_of": info["as_of"]}
+        return df, info["published"]
+
+
+_reader = Reader()
+
+
+def read(name, max_age=None):
+    """Module-level Reader.read(); shared by every session in the process."""
+    return _reader.read(name, max_age)
+
+
+@tracing.traced("dataplane.produce")
+def produce_once(kite, symbols=("NIFTY",), json_path=None, chain_source="kite", root=PLANE_DIR):
+    """Fetch and publish the score cube, the quote table and option chains once."""
+    from utils import sector_batch
+
+    published = {}
+    try:
+        cube = sector_batch.score_all(kite, json_path or sector_batch.JSON_PATH, workers=None)
+        published["scores"] = publish("scores", cube, root)
+        quotes = cube.reset_index().drop_duplicates("Symbol")
+        quotes = quotes[["Symbol", "Last Price", "Prev Close", "% Change", "Volume", "OI", "Buy", "Sell",
+                         "Last Trade Time"]]
+        quotes.attrs = cube.attrs
+        published["quotes"] = publish("quotes", quotes, root)
+    except Exception as e:
+        print(f"Error publishing scores: {e}")
+    for symbol in symbols:
+        try:
+            if chain_source == "kite":
+                from utils import kite_chain
+                chain = kite_chain.build_chain(kite, symbol)
+            else:
+                from utils import OI
+                chain = OI.get_data(symbol)
+            if not chain.empty:
+                published[f"option_chain_{symbol}"] = publish(f"option_chain_{symbol}", chain, root)
+        except Exception as e:
+            print(f"Error publishing option chain for {symbol}: {e}")
+    return published
+
+
+def run(kite, interval=60, symbols=("NIFTY",), json_path=None, chain_source="kite", root=PLANE_DIR, cycles=None):
+    """Producer loop: publish every `interval` seconds (replay-aware sleep)."""
+    done = 0
+    while cycles is None or done < cycles:
+        start = time.monotonic()
+        published = produce_once(kite, symbols, json_path, chain_source, root)
+        done += 1
+        print(f"{replay.now():%H:%M:%S} published {', '.join(published) or 'nothing'} "
+              f"in {time.monotonic() - start:.1f}s")
+        replay.sleep(max(interval - (time.monotonic() - start), 0))
+
+
+if __name__ == "__main__":
+    from utils import kite_session
+
+    parser = argparse.ArgumentParser(description="Publish live tables to the shared data plane")
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--symbol", action="append", help="option-chain symbol (repeatable, default NIFTY)")
+    parser.add_argument("--chain-source", choices=("nse", "kite"), default="kite")
+    parser.add_argument("--json", help="sector_data.json path")
+    parser.add_argument("--cycles", type=int)
+    args = parser.parse_args()
+    run(kite_session.gen_ses(), args.interval, args.symbol or ["NIFTY"], args.json, args.chain_source,
+        cycles=args.cycles)
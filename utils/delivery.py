@@ -0,0 +1,106 @@
+## Delivery analytics
+# Rolling delivery-% z-scores, close-vs-VWAP deviation and average trade size
+# for the whole F&O universe from fno_stocks_historic_data.csv, vectorized
+# across symbols. Results are cached per version of the history file (memory +
+# disk), keyed by its path and modification time, so a hit skips the CSV read.
+'''
+Accumulation   : unusually high delivery % (z >= threshold), close above VWAP, price up
+Distribution   : unusually high delivery % (z >= threshold), close below VWAP, price down
+'''
+
+import os
+import pickle
+import hashlib
+
+import numpy as np
+
+from utils import config, schema, tracing
+
+HISTORY_PATH = config.data_path("fno_stocks_historic_data.csv")
+CACHE_DIR = config.cache_path()
+WINDOW = 10          # prior sessions in the rolling baseline
+MIN_PERIODS = 5
+
+_memory_cache = {}
+
+
+def _rolling_z(values, keys, window=WINDOW, min_periods=MIN_PERIODS):
+    """z-score of each value against the previous `window` values of its group."""
+    grouped = values.groupby(keys, sort=False)
+    prior = grouped.shift(1)
+    rolling = prior.groupby(keys, sort=False).rolling(window, min_periods=min_periods)
+    mean = rolling.mean().reset_index(level=0, drop=True).sort_index()
+    std = rolling.std().reset_index(level=0, drop=True).sort_index()
+    return (values - mean) / std.replace(0, np.nan)
+
+
+@tracing.traced("analytics.delivery.compute")
+def compute(history):
+    """Per symbol and day delivery metrics for a fno_stocks_historic_data frame."""
+    df = schema.compact_historic(history).sort_values(["symbol", "date"], kind="stable").reset_index(drop=True)
+    symbol = df["symbol"]
+
+    df["delivery_z"] = _rolling_z(df["delivery_per"].astype("float64"), symbol)
+    df["vwap_dev_%"] = (df["close"] - df["vwap"]) / df["vwap"] * 100
+    df["change_%"] = (df["close"] - df["prev_close"]) / df["prev_close"].replace(0, np.nan) * 100
+    df["avg_trade_size"] = df["volume"] / df["total_trade"].replace(0, np.nan)
+    df["trade_size_z"] = _rolling_z(df["avg_trade_size"], symbol)
+    df["volume_z"] = _rolling_z(df["volume"].astype("float64"), symbol)
+    return df
+
+
+def latest(metrics, z_threshold=1.5):
+    """Last trading day per symbol with an accumulation/distribution label."""
+    last = metrics.groupby("symbol", sort=False, observed=True).tail(1).copy()
+    strong = last["delivery_z"] >= z_threshold
+    up = (last["vwap_dev_%"] > 0) & (last["change_%"] > 0)
+    down = (last["vwap_dev_%"] < 0) & (last["change_%"] < 0)
+    last["signal"] = np.select([strong & up, strong & down], ["Accumulation", "Distribution"], "")
+    # Strength: delivery surprise scaled by how far price closed from VWAP
+    last["score"] = last["delivery_z"] * last["vwap_dev_%"].abs()
+    return last.reset_index(drop=True)
+
+
+def rank(metrics, z_threshold=1.5, top=20):
+    """(accumulation, distribution) candidates, strongest first."""
+    last = latest(metrics, z_threshold)
+    columns = ["symbol", "date", "close", "change_%", "delivery_per", "delivery_z",
+               "vwap", "vwap_dev_%", "avg_trade_size", "trade_size_z", "score"]
+    acc = last[last["signal"] == "Accumulation"].nlargest(top, "score")[columns]
+    dist = last[last["signal"] == "Distribution"].nlargest(top, "score")[columns]
+    return acc.reset_index(drop=True), dist.reset_index(drop=True)
+
+
+def load(path=HISTORY_PATH, cache_dir=CACHE_DIR):
+    """Metrics for the history file, cached until the file changes."""
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    key = (path, info.st_mtime_ns, info.st_size)
+    if key in _memory_cache:
+        return _memory_cache[key]
+
+    # One cache file per history file (path hash), replaced when the file changes
+    prefix = f"delivery_{hashlib.sha1(path.encode()).hexdigest()[:12]}_"
+    cache_file = os.path.join(cache_dir, f"{prefix}{info.st_mtime_ns}_{info.st_size}.pkl") if cache_dir else None
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            metrics = pickle.load(f)
+    else:
+        metrics = compute(schema.load_historic(path, "fno_stocks_historic_data"))
+        if cache_file:
+            os.makedirs(cache_dir, exist_ok=True)
+            for name in os.listdir(cache_dir):
+                if name.startswith(prefix):
+                    os.remove(os.path.join(cache_dir, name))
+            with open(cache_file + ".tmp", "wb") as f:
+                pickle.dump(metrics, f)
+            os.replace(cache_file + ".tmp", cache_file)
+    _memory_cache[key] = metrics
+    return metrics
+
+
+if __name__ == "__main__":
+    metrics = load()
+    acc, dist = rank(metrics)
+    print(f"Accumulation candidates:\n{acc.head(10)}")
+    print(f"\nDistribution candidates:\n{dist.head(10)}")
@@ -0,0 +1,209 @@
+## Compiled filter expressions
+# Turns a condition string such as
+#     `Z-Volume` > 1 and `Z-Turnover` > 1 and `Z-Return` > 0.6
+# into a code object that evaluates on whole NumPy columns at once. Parsing,
+# validation and compilation happen once; each evaluation is a single eval()
+# over the column arrays, with no per-row Python and no DataFrame.eval overhead.
+'''
+Syntax (a safe subset of Python):
+columns        bare names (Volume) or backticks for any other name (`% Change`)
+logic          and / or / not  (also & | ~), chained comparisons (1 < x < 5)
+membership     Sector in ["NIFTY IT", "NIFTY BANK"], action not in ["No Action"]
+arithmetic     + - * / ** %, parentheses, numbers and string literals
+functions      abs, log, sqrt, isnull, notnull, minimum, maximum
+
+Missing values (NaN/None) make every comparison on them False, including
+!=, not in and anything under not, so a rule never fires on a NaN. Use
+isnull()/notnull() to match missing values explicitly.
+'''
+
+import re
+import ast
+
+import numpy as np
+import pandas as pd
+
+_BACKTICK = re.compile(r"`([^`]+)`")
+_FUNCTIONS = {
+    "abs": np.abs,
+    "log": np.log,
+    "sqrt": np.sqrt,
+    "isnull": pd.isna,
+    "notnull": pd.notna,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+}
+_ALLOWED = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.Invert, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.BitAnd, ast.BitOr,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple, ast.Call,
+)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _isin(values, options):
+    return pd.Series(values).isin(list(options)).to_numpy()
+
+
+def _known(*values):
+    """True where every column value is present."""
+    mask = True
+    for value in values:
+        mask = mask & pd.notna(value)
+    return mask
+
+
+_NULL_CHECKS = ("isnull", "notnull")
+
+
+class _Vectorize(ast.NodeTransformer):
+    """Rewrite Python logic into elementwise NumPy operators."""
+
+    def __init__(self, names):
+        self.names = names          # identifier -> column name
+        self.columns = set()
+
+    def visit_Name(self, node):
+        if node.id in _FUNCTIONS or node.id in ("_isin", "_known"):
+            return node
+        column = self.names.get(node.id, node.id)
+        self.columns.add(column)
+        return ast.copy_location(ast.Name(id=node.id, ctx=ast.Load()), node)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        out = node.values[0]
+        for value in node.values[1:]:
+            out = ast.BinOp(left=out, op=op, right=value)
+        return ast.copy_location(out, node)
+
+    def _operands(self, node):
+        """Column identifiers under `node`, except those only tested by isnull()/notnull()."""
+        found, stack = [], [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, ast.Call) and isinstance(current.func, ast.Name) \
+                    and current.func.id in _NULL_CHECKS:
+                continue
+            if isinstance(current, ast.Name) and current.id not in _FUNCTIONS and current.id not in found:
+                found.append(current.id)
+            stack.extend(ast.iter_child_nodes(current))
+        return found
+
+    def _when_known(self, test, operands):
+        """`test & _known(columns)`: a comparison on a missing value is False."""
+        if not operands:
+            return test
+        known = ast.Call(func=ast.Name(id="_known", ctx=ast.Load()),
+                         args=[ast.Name(id=name, ctx=ast.Load()) for name in operands], keywords=[])
+        return ast.BinOp(left=test, op=ast.BitAnd(), right=known)
+
+    def visit_UnaryOp(self, node):
+        operands = self._operands(node.operand)
+        self.generic_visit(node)
+        if isinstance(node.op, (ast.Not, ast.Invert)):
+            # ~(x > 1) alone would be True where x is missing
+            out = self._when_known(ast.UnaryOp(op=ast.Invert(), operand=node.operand), operands)
+            return ast.copy_location(out, node)
+        return node
+
+    def visit_Compare(self, node):
+        operands = self._operands(node)
+        self.generic_visit(node)
+        parts, left = [], node.left
+        for op, right in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                part = ast.Call(func=ast.Name(id="_isin", ctx=ast.Load()), args=[left, right], keywords=[])
+                if isinstance(op, ast.NotIn):
+                    part = ast.UnaryOp(op=ast.Invert(), operand=part)
+            else:
+                part = ast.Compare(left=left, ops=[op], comparators=[right])
+            parts.append(part)
+            left = right
+        out = parts[0]
+        for part in parts[1:]:
+            out = ast.BinOp(left=out, op=ast.BitAnd(), right=part)
+        return ast.copy_location(self._when_known(out, operands), node)
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            raise ExpressionError(f"Unsupported function call: {ast.unparse(node)}")
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+
+class Expression:
+    """A condition compiled once and evaluated on column arrays."""
+
+    def __init__(self, text):
+        self.text = text
+        names = {}
+
+        def quote(match):
+            ident = f"_c{len(names)}"
+            names[ident] = match.group(1)
+            return ident
+
+        source = _BACKTICK.sub(quote, text)
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"Invalid expression {text!r}: {e.msg}") from None
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED):
+                raise ExpressionError(f"Unsupported syntax in {text!r}: {type(node).__name__}")
+        transformer = _Vectorize(names)
+        tree = ast.fix_missing_locations(transformer.visit(tree))
+        self.columns = frozenset(transformer.columns)
+        self._names = {ident: column for ident, column in names.items()}
+        self._idents = {column: ident for ident, column in names.items()}
+        self._code = compile(tree, f"<expr {text}>", "eval")
+
+    def evaluate(self, columns, length):
+        """Boolean mask from a {column: array} mapping of `length` rows."""
+        namespace = dict(_FUNCTIONS, _isin=_isin, _known=_known)
+        for column in self.columns:
+            if column not in columns:
+                raise ExpressionError(f"Unknown column '{column}' in {self.text!r}")
+            namespace[self._idents.get(column, column)] = columns[column]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = eval(self._code, {"__builtins__": {}}, namespace)
+        result = np.asarray(result)
+        if result.ndim == 0:
+            result = np.full(length, bool(result))
+        if result.dtype != bool:
+            result = pd.Series(result).fillna(False).astype(bool).to_numpy()
+        return result
+
+    def __call__(self, frame):
+        """Boolean mask over the rows of `frame`."""
+        return self.evaluate(column_arrays(frame, self.columns), len(frame))
+
+    def __repr__(self):
+        return f"Expression({self.text!r})"
+
+
+def column_arrays(frame, columns):
+    """{column: ndarray} for `columns`; categoricals become object arrays."""
+    out = {}
+    for column in columns:
+        if column in frame.columns:
+            series = frame[column]
+            out[column] = series.to_numpy(dtype=object) if isinstance(series.dtype, pd.CategoricalDtype) \
+                else series.to_numpy()
+    return out
+
+
+_cache = {}
+
+
+def compile_expr(text):
+    """Compiled Expression for `text`, cached by source string."""
+    if text not in _cache:
+        _cache[text] = Expression(text)
+    return _cache[text]
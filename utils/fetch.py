@@ -0,0 +1,264 @@
+## Fetch layer
+# Every network read (Kite quotes, NSE pages) goes through call(): a circuit
+# breaker per endpoint, retries that never outlive the caller's deadline,
+# optional hedged requests, and a last-good fallback. Batch reads return
+# partial results with a status per instrument, so one slow or failing symbol
+# never blanks a whole page.
+'''
+Statuses recorded per (endpoint, key) and per instrument:
+ok             fetched this time
+stale          fetch failed; the last good value was served
+missing        the call succeeded but returned nothing for this instrument
+error          failed after retries (message in `error`)
+timeout        the deadline ran out before this instrument was fetched
+circuit_open   skipped: the endpoint failed repeatedly and is cooling down
+
+A breaker opens after `threshold` consecutive failures, rejects calls for
+`cooldown` seconds, then lets one trial call through (half-open). Client
+errors (kiteconnect Input/Permission/OrderException: a bad token, a malformed
+request) are not retried and do not count against the endpoint: the request
+would fail the same way every time. Anything else, including the JSON decode
+error of an NSE block page, is an endpoint failure. A hedged duplicate takes
+its own slot from the caller's limiter.
+'''
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures, FIRST_COMPLETED
+
+import pandas as pd
+
+from utils import ratelimit, replay, tracing
+
+QUOTE_BATCH = 500
+# kiteconnect exception names that mean "this request is wrong", not "the API is down"
+CLIENT_ERRORS = ("InputException", "PermissionException", "OrderException")
+STATUS_COLUMNS = ["key", "status", "attempts", "latency_ms", "error"]
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a cooldown and a half-open trial call."""
+
+    def __init__(self, name, threshold=5, cooldown=30, clock=time.monotonic):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+_breakers = {}
+_last_good = {}
+_status = {}
+_lock = threading.Lock()
+# Attempts run on worker threads so a hung socket cannot outlive the deadline
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="fetch")
+
+
+def breaker(endpoint, threshold=5, cooldown=30):
+    with _lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint, threshold, cooldown)
+        return _breakers[endpoint]
+
+
+def deadline(seconds):
+    """Absolute deadline `seconds` from now (None = no deadline)."""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def remaining(at):
+    return float("inf") if at is None else at - time.monotonic()
+
+
+def _record(endpoint, key, status, attempts, started, error=None):
+    with _lock:
+        _status[(endpoint, key)] = {"endpoint": endpoint, "key": key, "status": status, "attempts": attempts,
+                                    "latency_ms": (time.monotonic() - started) * 1000,
+                                    "error": error, "at": replay.now()}
+
+
+def _attempt(func, args, kwargs, timeout, hedge_after, limiter=None):
+    """One logical attempt; a second identical request races the first after `hedge_after` s."""
+    end = time.monotonic() + timeout
+    futures = [_pool.submit(func, *args, **kwargs)]
+    if hedge_after is not None and hedge_after < timeout:
+        done, _ = wait_futures(futures, timeout=hedge_after)
+        if not done and limiter is not None:
+            limiter()
+        if not futures[0].done():
+            tracing.record("fetch.hedge", 0)
+            futures.append(_pool.submit(func, *args, **kwargs))
+    pending, error = set(futures), None
+    while pending:
+        left = end - time.monotonic()
+        if left <= 0:
+            break
+        done, pending = wait_futures(pending, timeout=None if left == float("inf") else left,
+                                     return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    if pending:
+        raise DeadlineExceeded(f"no response within {timeout:.1f}s")
+    raise error
+
+
+def call(endpoint, func, *args, key=None, at=None, attempts=3, wait=0.5, max_wait=4, hedge_after=None,
+         limiter=None, stale=False, **kwargs):
+    """func(*args, **kwargs) with breaker, deadline-bounded retries and optional hedging.
+
+    `at` is an absolute deadline from deadline(). With stale=True the last
+    good value for (endpoint, key) is returned when every attempt fails.
+    Raises CircuitOpen, DeadlineExceeded or the last error otherwise.
+    """
+    gate = breaker(endpoint)
+    started = time.monotonic()
+    error = None
+    tries = 0
+    for tries in range(1, attempts + 1):
+        if not gate.allow():
+            error = CircuitOpen(f"{endpoint} circuit open after {gate.failures} failures")
+            break
+        left = remaining(at)
+        if left <= 0:
+            error = error or DeadlineExceeded(f"{endpoint} deadline exceeded")
+            break
+        if limiter is not None:
+            limiter()
+        try:
+            with tracing.span(f"fetch.{endpoint}"):
+                value = _attempt(func, args, kwargs, left, hedge_after, limiter)
+            gate.success()
+            with _lock:
+                _last_good[(endpoint, key)] = value
+            _record(endpoint, key, "ok", tries, started)
+            return value
+        except Exception as e:
+            error = e
+            if client_error(e):
+                break
+            gate.failure()
+        if tries < attempts:
+            backoff = min(wait * 2 ** (tries - 1), max_wait, max(remaining(at), 0))
+            tracing.traced_sleep("fetch.retry_wait", backoff)
+    if stale and (endpoint, key) in _last_good:
+        _record(endpoint, key, "stale", tries, started, str(error))
+        print(f"{endpoint}: serving last good data ({error})")
+        return _last_good[(endpoint, key)]
+    _record(endpoint, key, _status_of(error), tries, started, str(error))
+    raise error
+
+
+def client_error(error):
+    return type(error).__name__ in CLIENT_ERRORS
+
+
+def _status_of(error):
+    if isinstance(error, CircuitOpen):
+        return "circuit_open"
+    if isinstance(error, (DeadlineExceeded, TimeoutError)):
+        return "timeout"
+    return "error"
+
+
+@tracing.traced("fetch.kite_quotes_partial")
+def kite_quotes(kite, keys, batch=QUOTE_BATCH, seconds=20, limiter=None, hedge_after=3):
+    """kite.quote() for `keys` in batches; returns ({key: quote}, status frame).
+
+    A batch rejected for a bad instrument is split in half and retried, so
+    one bad instrument only costs itself. Keys left when the deadline runs out are marked timeout.
+    """
+    limiter = limiter or ratelimit.kite_limiter
+    at = deadline(seconds)
+    quotes, status = {}, []
+    pending = [list(keys[i:i + batch]) for i in range(0, len(keys), batch)]
+    while pending:
+        chunk = pending.pop(0)
+        started = time.monotonic()
+        try:
+            got = call("kite.quote", kite.quote, chunk, at=at, attempts=2,
+                       limiter=limiter, hedge_after=hedge_after)
+        except Exception as e:
+            if len(chunk) > 1 and client_error(e) and remaining(at) > 0:
+                half = len(chunk) // 2
+                pending[:0] = [chunk[:half], chunk[half:]]
+                continue
+            status += [(k, _status_of(e), 1, (time.monotonic() - started) * 1000, str(e)) for k in chunk]
+            continue
+        latency = (time.monotonic() - started) * 1000
+        for k in chunk:
+            q = got.get(str(k))
+            quotes[str(k)] = q if q is not None else quotes.get(str(k))
+            status.append((k, "ok" if q is not None else "missing", 1, latency, None))
+    return {k: q for k, q in quotes.items() if q is not None}, pd.DataFrame(status, columns=STATUS_COLUMNS)
+
+
+def summarize(status):
+    """'212/215 ok, 3 missing' style summary of a status frame."""
+    if status is None or status.empty:
+        return ""
+    counts = status["status"].value_counts()
+    parts = [f"{counts.get('ok', 0)}/{len(status)} ok"]
+    parts += [f"{n} {s}" for s, n in counts.items() if s != "ok"]
+    return ", ".join(parts)
+
+
+def status_frame():
+    """Latest status of every endpoint/key fetched through call()."""
+    with _lock:
+        rows = list(_status.values())
+    return pd.DataFrame(rows, columns=["endpoint", "key", "status", "attempts", "latency_ms", "error", "at"])
+
+
+def breaker_frame():
+    with _lock:
+        gates = list(_breakers.values())
+    return pd.DataFrame([{"endpoint": g.name, "state": g.state, "failures": g.failures} for g in gates],
+                        columns=["endpoint", "state", "failures"])
+
+
+def reset():
+    with _lock:
+        _breakers.clear()
+        _last_good.clear()
+        _status.clear()
@@ -1,39 +1,29 @@
 import pandas as pd
-import json
 import time
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from utils import tracing, nse, config
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib.parse
-# Load symbols
 
-FO_SYMBOLS = pd.read_csv(r"C:\Users\SRI SAI\Desktop\trade-analyst\data\f&o data.csv")
-symbols = FO_SYMBOLS["Symbol"].tolist()
+SYMBOLS_PATH = config.data_path("f&o data.csv")
+HISTORY_PATH = config.data_path("fno_stocks_historic_data.csv")
 
 s = ['M&M', 'M&MFIN']
 
-# Date range
-TODAY = datetime.today()
-FROM_DATE = (TODAY - timedelta(days=30)).strftime("%d-%m-%Y")
-TO_DATE = TODAY.strftime("%d-%m-%Y")
+def load_symbols(path=SYMBOLS_PATH):
+    return pd.read_csv(path)["Symbol"].tolist()
+
+def date_range(days=30):
+    """(from, to) dates in the dd-mm-YYYY form the NSE archive expects."""
+    today = datetime.today()
+    return (today - timedelta(days=days)).strftime("%d-%m-%Y"), today.strftime("%d-%m-%Y")
 
 #urls = []
-def get_data(symbol):
+@tracing.traced("fetch.security_archives")
+def get_data(symbol, from_date=None, to_date=None):
+    FROM_DATE, TO_DATE = (from_date, to_date) if from_date and to_date else date_range()
     try:
 
-        options = Options()
-        options.add_argument("--headless=new")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("start-maximized")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
-
-        driver = webdriver.Chrome(options=options)
-        driver.get("https://www.nseindia.com")
-        time.sleep(2)
-
         # Construct the URL with the correct symbol
         if symbol not in s:
             url = (
@@ -48,13 +38,7 @@ def get_data(symbol):
                 f"?from={FROM_DATE}&to={TO_DATE}&symbol={symbol.upper()}&dataType=priceVolumeDeliverable&series=ALL"
             )
             #urls.append(url)           
-        driver.get(url)
-        time.sleep(2)
-
-        text = driver.find_element("tag name", "pre").text
-        driver.quit()
-
-        response = json.loads(text)
+        response = nse.fetch_json(url, cookie_wait=2, headless="--headless=new")
         stock_data = response.get("data", [])
 
         if stock_data:
@@ -88,6 +72,7 @@ if __name__ == "__main__":
     start_time = time.time()
     a = []
     na = []
+    symbols = load_symbols()
     with ThreadPoolExecutor(max_workers=10) as executor:
         futures = {executor.submit(get_data, symbol): symbol for symbol in symbols}
 
@@ -101,7 +86,7 @@ if __name__ == "__main__":
 
     if all_data:
         final_df = pd.concat(all_data, ignore_index=True)
-        final_df.to_csv(r"C:\Users\SRI SAI\Desktop\trade-analyst\data\fno_stocks_historic_data.csv", index=False)
+        final_df.to_csv(HISTORY_PATH, index=False)
         print("\nData successfully saved to fno_stocks_historic_data.csv ✅")
         print(f" successfully loaded : \n{a}")
         print(f" failed to load : \n{na}")
@@ -0,0 +1,193 @@
+## Instrument master
+# Refreshes the Kite instrument dump once per trading day, stores it with
+# compact dtypes and builds lookup indexes so symbol/token lookups and
+# "options of NAME for EXPIRY near ATM" queries never scan the table.
+'''
+master = instruments.get_master()                 # cached dump (or data/all_k_data.csv)
+master = instruments.get_master(kite)             # refresh from kite.instruments() if stale
+master.token("RELIANCE")                          # -> 738561
+master.lookup(738561)["tradingsymbol"]            # -> "RELIANCE"
+master.expiries("NIFTY")                          # option expiries, nearest first
+master.options("NIFTY", expiry, spot=24850, n_strikes=10)   # CE/PE tokens per strike
+
+Indexes:
+(exchange, tradingsymbol) -> token     dict
+instrument_token -> row                dict
+(name, expiry) -> strike ladder        sorted NumPy columns (strike, CE/PE token and
+                                       symbol, lot size); ATM found with searchsorted
+'''
+
+import os
+import pickle
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from utils import config, replay, schema, tracing
+
+SEED_PATH = config.data_path("all_k_data.csv")
+CACHE_DIR = config.cache_path("instruments")
+EXCHANGES = ("NSE", "NFO")
+LADDER_COLUMNS = ["strike", "CE.instrument_token", "PE.instrument_token",
+                  "CE.tradingsymbol", "PE.tradingsymbol", "lot_size"]
+
+
+class InstrumentMaster:
+    """Indexed, compact view of the Kite instrument dump."""
+
+    def __init__(self, df, as_of=None):
+        self.df = schema.compact_instruments(df.reset_index(drop=True), "instruments")
+        self.as_of = as_of
+        self._build()
+
+    @tracing.traced("analytics.instruments.index")
+    def _build(self):
+        df = self.df
+        tokens = df["instrument_token"].to_numpy().tolist()
+        self._by_token = dict(zip(tokens, range(len(df))))
+        self._by_symbol = dict(zip(zip(df["exchange"].astype(str), df["tradingsymbol"].astype(str)), tokens))
+
+        self._ladders = {}
+        self._expiries = {}
+        opts = df[df["instrument_type"].isin(["CE", "PE"]) & df["expiry"].notna()]
+        if opts.empty:
+            return
+        legs = opts.pivot_table(index=["name", "expiry", "strike"], columns="instrument_type",
+                                values="instrument_token", aggfunc="first", observed=True)
+        symbols = opts.pivot_table(index=["name", "expiry", "strike"], columns="instrument_type",
+                                   values="tradingsymbol", aggfunc="first", observed=True)
+        lots = opts.groupby(["name", "expiry", "strike"], observed=True)["lot_size"].first()
+        ladder = pd.DataFrame({
+            "CE.instrument_token": legs.get("CE"), "PE.instrument_token": legs.get("PE"),
+            "CE.tradingsymbol": symbols.get("CE"), "PE.tradingsymbol": symbols.get("PE"),
+            "lot_size": lots,
+        }).reset_index().sort_values(["name", "expiry", "strike"])
+        for (name, expiry), group in ladder.groupby(["name", "expiry"], observed=True, sort=False):
+            self._ladders[(str(name), pd.Timestamp(expiry).date())] = {
+                column: group[column].to_numpy("float64" if column == "strike" else None)
+                for column in LADDER_COLUMNS}
+            self._expiries.setdefault(str(name), []).append(pd.Timestamp(expiry).date())
+        for name in self._expiries:
+            self._expiries[name].sort()
+
+    # --- Loading and refresh ---
+
+    @classmethod
+    def from_csv(cls, path=SEED_PATH):
+        return cls(pd.read_csv(path), as_of=None)
+
+    @classmethod
+    def from_kite(cls, kite, exchanges=EXCHANGES):
+        frames = []
+        for exchange in exchanges:
+            with tracing.span("kite.instruments"):
+                frames.append(pd.DataFrame(kite.instruments(exchange)))
+        df = pd.concat(frames, ignore_index=True)
+        df["expiry"] = pd.to_datetime(df["expiry"].replace("", None))
+        return cls(df, as_of=replay.now().date())
+
+    def save(self, cache_dir=CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"{self.as_of or date.today()}.pkl")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.df, f)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, cache_dir=CACHE_DIR, seed_path=SEED_PATH):
+        """Newest cached dump, else the bundled CSV."""
+        cached = sorted(n for n in os.listdir(cache_dir) if n.endswith(".pkl")) if os.path.isdir(cache_dir) else []
+        if cached:
+            with open(os.path.join(cache_dir, cached[-1]), "rb") as f:
+                return cls(pickle.load(f), as_of=date.fromisoformat(cached[-1][:-4]))
+        return cls.from_csv(seed_path)
+
+    def is_stale(self, today=None):
+        return self.as_of is None or self.as_of < (today or replay.now().date())
+
+    # --- Queries ---
+
+    def token(self, symbol, exchange="NSE"):
+        """instrument_token for a trading symbol, or None."""
+        return self._by_symbol.get((exchange, symbol))
+
+    def tokens(self, symbols, exchange="NSE"):
+        """{symbol: token} for every symbol that exists."""
+        by_symbol = self._by_symbol
+        return {s: by_symbol[(exchange, s)] for s in symbols if (exchange, s) in by_symbol}
+
+    def lookup(self, token):
+        """Full instrument row for a token as a dict, or None."""
+        row = self._by_token.get(int(token))
+        return None if row is None else self.df.iloc[row].to_dict()
+
+    def expiries(self, name):
+        """Option expiries of an underlying, nearest first."""
+        return list(self._expiries.get(name, []))
+
+    def nearest_expiry(self, name, on=None):
+        on = on or replay.now().date()
+        upcoming = [e for e in self._expiries.get(name, []) if e >= on]
+        return upcoming[0] if upcoming else None
+
+    def strike_window(self, name, expiry, spot, n_strikes=10):
+        """{column: array} ladder slice within `n_strikes` of the strike nearest `spot`."""
+        ladder = self._ladders.get((name, expiry if isinstance(expiry, date) else pd.Timestamp(expiry).date()))
+        if ladder is None:
+            return {column: np.empty(0) for column in LADDER_COLUMNS}
+        if spot is None:
+            return ladder
+        strikes = ladder["strike"]
+        pos = int(np.searchsorted(strikes, spot))
+        # Nearest strike is either side of the insertion point
+        atm = pos - 1 if pos == len(strikes) or (pos > 0 and spot - strikes[pos - 1] <= strikes[pos] - spot) else pos
+        lo, hi = max(atm - n_strikes, 0), min(atm + n_strikes + 1, len(strikes))
+        return {column: values[lo:hi] for column, values in ladder.items()}
+
+    def options(self, name, expiry=None, spot=None, n_strikes=10):
+        """CE/PE tokens and symbols per strike for one expiry (nearest if omitted)."""
+        expiry = expiry or self.nearest_expiry(name)
+        if expiry is None:
+            return pd.DataFrame(columns=["expiry"] + LADDER_COLUMNS)
+        ladder = pd.DataFrame(self.strike_window(name, expiry, spot, n_strikes))
+        ladder.insert(0, "expiry", pd.Timestamp(expiry))
+        return ladder
+
+    def futures(self, name):
+        """Futures contracts of an underlying, nearest expiry first."""
+        df = self.df
+        return df[(df["name"] == name) & (df["instrument_type"] == "FUT")].sort_values("expiry")
+
+
+_master = None
+
+
+def get_master(kite=None, cache_dir=CACHE_DIR):
+    """Process-wide master; refreshed from Kite once per day when a session is given."""
+    global _master
+    if _master is None:
+        _master = InstrumentMaster.load(cache_dir)
+    if kite is not None and not replay.is_enabled() and _master.is_stale():
+        try:
+            _master = InstrumentMaster.from_kite(kite)
+            _master.save(cache_dir)
+        except Exception as e:
+            print(f"Instrument refresh failed, using {_master.as_of or 'bundled'} dump: {e}")
+    return _master
+
+
+if __name__ == "__main__":
+    import timeit
+    from utils import kite_session
+
+    master = get_master(kite_session.gen_ses())
+    print(f"{len(master.df)} instruments as of {master.as_of or 'bundled CSV'}")
+    n = 100_000
+    print(f"token('RELIANCE') = {master.token('RELIANCE')} "
+          f"({timeit.timeit(lambda: master.token('RELIANCE'), number=n) / n * 1e6:.2f} us)")
+    expiry = master.nearest_expiry("NIFTY")
+    if expiry:
+        print(master.options("NIFTY", expiry, spot=24850, n_strikes=5))
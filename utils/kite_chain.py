@@ -0,0 +1,251 @@
+## Kite option chain
+# Builds an option chain from Kite quotes instead of scraping NSE: option
+# tokens come from the instrument master, quotes are pulled in batches of up
+# to 500 instruments through the shared rate limiter, and the result uses the
+# same strikePrice/expiryDate/CE.*/PE.* layout as OI.get_data(), so
+# analyze_option_chain and get_liquidation_zones work on it unchanged.
+'''
+Field mapping (Kite quote -> NSE leg field):
+openInterest, totalTradedVolume   oi / lot size, volume / lot size (contracts, as NSE)
+changeinOpenInterest              OI minus the last OI seen on the previous trading
+                                  day (from this module's OI store), or minus the
+                                  first OI seen today when no previous day is stored
+lastPrice, change, pChange        last_price, net change vs previous close
+bidprice/bidQty, askPrice/askQty  best level of market depth
+impliedVolatility                 Black-Scholes IV (%) solved from lastPrice; 0 when
+                                  the price is below intrinsic, as NSE reports it
+                                  (NaN after utils/quality.py, like NSE's zeros)
+'''
+
+import os
+import math
+import pickle
+import threading
+from datetime import datetime, time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils import config, fetch, instruments, quality, replay, schema, tracing
+
+QUOTE_BATCH = 500
+RISK_FREE = 0.07
+EXPIRY_TIME = dtime(15, 30)
+OI_STORE = config.cache_path("kite_chain")
+# Kite quote key of the spot index for each option underlying
+SPOT = {
+    "NIFTY": "NSE:NIFTY 50",
+    "BANKNIFTY": "NSE:NIFTY BANK",
+    "FINNIFTY": "NSE:NIFTY FIN SERVICE",
+    "MIDCPNIFTY": "NSE:NIFTY MID SELECT",
+}
+
+
+def _norm_cdf(x):
+    # Abramowitz-Stegun 7.1.26 erf approximation, |error| < 1.5e-7
+    z = np.abs(x) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-z * z)
+    return 0.5 * (1 + np.sign(x) * erf)
+
+
+def bs_price(spot, strike, years, vol, is_call, rate=RISK_FREE):
+    """Black-Scholes price for arrays of options."""
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol ** 2) * years) / (vol * sqrt_t)
+    d2 = d1 - vol * sqrt_t
+    discount = strike * np.exp(-rate * years)
+    call = spot * _norm_cdf(d1) - discount * _norm_cdf(d2)
+    put = discount * _norm_cdf(-d2) - spot * _norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def implied_vol(price, spot, strike, years, is_call, rate=RISK_FREE, iterations=60):
+    """Vectorized bisection for IV in percent; 0 where no volatility fits the price."""
+    price = np.asarray(price, dtype="float64")
+    strike = np.asarray(strike, dtype="float64")
+    years = np.maximum(np.asarray(years, dtype="float64"), 1e-6)
+    low = np.full_like(price, 1e-4)
+    high = np.full_like(price, 5.0)
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        above = bs_price(spot, strike, years, mid, is_call, rate) > price
+        high = np.where(above, mid, high)
+        low = np.where(above, low, mid)
+    vol = (low + high) / 2
+    fits = (price > 0) & (vol > 1e-3) & (vol < 4.99)
+    return np.where(fits, vol * 100, 0.0)
+
+
+class OIStore:
+    """Last OI seen per token and day, used to derive changeinOpenInterest.
+
+    baseline() only updates memory; save() writes the day file once per chain build.
+    """
+
+    def __init__(self, folder=OI_STORE):
+        self.folder = folder
+        self._days = {}
+        self._lock = threading.Lock()
+
+    def _path(self, day):
+        return os.path.join(self.folder, f"oi_{day}.pkl")
+
+    def _load(self, day):
+        if day not in self._days:
+            path = self._path(day) if self.folder else None
+            if path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    self._days[day] = pickle.load(f)
+            else:
+                self._days[day] = {"first": {}, "last": {}}
+        return self._days[day]
+
+    def previous_day(self, day):
+        if not self.folder or not os.path.isdir(self.folder):
+            return None
+        days = sorted(n[3:-4] for n in os.listdir(self.folder) if n.startswith("oi_") and n.endswith(".pkl"))
+        earlier = [d for d in days if d < day]
+        return earlier[-1] if earlier else None
+
+    def baseline(self, day, tokens, oi):
+        """Reference OI per token; records today's first and last OI (in memory, see save())."""
+        prev = self.previous_day(day)
+        with self._lock:
+            today = self._load(day)
+            for token, value in zip(tokens, oi):
+                today["first"].setdefault(token, value)
+                today["last"][token] = value
+            prev_last = self._load(prev)["last"] if prev else {}
+            base = [prev_last.get(t, today["first"][t]) for t in tokens]
+        return np.asarray(base, dtype="float64")
+
+    def save(self, day):
+        """Write `day`'s first/last OI to disk."""
+        if not self.folder:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = self._path(day) + ".tmp"
+        with self._lock:
+            with open(tmp, "wb") as f:
+                pickle.dump(self._load(day), f)
+            os.replace(tmp, self._path(day))
+
+
+_oi_store = OIStore()
+
+
+@tracing.traced("fetch.kite_chain_quotes")
+def batched_quotes(kite, keys, batch=QUOTE_BATCH, limiter=None):
+    """kite.quote() for any number of instruments, `batch` per call, rate limited.
+
+    Instruments that could not be fetched are left out; their strikes come
+    back as empty legs rather than failing the whole chain.
+    """
+    quotes, status = fetch.kite_quotes(kite, keys, batch=batch, limiter=limiter)
+    failed = status[~status["status"].isin(["ok", "missing"])]
+    if not failed.empty:
+        print(f"Option chain quotes: {fetch.summarize(status)}")
+    return quotes
+
+
+def _depth(q, side, field):
+    levels = (q.get("depth") or {}).get(side) or [{}]
+    return levels[0].get(field, 0)
+
+
+def _legs(quotes, ladder, kind, expiry, spot, now, oi_store):
+    """NSE-style leg columns for one side of a ladder."""
+    tokens = ladder[f"{kind}.instrument_token"]
+    lots = np.maximum(ladder["lot_size"].astype("float64"), 1)
+    present = np.array([str(int(t)) in quotes if t == t else False for t in tokens])
+    empty = {}
+    rows = [quotes.get(str(int(t)), empty) if ok else empty for t, ok in zip(tokens, present)]
+
+    oi = np.array([q.get("oi", np.nan) for q in rows], dtype="float64")
+    last = np.array([q.get("last_price", np.nan) for q in rows], dtype="float64")
+    close = np.array([(q.get("ohlc") or {}).get("close", np.nan) for q in rows], dtype="float64")
+    day = now.strftime("%Y-%m-%d")
+    keys = [int(t) for t, ok in zip(tokens, present) if ok]
+    base = np.full(len(rows), np.nan)
+    if keys:
+        base[present] = oi_store.baseline(day, keys, oi[present].tolist())
+    change_oi = (oi - base) / lots
+    years = (datetime.combine(expiry, EXPIRY_TIME) - now).total_seconds() / (365 * 24 * 3600)
+
+    legs = {
+        "strikePrice": ladder["strike"],
+        "expiryDate": expiry.strftime("%d-%b-%Y"),
+        "underlying": ladder.get("name"),
+        "identifier": ladder[f"{kind}.tradingsymbol"],
+        "openInterest": oi / lots,
+        "changeinOpenInterest": change_oi,
+        "pchangeinOpenInterest": np.where(base > 0, (oi - base) / np.where(base > 0, base, 1) * 100, 0.0),
+        "totalTradedVolume": np.array([q.get("volume", np.nan) for q in rows], dtype="float64") / lots,
+        "impliedVolatility": implied_vol(np.nan_to_num(last), spot, ladder["strike"], years, kind == "CE"),
+        "lastPrice": last,
+        "change": last - close,
+        "pChange": np.where(close > 0, (last - close) / np.where(close > 0, close, 1) * 100, 0.0),
+        "totalBuyQuantity": np.array([q.get("buy_quantity", np.nan) for q in rows], dtype="float64"),
+        "totalSellQuantity": np.array([q.get("sell_quantity", np.nan) for q in rows], dtype="float64"),
+        "bidQty": np.array([_depth(q, "buy", "quantity") for q in rows], dtype="float64"),
+        "bidprice": np.array([_depth(q, "buy", "price") for q in rows], dtype="float64"),
+        "askQty": np.array([_depth(q, "sell", "quantity") for q in rows], dtype="float64"),
+        "askPrice": np.array([_depth(q, "sell", "price") for q in rows], dtype="float64"),
+        "underlyingValue": spot,
+    }
+    frame = pd.DataFrame({f"{kind}.{k}": v for k, v in legs.items() if v is not None})
+    # Strikes without a quote for this side stay empty, like a missing NSE leg
+    frame.loc[~present, frame.columns] = np.nan
+    return frame
+
+
+@tracing.traced("fetch.kite_option_chain")
+def build_chain(kite, symbol="NIFTY", n_strikes=15, nearest=2, expiries=None, master=None, oi_store=None):
+    """Option chain for `symbol` from Kite quotes in the OI.get_data() layout."""
+    master = master or instruments.get_master(kite)
+    oi_store = oi_store or _oi_store
+    now = replay.now()
+    wanted = [pd.Timestamp(e).date() for e in expiries] if expiries else \
+        [e for e in master.expiries(symbol) if e >= now.date()][:nearest]
+    if not wanted:
+        print(f"No option expiries for {symbol} in the instrument master")
+        return pd.DataFrame()
+
+    spot_key = SPOT.get(symbol, f"NSE:{symbol}")
+    spot_quote = batched_quotes(kite, [spot_key]).get(spot_key)
+    if not spot_quote:
+        print(f"No spot quote for {spot_key}")
+        return pd.DataFrame()
+    spot = float(spot_quote["last_price"])
+
+    ladders = {expiry: master.strike_window(symbol, expiry, spot, n_strikes) for expiry in wanted}
+    keys = [int(t) for ladder in ladders.values()
+            for kind in ("CE", "PE") for t in ladder[f"{kind}.instrument_token"] if t == t]
+    quotes = batched_quotes(kite, keys)
+
+    frames = []
+    for expiry, ladder in ladders.items():
+        if not len(ladder["strike"]):
+            continue
+        ladder = dict(ladder, name=np.full(len(ladder["strike"]), symbol))
+        head = pd.DataFrame({"strikePrice": ladder["strike"], "expiryDate": expiry.strftime("%d-%b-%Y")})
+        frames.append(pd.concat([head] + [_legs(quotes, ladder, kind, expiry, spot, now, oi_store)
+                                          for kind in ("CE", "PE")], axis=1))
+    if not frames:
+        return pd.DataFrame()
+    oi_store.save(now.strftime("%Y-%m-%d"))
+    name = f"kite_option_chain_{symbol}"
+    return quality.validate(schema.compact_option_chain(pd.concat(frames, ignore_index=True), name), "option_chain", name)
+
+
+if __name__ == "__main__":
+    from utils import OI, kite_session
+
+    chain = build_chain(kite_session.gen_ses(), "NIFTY")
+    print(chain[["expiryDate", "strikePrice", "CE.openInterest", "CE.impliedVolatility",
+                 "PE.openInterest", "PE.impliedVolatility"]].head(20))
+    if not chain.empty:
+        results = OI.analyze_option_chain(chain.copy())
+        print(results["Top PE OI Change Latest"][["expiryDate", "strikePrice", "PE_OI_Change_%"]])
@@ -0,0 +1,19 @@
+## Kite session
+# One place that builds the KiteConnect session. kiteconnect is imported only
+# when a live session is created, and replay/record mode is honoured.
+
+from utils import replay, config
+
+
+def live_session():
+    """KiteConnect from KITE_API_KEY/KITE_ACCESS_TOKEN or api.txt (see utils/config.py)."""
+    from kiteconnect import KiteConnect
+
+    api_key, access_token = config.kite_credentials()
+    kite = KiteConnect(api_key=api_key)
+    kite.set_access_token(access_token)
+    return kite
+
+
+def gen_ses():
+    return replay.session(live_session)
@@ -0,0 +1,63 @@
+## Store writer lease
+# A day store (OI spurts, market breadth) has one writer at a time. The
+# scheduled poller claims the store folder while it runs and renews the claim
+# every poll; the dashboard records into the store only while nobody else
+# holds it, and otherwise re-reads what the poller wrote.
+'''
+lease = Lease(folder)
+lease.acquire(ttl=900)     # poller: take the store over (renew each poll)
+lease.held_by_other()      # dashboard: True while a live poller owns the store
+lease.release()            # poller exit; an unreleased claim expires after its ttl
+'''
+
+import os
+import json
+import time
+import socket
+
+FILE = "WRITER"
+
+
+class Lease:
+    """Claim file <folder>/WRITER holding the owner and a renewal time."""
+
+    def __init__(self, folder, name=FILE):
+        self.path = os.path.join(folder, name) if folder else None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def holder(self):
+        """Owner of a live claim, or None when the store is free or the claim expired."""
+        if self.path is None:
+            return None
+        info = self._read()
+        if info is None or time.time() - info.get("at", 0) > info.get("ttl", 0):
+            return None
+        return info.get("owner")
+
+    def held_by_other(self):
+        holder = self.holder()
+        return holder is not None and holder != self.owner
+
+    def acquire(self, ttl):
+        """Claim (or renew) the store for `ttl` wall-clock seconds; a poller takes over from anyone."""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"owner": self.owner, "at": time.time(), "ttl": ttl}, f)
+        os.replace(tmp, self.path)
+
+    def release(self):
+        if self.path is not None and self.holder() == self.owner:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
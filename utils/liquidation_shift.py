@@ -11,44 +11,12 @@ Battle Zone (Volatile)	CE & PE OI both rising	            ⚠️ Wait for breako
 '''
 
 import pandas as pd
-import json
-import time
-from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-import random
-
-def get_data(symbol):
-    try:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("start-maximized")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
-
-        driver = webdriver.Chrome(options=options)
-        driver.get("https://www.nseindia.com")
-        time.sleep(3)
-
-        url = f"https://www.nseindia.com/api/option-chain-indices?symbol={symbol}"
-        driver.get(url)
-        time.sleep(random.uniform(2, 4))
-
-        text = driver.find_element("tag name", "pre").text
-        response = json.loads(text)
-        data = response.get("records", {}).get("data", [])
-
-        driver.quit()
-        if data:
-            return pd.json_normalize(data)
-        else:
-            return pd.DataFrame()
-    except Exception as e:
-        print(f"Error fetching data: {e}")
-        return pd.DataFrame()
+from utils import tracing, chain_ingest
 
+def get_data(symbol, strike_window=None, expiries=None, nearest=None, min_volume=0):
+    return chain_ingest.get_chain(symbol, strike_window, expiries, nearest, min_volume, api_wait=(2, 4))
+
+@tracing.traced("analytics.get_liquidation_zones")
 def get_liquidation_zones(df, oi_threshold=20000, unwinding_threshold=-2000, buildup_threshold=2000):
     """
     Identifies potential liquidation, buildup, and conflict zones in option chain data.
@@ -0,0 +1,50 @@
+## NSE JSON fetch through headless Chrome
+# Shared by every NSE scraper. Selenium is imported only when a fetch
+# actually runs, so importing a scraper module stays cheap.
+
+import json
+import random
+
+from utils import tracing
+
+HOME = "https://www.nseindia.com"
+USER_AGENT = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+def _driver(headless="--headless"):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    options.add_argument(headless)
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("start-maximized")
+    options.add_argument(USER_AGENT)
+    with tracing.span("nse.selenium_start"):
+        return webdriver.Chrome(options=options)
+
+
+def fetch_json(url, cookie_wait=3, api_wait=2, tag="pre", headless="--headless"):
+    """Load the NSE homepage for cookies, then return the parsed JSON at `url`.
+
+    `api_wait` may be a (low, high) tuple for a randomized wait. Errors are
+    raised to the caller, which decides how to degrade.
+    """
+    driver = _driver(headless)
+    try:
+        with tracing.span("nse.homepage"):
+            driver.get(HOME)
+        tracing.traced_sleep("nse.cookie_wait", cookie_wait)
+
+        with tracing.span("nse.api_get"):
+            driver.get(url)
+        wait = random.uniform(*api_wait) if isinstance(api_wait, tuple) else api_wait
+        tracing.traced_sleep("nse.api_wait", wait)
+
+        text = driver.find_element("tag name", tag).text
+        with tracing.span("nse.json_parse"):
+            return json.loads(text)
+    finally:
+        driver.quit()
@@ -0,0 +1,234 @@
+## OI spurt tracker
+# Polls NSE's OI-spurts endpoint on a schedule, keeps every snapshot in a
+# compact time-indexed store (one file per trading day) and classifies the
+# per-symbol OI/price buildup as each snapshot arrives.
+'''
+Buildup from the price move and OI move of a symbol:
+Long Buildup     price up,   OI up
+Short Buildup    price down, OI up
+Short Covering   price up,   OI down
+Long Unwinding   price down, OI down
+
+"Step" buildup compares a snapshot with the previous one for that symbol,
+"session" buildup compares it with the symbol's first snapshot of the day.
+
+One writer per store (utils/lease.py): the poller below owns the day file
+while it runs and the dashboard only re-reads it; without a poller the
+dashboard records its own fetches.
+
+python -m utils.oi_tracker                 # poll every 5 minutes until 15:30
+python -m utils.oi_tracker --interval 120 --polls 10
+'''
+
+import os
+import pickle
+import argparse
+import threading
+from datetime import time as dtime
+
+import numpy as np
+import pandas as pd
+
+from utils import Ch_oi_oi_spurt, config, lease, replay, schema, tracing
+
+STORE_DIR = config.cache_path("oi_spurts")
+POLL_SECONDS = 300
+SESSION_END = dtime(15, 30)
+VALUE_COLUMNS = ["cmp", "volume", "changeInOI", "%changeInOI"]
+BUILDUPS = ["Long Buildup", "Short Buildup", "Short Covering", "Long Unwinding"]
+
+
+def classify(price_change, oi_change):
+    """Buildup label per row; rows with no price or OI move stay unlabelled."""
+    price_change = np.asarray(price_change, dtype="float64")
+    oi_change = np.asarray(oi_change, dtype="float64")
+    labels = np.select(
+        [(price_change > 0) & (oi_change > 0), (price_change < 0) & (oi_change > 0),
+         (price_change > 0) & (oi_change < 0), (price_change < 0) & (oi_change < 0)],
+        BUILDUPS, "")
+    return pd.Categorical(labels, categories=BUILDUPS + [""])
+
+
+class OISpurtTracker:
+    """Time-indexed store of OI-spurt snapshots with incremental buildup labels."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        self.day = None
+        self.lease = lease.Lease(store_dir)
+        self._chunks = []
+        self._history = None
+        self._last = None    # latest values per symbol
+        self._open = None    # first values per symbol this session
+        self._stamp = None   # (mtime, size) of the store as last read or written
+        self._lock = threading.RLock()
+
+    def _path(self, day):
+        return os.path.join(self.store_dir, f"{day}.pkl") if self.store_dir else None
+
+    def _file_stamp(self, path):
+        if not path or not os.path.exists(path):
+            return None
+        info = os.stat(path)
+        return info.st_mtime_ns, info.st_size
+
+    def _start_day(self, day):
+        """Reset state for a new trading day, resuming from disk if a store exists."""
+        self.day = day
+        self._chunks, self._history, self._last, self._open = [], None, None, None
+        path = self._path(day)
+        self._stamp = self._file_stamp(path)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                history = pickle.load(f)
+            if not history.empty:
+                self._chunks = [history]
+                by_symbol = history.groupby("symbol", observed=True)[VALUE_COLUMNS]
+                self._last = by_symbol.last()
+                self._open = by_symbol.first()
+
+    def _save(self):
+        path = self._path(self.day)
+        if not path:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.history(), f)
+        os.replace(tmp, path)
+        self._stamp = self._file_stamp(path)
+
+    def refresh(self, at=None):
+        """Re-read the day's store if another process (the poller) wrote it since."""
+        day = pd.Timestamp(at or replay.now()).strftime("%Y-%m-%d")
+        with self._lock:
+            if day != self.day or self._file_stamp(self._path(day)) != self._stamp:
+                self._start_day(day)
+        return self
+
+    def sync(self, snapshot, at=None):
+        """Dashboard entry point: record `snapshot` unless a poller owns the store, then read it."""
+        self.refresh(at)
+        if not self.lease.held_by_other():
+            self.record(snapshot, at)
+        return self
+
+    @tracing.traced("analytics.oi_tracker.record")
+    def record(self, snapshot, at=None):
+        """Add one snapshot; returns its labelled rows, or None if nothing new.
+
+        Identical consecutive snapshots (e.g. a cached fetch served twice) are
+        skipped so the time series only moves when NSE publishes new numbers.
+        """
+        if snapshot is None or snapshot.empty:
+            return None
+        with self._lock:
+            at = pd.Timestamp(at or replay.now()).floor("s")
+            day = at.strftime("%Y-%m-%d")
+            if day != self.day:
+                self._start_day(day)
+
+            snap = schema.compact_spurts(snapshot).drop_duplicates("symbol", keep="last")
+            snap = snap.set_index(snap["symbol"].astype(str))[VALUE_COLUMNS]
+            if self._last is not None:
+                if at <= self._chunks[-1]["time"].iloc[-1]:
+                    return None
+                prev = self._last.reindex(snap.index)
+                if prev.notna().all(axis=None) and np.array_equal(prev.to_numpy("float64"), snap.to_numpy("float64")):
+                    return None
+            else:
+                prev = snap.iloc[:0].reindex(snap.index)
+            first = snap if self._open is None else self._open.reindex(snap.index).fillna(snap)
+
+            price_step = snap["cmp"] - prev["cmp"]
+            oi_step = snap["changeInOI"] - prev["changeInOI"]
+            price_session = snap["cmp"] - first["cmp"]
+            oi_session = snap["changeInOI"] - first["changeInOI"]
+
+            rows = snap.rename_axis("symbol").reset_index()
+            rows.insert(0, "time", at)
+            rows["price_step"] = price_step.to_numpy("float32")
+            rows["oi_step"] = oi_step.to_numpy("float64")
+            rows["buildup"] = classify(price_step, oi_step)
+            rows["session_price_%"] = (price_session / first["cmp"].replace(0, np.nan) * 100).to_numpy("float32")
+            rows["session_oi"] = oi_session.to_numpy("float64")
+            rows["session_buildup"] = classify(price_session, oi_session)
+            rows["symbol"] = rows["symbol"].astype("category")
+
+            # Symbols that drop out of the spurts list keep their last values
+            self._last = snap if self._last is None else snap.combine_first(self._last)
+            self._open = snap if self._open is None else self._open.combine_first(snap)
+            self._chunks.append(rows)
+            self._history = None
+            self._save()
+            return rows
+
+    def poll_once(self, fetch=None):
+        """Fetch one snapshot and record it."""
+        fetch = fetch or Ch_oi_oi_spurt.get_oi_spurts
+        return self.record(fetch())
+
+    def run(self, interval=POLL_SECONDS, until=SESSION_END, polls=None, fetch=None):
+        """Poll every `interval` seconds until `until` (or `polls` snapshots), owning the store meanwhile."""
+        done = 0
+        try:
+            while replay.now().time() < until and (polls is None or done < polls):
+                # Claimed before the store is re-read, so what the dashboard wrote until now is kept
+                self.lease.acquire(ttl=3 * interval + 60)
+                try:
+                    rows = self.refresh().poll_once(fetch)
+                    if rows is not None:
+                        print(f"{replay.now():%H:%M:%S} recorded {len(rows)} symbols")
+                except Exception as e:
+                    print(f"OI spurt poll failed: {e}")
+                done += 1
+                replay.sleep(interval)
+        finally:
+            self.lease.release()
+        return self
+
+    def history(self):
+        """Every recorded row of the current day, in time order."""
+        with self._lock:
+            if self._history is None:
+                if not self._chunks:
+                    return pd.DataFrame(columns=["time", "symbol"] + VALUE_COLUMNS)
+                history = pd.concat(self._chunks, ignore_index=True) if len(self._chunks) > 1 else self._chunks[0]
+                # Categories differ per snapshot; re-unify so the store stays compact
+                history["symbol"] = history["symbol"].astype(str).astype("category")
+                for column in ("buildup", "session_buildup"):
+                    history[column] = pd.Categorical(history[column].astype(str), categories=BUILDUPS + [""])
+                self._chunks = [history]
+                self._history = history
+            return self._history
+
+    def trend(self, value="changeInOI", symbols=None):
+        """time x symbol matrix of `value` over the session."""
+        history = self.history()
+        if symbols is not None:
+            history = history[history["symbol"].isin(symbols)]
+        wide = history.pivot_table(index="time", columns="symbol", values=value, aggfunc="last", observed=True)
+        wide.columns = wide.columns.astype(str)
+        return wide
+
+    def summary(self):
+        """Latest row per symbol with session move and buildup counts."""
+        history = self.history()
+        if history.empty:
+            return history
+        latest = history.groupby("symbol", observed=True).tail(1).set_index("symbol")
+        counts = pd.crosstab(history["symbol"], history["buildup"])
+        counts = counts.reindex(columns=BUILDUPS, fill_value=0)
+        table = latest[["time", "cmp", "volume", "changeInOI", "session_price_%", "session_oi",
+                        "buildup", "session_buildup"]].join(counts)
+        table.index = table.index.astype(str)
+        return table.sort_values("session_oi", ascending=False).reset_index()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll NSE OI spurts into the intraday store")
+    parser.add_argument("--interval", type=int, default=POLL_SECONDS)
+    parser.add_argument("--polls", type=int)
+    args = parser.parse_args()
+    tracker = OISpurtTracker().run(args.interval, polls=args.polls)
+    print(tracker.summary().head(20))
@@ -0,0 +1,385 @@
+## Data quality
+# Validation stage run on every ingest (Kite quotes, candle files, the NSE
+# history file, option chains and the R-Score input). Every check is one
+# vectorized mask over the whole frame; failing rows are quarantined with the
+# reason instead of flowing into % Change, IV skew or R-Score z-scores, and
+# per-source counters show what was caught.
+'''
+clean = quality.validate(df, "quotes", "kite_quotes")
+    clean.attrs["quality"] -> {"rows": 500, "passed": 497, "quarantined": 3, ...}
+    quality.quarantined("kite_quotes") -> the bad rows with a "reason" column
+
+Actions per check:
+quarantine   the row is removed (reason = first failing check)
+null         the bad values become NaN, the row stays (e.g. IV of 0)
+flag         only counted (e.g. stale quotes of illiquid stocks)
+sort         rows are put back in time order per instrument
+
+Columns are coerced first (text prices -> numbers, date strings -> datetime64);
+a value that does not parse fails the "schema" check. A batch where more than
+MAX_BAD of the rows fail raises QualityError, so callers and their caches
+keep the last good data instead of caching garbage.
+
+python -m utils.quality           # validate the bundled data files, save quarantines to CSV
+'''
+
+import os
+import re
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils import config, tracing
+
+QUARANTINE_DIR = config.cache_path("quarantine")
+STALE_MINUTES = 30       # quote older than the batch's newest trade by this much
+MAX_BAD = 0.5
+MIN_ROWS = 10            # smaller batches never raise QualityError
+MAX_IV = 1000
+TOKEN_MAX = 2**31
+TOLERANCE = 1e-6         # relative slack for the OHLC range check
+QUARANTINE_ROWS = 1000   # rows kept in memory per source
+
+QUARANTINE = "quarantine"
+NULL = "null"
+FLAG = "flag"
+SORT = "sort"
+
+Check = namedtuple("Check", "name action test columns", defaults=((),))
+
+
+class QualityError(ValueError):
+    pass
+
+
+# Vectorized tests: each returns a boolean mask of bad rows, or None when it does not apply
+
+def _has(df, *columns):
+    return all(c in df.columns for c in columns)
+
+
+def _bad_token(column):
+    def test(df):
+        if column not in df.columns:
+            return None
+        token = df[column]
+        return ~(token.notna() & (token > 0) & (token < TOKEN_MAX) & (token == token.round()))
+    return test
+
+
+def _not_positive(*columns):
+    def test(df):
+        present = [c for c in columns if c in df.columns]
+        if not present:
+            return None
+        return ~(df[present] > 0).all(axis=1)
+    return test
+
+
+def _negative(*columns):
+    def test(df):
+        present = [c for c in columns if c in df.columns]
+        if not present:
+            return None
+        return (df[present] < 0).any(axis=1)
+    return test
+
+
+def _ohlc(df):
+    if not _has(df, "open", "high", "low", "close"):
+        return None
+    body_low = np.fmin(df["open"], df["close"])
+    body_high = np.fmax(df["open"], df["close"])
+    slack = TOLERANCE * body_high
+    return (df["low"] > body_low + slack) | (df["high"] < body_high - slack) | (df["high"] < df["low"])
+
+
+def _high_low(df):
+    # Before the open Kite reports high = low = 0
+    if not _has(df, "high", "low"):
+        return None
+    return (df["low"] > 0) & (df["high"] < df["low"])
+
+
+def _duplicate(keys, keep="last", day=None):
+    def test(df):
+        if not _has(df, *keys):
+            return None
+        frame = df[list(keys)]
+        if day is not None:
+            frame = frame.assign(**{day: df[day].dt.normalize()})
+        return frame.duplicated(keep=keep)
+    return test
+
+
+def _unordered(key, at):
+    def test(df):
+        if not _has(df, key, at):
+            return None
+        return df[at] < df.groupby(key, sort=False, observed=True)[at].shift()
+    return test
+
+
+def _stale(df):
+    if "last_trade_time" not in df.columns or df["last_trade_time"].isna().all():
+        return None
+    at = df["last_trade_time"]
+    return at < at.max() - pd.Timedelta(minutes=STALE_MINUTES)
+
+
+def _iv(column):
+    def test(df):
+        if column not in df.columns:
+            return None
+        iv = df[column]
+        return (iv <= 0) | (iv > MAX_IV)
+    return test
+
+
+# Per kind: columns coerced before the checks, columns that must be present and non-null, checks
+KINDS = {
+    "quotes": {
+        "numeric": ["instrument_token", "open", "high", "low", "close", "last_price", "average_price",
+                    "buy_quantity", "sell_quantity", "oi", "volume"],
+        "time": ["last_trade_time"],
+        "required": ["instrument_token", "last_price", "close"],
+        "checks": [
+            Check("token", QUARANTINE, _bad_token("instrument_token")),
+            Check("last_price", QUARANTINE, _not_positive("last_price")),
+            Check("prev_close", QUARANTINE, _not_positive("close")),
+            Check("high_low", QUARANTINE, _high_low),
+            Check("negative", QUARANTINE, _negative("volume", "oi", "buy_quantity", "sell_quantity")),
+            Check("duplicate", QUARANTINE, _duplicate(["instrument_token"])),
+            Check("stale", FLAG, _stale),
+        ],
+    },
+    "candles": {
+        "numeric": ["instrument_token", "open", "high", "low", "close", "volume"],
+        "time": ["date"],
+        "required": ["instrument_token", "date", "open", "high", "low", "close"],
+        "checks": [
+            Check("token", QUARANTINE, _bad_token("instrument_token")),
+            Check("price", QUARANTINE, _not_positive("open", "high", "low", "close")),
+            Check("ohlc", QUARANTINE, _ohlc),
+            Check("negative", QUARANTINE, _negative("volume")),
+            Check("duplicate", QUARANTINE, _duplicate(["instrument_token", "date"])),
+            Check("unordered", SORT, _unordered("instrument_token", "date"), ("instrument_token", "date")),
+        ],
+    },
+    # Daily bars fed to calculate_r_score(): history plus today's quote row
+    "daily": {
+        "numeric": ["instrument_token", "open", "high", "low", "close", "volume"],
+        "time": ["date"],
+        "required": ["instrument_token", "date", "open", "close"],
+        "checks": [
+            Check("token", QUARANTINE, _bad_token("instrument_token")),
+            Check("price", QUARANTINE, _not_positive("open", "close")),
+            Check("negative", QUARANTINE, _negative("volume")),
+            Check("duplicate", QUARANTINE, _duplicate(["instrument_token", "date"], day="date")),
+        ],
+    },
+    # fno_stocks_historic_data.csv; NSE lists odd-lot trades as a second row after the main one
+    "historic": {
+        "numeric": ["open", "high", "low", "close", "prev_close", "total_trade", "volume", "delivery_qty",
+                    "delivery_per", "vwap"],
+        "time": ["date"],
+        "required": ["symbol", "date", "close", "prev_close"],
+        "checks": [
+            Check("price", QUARANTINE, _not_positive("open", "high", "low", "close", "prev_close")),
+            Check("ohlc", QUARANTINE, _ohlc),
+            Check("negative", QUARANTINE, _negative("total_trade", "volume", "delivery_qty")),
+            Check("delivery_per", QUARANTINE, lambda df: (df["delivery_per"] > 100)
+                  if "delivery_per" in df.columns else None),
+            Check("duplicate", QUARANTINE, _duplicate(["symbol", "date"], keep="first")),
+            Check("unordered", SORT, _unordered("symbol", "date"), ("symbol", "date")),
+        ],
+    },
+    "option_chain": {
+        "numeric": ["strikePrice", "CE.impliedVolatility", "PE.impliedVolatility", "CE.openInterest",
+                    "PE.openInterest"],
+        "time": [],
+        "required": ["strikePrice", "expiryDate"],
+        "checks": [
+            Check("strike", QUARANTINE, _not_positive("strikePrice")),
+            Check("negative_oi", QUARANTINE, _negative("CE.openInterest", "PE.openInterest")),
+            Check("duplicate", QUARANTINE, _duplicate(["expiryDate", "strikePrice"])),
+            Check("ce_iv", NULL, _iv("CE.impliedVolatility"), ("CE.impliedVolatility",)),
+            Check("pe_iv", NULL, _iv("PE.impliedVolatility"), ("PE.impliedVolatility",)),
+        ],
+    },
+}
+
+_lock = threading.Lock()
+_counters = {}
+_hits = {}
+_quarantine = {}
+
+
+def _coerce(df, rules):
+    """(frame with rules' columns parsed, mask of rows where a present value did not parse)."""
+    bad = np.zeros(len(df), dtype=bool)
+    coerced = {}
+    for column in rules["numeric"]:
+        if column in df.columns and not pd.api.types.is_numeric_dtype(df[column].dtype):
+            parsed = pd.to_numeric(df[column], errors="coerce")
+            bad |= (parsed.isna() & df[column].notna()).to_numpy()
+            coerced[column] = parsed
+    for column in rules["time"]:
+        if column in df.columns and df[column].dtype.kind != "M":
+            parsed = pd.to_datetime(df[column], errors="coerce")
+            if getattr(parsed.dt, "tz", None) is not None:
+                parsed = parsed.dt.tz_localize(None)
+            bad |= (parsed.isna() & df[column].notna()).to_numpy()
+            coerced[column] = parsed
+    return (df.assign(**coerced) if coerced else df), bad
+
+
+def _order(df, key, at):
+    """`df` in time order within each instrument, instruments in first-seen order."""
+    codes = pd.factorize(df[key])[0]
+    return df.iloc[np.lexsort((df[at].to_numpy(), codes))]
+
+
+def _record(name, kind, report, bad_rows, ms):
+    with _lock:
+        counter = _counters.setdefault(name, {"source": name, "kind": kind, "batches": 0, "rows": 0,
+                                              "quarantined": 0, "repaired": 0, "flagged": 0, "rejected": 0})
+        counter["batches"] += 1
+        for field in ("rows", "quarantined", "repaired", "flagged"):
+            counter[field] += report[field]
+        counter["rejected"] += int(report["rejected"])
+        counter["last_ms"] = ms
+        counter["last_at"] = pd.Timestamp.now().floor("s")
+        hits = _hits.setdefault(name, {})
+        for check, n in report["checks"].items():
+            hits[check] = hits.get(check, 0) + n
+        if not bad_rows.empty:
+            _quarantine[name] = bad_rows.tail(QUARANTINE_ROWS)
+
+
+def validate(df, kind, name=None, max_bad=MAX_BAD):
+    """Rows of `df` that pass every `kind` check, with their report in attrs["quality"]."""
+    rules = KINDS[kind]
+    name = name or kind
+    if df is None or df.empty:
+        return df
+    missing = [c for c in rules["required"] if c not in df.columns]
+    if missing:
+        raise QualityError(f"{name}: missing columns {missing}")
+
+    started = time.perf_counter()
+    with tracing.span(f"quality.{kind}"):
+        df, unparsed = _coerce(df, rules)
+        reason = np.where(unparsed, "schema", "").astype(object)
+        empty = df[rules["required"]].isna().any(axis=1).to_numpy() & ~unparsed
+        reason[empty] = "missing"
+        checks = {"schema": int(unparsed.sum()), "missing": int(empty.sum())}
+        nulls, flagged, resort = {}, np.zeros(len(df), dtype=bool), None
+        for check in rules["checks"]:
+            mask = check.test(df)
+            if mask is None:
+                continue
+            mask = np.asarray(mask, dtype=bool)
+            checks[check.name] = int(mask.sum())
+            if not checks[check.name]:
+                continue
+            if check.action == QUARANTINE:
+                reason[mask & (reason == "")] = check.name
+            elif check.action == NULL:
+                for column in check.columns:
+                    nulls[column] = nulls.get(column, np.zeros(len(df), dtype=bool)) | mask
+            elif check.action == FLAG:
+                flagged |= mask
+            elif check.action == SORT:
+                resort = check.columns
+
+        bad = reason != ""
+        clean = df[~bad]
+        if nulls:
+            keep = ~bad
+            clean = clean.assign(**{c: clean[c].mask(m[keep]) for c, m in nulls.items()})
+        if resort is not None:
+            clean = _order(clean, *resort)
+        bad_rows = df[bad].assign(reason=reason[bad])
+
+    report = {
+        "rows": len(df),
+        "passed": len(clean),
+        "quarantined": int(bad.sum()),
+        "repaired": int(sum(m[~bad].sum() for m in nulls.values())),
+        "flagged": int((flagged & ~bad).sum()),
+        "checks": {k: v for k, v in checks.items() if v},
+    }
+    report["rejected"] = len(df) >= MIN_ROWS and report["quarantined"] > max_bad * len(df)
+    _record(name, kind, report, bad_rows, (time.perf_counter() - started) * 1000)
+    if report["rejected"]:
+        raise QualityError(f"{name}: {report['quarantined']} of {len(df)} rows failed validation "
+                           f"{report['checks']}")
+    clean.attrs["quality"] = report
+    return clean
+
+
+def counters():
+    """One row per source: batches, rows seen, rows quarantined/repaired/flagged, batches rejected."""
+    columns = ["source", "kind", "batches", "rows", "quarantined", "repaired", "flagged", "rejected",
+               "last_ms", "last_at"]
+    with _lock:
+        rows = [dict(c) for c in _counters.values()]
+    df = pd.DataFrame(rows, columns=columns)
+    df["bad_pct"] = (df["quarantined"] / df["rows"].replace(0, np.nan) * 100).astype("float64")
+    return df
+
+
+def check_counts():
+    """Hits per (source, check) since the last reset()."""
+    with _lock:
+        rows = [{"source": name, "check": check, "hits": n} for name, hits in _hits.items()
+                for check, n in hits.items()]
+    return pd.DataFrame(rows, columns=["source", "check", "hits"])
+
+
+def quarantined(name=None):
+    """Latest quarantined rows of `name` (or of every source, with a "source" column)."""
+    with _lock:
+        if name is not None:
+            return _quarantine.get(name, pd.DataFrame()).copy()
+        frames = [rows.assign(source=source) for source, rows in _quarantine.items()]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def save_quarantine(folder=QUARANTINE_DIR):
+    """Write each source's quarantined rows to <folder>/<source>.csv; returns the paths."""
+    os.makedirs(folder, exist_ok=True)
+    with _lock:
+        items = list(_quarantine.items())
+    paths = []
+    for source, rows in items:
+        path = os.path.join(folder, re.sub(r"[^\w.-]+", "_", os.path.splitext(os.path.basename(source))[0]) + ".csv")
+        rows.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _hits.clear()
+        _quarantine.clear()
+
+
+if __name__ == "__main__":
+    # schema records into the imported utils.quality, not this __main__ copy
+    from utils import schema, quality
+
+    for interval in ("30", "1h", "1d"):
+        path = config.data_path(f"stock_{interval}.csv")
+        if os.path.exists(path):
+            schema.load_candles(path)
+    schema.load_historic(config.data_path("fno_stocks_historic_data.csv"))
+    print(quality.counters().round({"last_ms": 2, "bad_pct": 2}).to_string(index=False))
+    print(quality.check_counts().to_string(index=False))
+    for path in quality.save_quarantine():
+        print(f"Quarantined rows: {path}")
@@ -0,0 +1,35 @@
+## Shared rate limiter
+# One limiter per API, shared by the app, the CLI and every builder that
+# calls Kite, so parallel callers in the same process respect one budget.
+
+import time
+import threading
+from collections import deque
+
+from utils import tracing
+
+
+class RateLimiter:
+    """Allow at most `max_calls` per `period` seconds; callers block until a slot frees."""
+
+    def __init__(self, max_calls=3, period=1, name="kite.rate_limit_wait"):
+        self.max_calls = max_calls
+        self.period = period
+        self.name = name
+        self.timestamps = deque()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = time.monotonic()
+            while self.timestamps and now - self.timestamps[0] >= self.period:
+                self.timestamps.popleft()
+            if len(self.timestamps) >= self.max_calls:
+                tracing.traced_sleep(self.name, max(self.period - (now - self.timestamps[0]), 0))
+                self.timestamps.popleft()
+            self.timestamps.append(time.monotonic())
+
+
+kite_limiter = RateLimiter(max_calls=3, period=1)
+# historical_data has its own budget, separate from quotes
+historical_limiter = RateLimiter(max_calls=3, period=1, name="kite.historical_wait")
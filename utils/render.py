@@ -0,0 +1,214 @@
+## Rendering layer
+# Turns frames into what the dashboard sends to the browser. Cell colors are
+# computed per column with NumPy instead of a Python lambda per cell, large
+# tables skip the Styler and are formatted by the browser, chart inputs are
+# cut to the plotted columns and thinned, and built figures are cached per
+# data version so a rerun with unchanged data reuses the figure.
+'''
+formats use the Styler syntax already in app.py: {"% Change": "{:.2f}%", "Volume": "{:,}"}
+
+data, number_formats = render.table(df, formats, signed=["% Change"])
+    data is a Styler (format + green/red signs) up to STYLE_CELLS cells; above
+    that it is the frame rounded to each column's decimals, and number_formats
+    maps columns to printf formats for st.column_config.NumberColumn.
+
+fig = render.figure("overview", df, build, columns=["% Change", "Volume", "Symbol"])
+    build(df) runs only when the plotted columns changed since the last call.
+
+render.downsample(trend, 500)   min/max per bucket, keeps peaks of every series
+render.thin(df, 1000, "% Change")  the 1000 rows with the largest |% Change|
+'''
+
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils import tracing
+
+# The Styler renders cell by cell in Python; beyond this many cells tables go out unstyled
+STYLE_CELLS = 20000
+MAX_POINTS = 2000
+FIGURE_CACHE = 64
+POSITIVE = "color: green"
+NEGATIVE = "color: red"
+
+_SPEC = re.compile(r"^(?P<prefix>[^{]*)\{:(?P<spec>[^}]*)\}(?P<suffix>.*)$")
+
+
+def parse_format(fmt):
+    """(prefix, spec, suffix) of a '{:...}' format string, or None."""
+    match = _SPEC.match(fmt) if isinstance(fmt, str) else None
+    return (match["prefix"], match["spec"], match["suffix"]) if match else None
+
+
+def decimals(fmt):
+    """Digits after the point a format shows (0 for '{:,}'), or None if not numeric."""
+    parts = parse_format(fmt)
+    if parts is None:
+        return None
+    precision = re.search(r"\.(\d+)[fe%]?$", parts[1])
+    if precision:
+        return int(precision.group(1))
+    return 0 if parts[1] in ("", ",", "d", ",d") else None
+
+
+def printf(fmt):
+    """The printf equivalent for st.column_config.NumberColumn ('₹{:.2f}' -> '₹%.2f')."""
+    digits = decimals(fmt)
+    if digits is None:
+        return None
+    prefix, _, suffix = parse_format(fmt)
+    # printf has no thousands separator; grouped formats lose only the commas
+    body = "%d" if digits == 0 else f"%.{digits}f"
+    return prefix.replace("%", "%%") + body + suffix.replace("%", "%%")
+
+
+def _numeric(frame):
+    """float64 matrix of `frame`; non-numeric cells become NaN."""
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in frame.dtypes):
+        frame = frame.apply(pd.to_numeric, errors="coerce")
+    return frame.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def sign_css(block, positive=POSITIVE, negative=NEGATIVE):
+    """CSS for every cell of `block`: `positive` above zero, `negative` otherwise."""
+    values = _numeric(block)
+    css = np.where(values > 0, positive, negative)
+    return pd.DataFrame(css, index=block.index, columns=block.columns)
+
+
+def style(df, formats, signed=(), na_rep=None):
+    """Styler with `formats` and sign colors on `signed`, colored in one call per table."""
+    formats = {k: v for k, v in formats.items() if k in df.columns}
+    styler = df.style.format(formats, na_rep=na_rep)
+    signed = [c for c in signed if c in df.columns]
+    if signed:
+        styler = styler.apply(sign_css, subset=signed, axis=None)
+    return styler
+
+
+def rounded(df, formats):
+    """Copy of `df` with each formatted numeric column rounded to the digits it shows."""
+    out = df.copy()
+    for column, fmt in formats.items():
+        digits = decimals(fmt)
+        if column in out.columns and digits is not None and pd.api.types.is_float_dtype(out[column].dtype):
+            out[column] = out[column].round(digits)
+    return out
+
+
+@tracing.traced("render.table")
+def table(df, formats=None, signed=(), na_rep=None, limit=STYLE_CELLS):
+    """(data, number formats) for st.dataframe; see the module notes."""
+    formats = formats or {}
+    if df.size <= limit:
+        return style(df, formats, signed, na_rep), {}
+    number_formats = {c: printf(f) for c, f in formats.items() if c in df.columns and printf(f)}
+    return rounded(df, formats), number_formats
+
+
+def downsample(df, max_points=MAX_POINTS):
+    """About max_points rows of a wide series frame, keeping each column's min and max per bucket.
+
+    Rows are bucketed by position, so the index (usually time) keeps its order.
+    Every series keeps its extremes, so peaks survive that a stride would skip.
+    """
+    n = len(df)
+    if n <= max_points:
+        return df
+    buckets = max(max_points // (2 * max(len(df.columns), 1)), 1)
+    starts = np.unique(np.arange(buckets) * n // buckets)
+    counts = np.diff(np.append(starts, n))
+    values = _numeric(df)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    # Bucket extremes of every column at once; a row stays if it holds the first of any of them
+    for reduce in (np.fmin, np.fmax):
+        hit = values == np.repeat(reduce.reduceat(values, starts, axis=0), counts, axis=0)
+        seen = np.cumsum(hit, axis=0)
+        before = np.repeat(np.vstack([np.zeros((1, hit.shape[1]), dtype=seen.dtype), seen[starts[1:] - 1]]),
+                           counts, axis=0)
+        keep |= (hit & (seen - before == 1)).any(axis=1)
+    return df[keep]
+
+
+def thin(df, max_points=MAX_POINTS, by=None):
+    """The `max_points` rows with the largest |by| (scatter plots of many stocks)."""
+    if len(df) <= max_points:
+        return df
+    if by is None:
+        return df.iloc[np.linspace(0, len(df) - 1, max_points).astype(int)]
+    magnitude = pd.to_numeric(df[by], errors="coerce").abs()
+    return df.loc[magnitude.nlargest(max_points).index]
+
+
+def compact(df, columns=None, digits=4):
+    """Only the plotted columns, floats rounded so the figure JSON stays short."""
+    if columns is not None:
+        df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+    floats = df.select_dtypes("float").columns
+    if len(floats):
+        df = df.assign(**{c: df[c].round(digits) for c in floats})
+    return df
+
+
+def version(df, columns=None):
+    """Fingerprint of the plotted data: the plane version when mapped, else a hash of the values."""
+    plane = df.attrs.get("plane")
+    if plane and columns is None:
+        return plane["version"]
+    if columns is not None:
+        df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+    hashed = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return (df.shape, tuple(map(str, df.columns)), int(hashed.sum()), int((hashed * np.uint64(31)).sum()))
+
+
+class FigureCache:
+    """LRU of built figures keyed by (name, data version)."""
+
+    def __init__(self, size=FIGURE_CACHE):
+        self.size = size
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, df, build, columns=None):
+        key = (name, version(df, columns))
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+        with tracing.span("render.figure"):
+            fig = build(compact(df, columns))
+        with self._lock:
+            self._figures[key] = fig
+            while len(self._figures) > self.size:
+                self._figures.popitem(last=False)
+        return fig
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+
+_figures = FigureCache()
+
+
+def figure(name, df, build, columns=None):
+    """Cached build(compact(df, columns)); `name` must include anything else the figure depends on."""
+    return _figures.get(name, df, build, columns)
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    trend = pd.DataFrame(rng.normal(0, 1, (50000, 5)).cumsum(axis=0), columns=list("ABCDE"))
+    print(f"downsample: {len(trend)} -> {len(downsample(trend, 1000))} rows")
+    data, number_formats = table(trend, {"A": "₹{:.2f}", "B": "{:,}", "C": "{:.2f}%"}, signed=["A"])
+    print(type(data).__name__, number_formats)
@@ -0,0 +1,218 @@
+## Replay mode
+# Drives every data source (Kite quotes, NSE scrapers, candle files) from
+# recorded snapshots against a simulated clock, so the dashboard can run
+# offline and reproducibly.
+'''
+Environment switches:
+TRADE_ANALYST_REPLAY=1          serve all fetchers from recorded snapshots
+TRADE_ANALYST_RECORD=1          save every live response as a snapshot
+TRADE_ANALYST_REPLAY_DIR        snapshot folder (default data/replay)
+TRADE_ANALYST_REPLAY_START      simulated start, e.g. 2025-05-23 09:15:00
+TRADE_ANALYST_REPLAY_SPEED      simulated seconds per wall second (default 60,
+                                0 freezes the clock and skips sleeps)
+
+Snapshots live in <REPLAY_DIR>/<source>/<YYYYmmddTHHMMSS>.json and a read
+returns the latest snapshot at or before the simulated time.
+'''
+
+import os
+import json
+import time
+import bisect
+from datetime import datetime
+
+import pandas as pd
+
+from utils import config
+
+STAMP_FORMAT = "%Y%m%dT%H%M%S"
+QUOTE_TIME_FIELDS = ("last_trade_time", "timestamp")
+
+
+def is_enabled():
+    return os.environ.get("TRADE_ANALYST_REPLAY", "0").lower() in ("1", "true", "yes")
+
+
+def is_recording():
+    return os.environ.get("TRADE_ANALYST_RECORD", "0").lower() in ("1", "true", "yes")
+
+
+def replay_dir():
+    return os.environ.get("TRADE_ANALYST_REPLAY_DIR", config.data_path("replay"))
+
+
+class SimClock:
+    """Simulated clock that runs `speed` times faster than the wall clock.
+
+    A speed of 0 freezes the clock at `start` and turns sleeps into no-ops,
+    which keeps benchmarks and load tests deterministic.
+    """
+
+    def __init__(self, start, speed=60.0):
+        self.start = start
+        self.speed = float(speed)
+        self._origin = time.monotonic()
+
+    def now(self):
+        elapsed = (time.monotonic() - self._origin) * self.speed
+        return self.start + pd.Timedelta(seconds=elapsed).to_pytimedelta()
+
+    def sleep(self, seconds):
+        if self.speed > 0:
+            time.sleep(max(seconds, 0) / self.speed)
+
+    def reset(self, start=None):
+        if start is not None:
+            self.start = start
+        self._origin = time.monotonic()
+
+
+_clock = None
+
+
+def _snapshot_stamps(source):
+    folder = os.path.join(replay_dir(), source)
+    if not os.path.isdir(folder):
+        return []
+    stamps = []
+    for name in os.listdir(folder):
+        if name.endswith(".json"):
+            try:
+                stamps.append(datetime.strptime(name[:-5], STAMP_FORMAT))
+            except ValueError:
+                continue
+    return sorted(stamps)
+
+
+def _first_snapshot_time():
+    root = replay_dir()
+    if not os.path.isdir(root):
+        return None
+    firsts = [s[0] for s in (_snapshot_stamps(src) for src in os.listdir(root)) if s]
+    return min(firsts) if firsts else None
+
+
+def get_clock():
+    """Return the process-wide simulated clock, creating it on first use."""
+    global _clock
+    if _clock is None:
+        start = os.environ.get("TRADE_ANALYST_REPLAY_START")
+        start = pd.Timestamp(start).to_pydatetime() if start else (_first_snapshot_time() or datetime.now())
+        _clock = SimClock(start, float(os.environ.get("TRADE_ANALYST_REPLAY_SPEED", 60)))
+    return _clock
+
+
+def now():
+    """Current time: simulated in replay mode, wall clock otherwise."""
+    return get_clock().now() if is_enabled() else datetime.now()
+
+
+def sleep(seconds):
+    """Sleep that is scaled down by the replay speed in replay mode."""
+    if is_enabled():
+        get_clock().sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def load_snapshot(source, at=None):
+    """Latest recorded payload of `source` at or before `at` (default: now()).
+
+    Raises FileNotFoundError when nothing was recorded by `at`; a later
+    snapshot is never served, since that would leak future data.
+    """
+    stamps = _snapshot_stamps(source)
+    if not stamps:
+        raise FileNotFoundError(f"No recorded snapshots for '{source}' in {replay_dir()}")
+    at = at or now()
+    idx = bisect.bisect_right(stamps, at) - 1
+    if idx < 0:
+        raise FileNotFoundError(f"No '{source}' snapshot recorded at or before {at} (first is {stamps[0]})")
+    stamp = stamps[idx]
+    path = os.path.join(replay_dir(), source, stamp.strftime(STAMP_FORMAT) + ".json")
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def record_snapshot(source, payload, at=None):
+    """Save a live payload so it can be replayed later. No-op unless recording."""
+    if not is_recording():
+        return None
+    folder = os.path.join(replay_dir(), source)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, (at or datetime.now()).strftime(STAMP_FORMAT) + ".json")
+    with open(path, "w") as f:
+        json.dump(payload, f, default=str)
+    return path
+
+
+def visible(df, column="date"):
+    """Hide candle rows that lie in the simulated future."""
+    if not is_enabled() or df.empty:
+        return df
+    stamps = pd.to_datetime(df[column])
+    if getattr(stamps.dt, "tz", None) is not None:
+        stamps = stamps.dt.tz_localize(None)
+    return df[stamps <= pd.Timestamp(now())]
+
+
+class ReplayKite:
+    """Stand-in for KiteConnect that answers quote() from recorded snapshots."""
+
+    source = "kite_quote"
+
+    def quote(self, *instruments):
+        if len(instruments) == 1 and isinstance(instruments[0], (list, tuple)):
+            instruments = instruments[0]
+        snapshot = load_snapshot(self.source)
+        out = {}
+        for key in instruments:
+            q = snapshot.get(str(key))
+            if q is None:
+                continue
+            q = dict(q)
+            for field in QUOTE_TIME_FIELDS:
+                if isinstance(q.get(field), str):
+                    q[field] = pd.Timestamp(q[field]).to_pydatetime()
+            out[str(key)] = q
+        return out
+
+    def ltp(self, *instruments):
+        return {k: {"last_price": v["last_price"]} for k, v in self.quote(*instruments).items()}
+
+    def set_access_token(self, access_token):
+        pass
+
+
+class RecordingKite:
+    """Proxy around a live KiteConnect that records every quote() response."""
+
+    source = "kite_quote"
+
+    def __init__(self, kite):
+        self._kite = kite
+        self._latest = {}
+
+    def quote(self, *args, **kwargs):
+        response = self._kite.quote(*args, **kwargs)
+        # Keep a merged view so each snapshot holds the whole universe seen so far
+        self._latest.update(response)
+        record_snapshot(self.source, self._latest)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self._kite, name)
+
+
+def session(factory):
+    """Build a Kite session honouring replay/record mode."""
+    if is_enabled():
+        return ReplayKite()
+    kite = factory()
+    return RecordingKite(kite) if is_recording() else kite
+
+
+if __name__ == "__main__":
+    print(f"Replay enabled: {is_enabled()}  recording: {is_recording()}")
+    print(f"Snapshot dir: {replay_dir()}")
+    print(f"Simulated now: {get_clock().now()}")
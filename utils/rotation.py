@@ -0,0 +1,191 @@
+## Cross-sectional correlation and sector rotation
+# Builds daily and intraday return matrices for the F&O stocks in the candle
+# store and for every sector in sector_data.json, then computes rolling
+# correlation, relative strength versus NIFTY 50 and rotation rankings with
+# batched NumPy linear algebra.
+'''
+The candle store holds stocks only, so each sector (and the NIFTY 50
+benchmark) is an equal-weighted basket of its constituents:
+sector returns = stock returns @ membership matrix.
+
+Rotation quadrants (RRG style) from RS-Ratio and RS-Momentum, both centred on 100:
+Leading    ratio > 100, momentum > 100
+Weakening  ratio > 100, momentum < 100
+Lagging    ratio < 100, momentum < 100
+Improving  ratio < 100, momentum > 100
+'''
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils import config, schema, tracing
+
+BENCHMARK = "NIFTY 50"
+CORR_WINDOW = {"1d": 10, "30": 26}      # ~2 weeks daily, ~2 sessions of 30-minute bars
+RS_WINDOW = {"1d": 10, "30": 26}
+MOMENTUM_LAG = {"1d": 3, "30": 6}
+
+
+def close_matrix(candles):
+    """date x Symbol matrix of closes."""
+    df = schema.compact_candles(candles)
+    wide = df.pivot_table(index="date", columns="Symbol", values="close", aggfunc="last", observed=True)
+    wide.columns = wide.columns.astype(str)
+    return wide.sort_index().astype("float64")
+
+
+def membership(sector_map, symbols):
+    """Symbol x sector weight matrix; each sector column sums to 1 over known symbols."""
+    symbols = pd.Index(symbols)
+    weights = pd.DataFrame(0.0, index=symbols, columns=list(sector_map))
+    for sector, stocks in sector_map.items():
+        members = symbols.intersection([s["symbol"] for s in stocks])
+        if len(members):
+            weights.loc[members, sector] = 1.0 / len(members)
+    return weights.loc[:, weights.sum() > 0]
+
+
+def sector_returns(stock_returns, weights):
+    """Equal-weighted sector returns; missing stock returns are renormalized away."""
+    values = stock_returns.to_numpy()
+    present = ~np.isnan(values)
+    w = weights.reindex(stock_returns.columns).fillna(0).to_numpy()
+    total = np.nan_to_num(values) @ w
+    coverage = present @ w
+    out = np.where(coverage > 0, total / np.where(coverage > 0, coverage, 1), np.nan)
+    return pd.DataFrame(out, index=stock_returns.index, columns=weights.columns)
+
+
+def rolling_corr(returns, window):
+    """(windows, N, N) correlation matrices for every window ending at each row >= window."""
+    values = returns.to_numpy()
+    if len(values) < window:
+        return np.empty((0, values.shape[1], values.shape[1]))
+    stacks = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)  # (T-w+1, N, w)
+    centred = stacks - np.nanmean(stacks, axis=2, keepdims=True)
+    centred = np.nan_to_num(centred)
+    cov = np.einsum("tiw,tjw->tij", centred, centred) / (window - 1)
+    std = np.sqrt(np.einsum("tii->ti", cov))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / (std[:, :, None] * std[:, None, :])
+
+
+def relative_strength(returns, benchmark, window, lag):
+    """RS-Ratio and RS-Momentum of each column against `benchmark` returns."""
+    growth = (1 + returns.fillna(0)).cumprod()
+    bench = (1 + benchmark.fillna(0)).cumprod()
+    rs = growth.div(bench, axis=0)
+    ratio = 100 * rs / rs.rolling(window, min_periods=1).mean()
+    momentum = 100 * ratio / ratio.shift(lag)
+    return ratio, momentum
+
+
+def quadrant(ratio, momentum):
+    return np.select(
+        [(ratio >= 100) & (momentum >= 100), (ratio >= 100) & (momentum < 100),
+         (ratio < 100) & (momentum < 100)],
+        ["Leading", "Weakening", "Lagging"], "Improving")
+
+
+class RotationEngine:
+    """Caches return/correlation matrices per interval and extends them as bars arrive."""
+
+    def __init__(self, sector_map):
+        self.sector_map = sector_map
+        self.closes = {}
+        self.stock_returns = {}
+        self.sector_returns = {}
+        self.corr = {}
+        self.corr_dates = {}
+
+    @classmethod
+    def from_json(cls, json_path):
+        with open(json_path, "r") as f:
+            return cls(json.load(f))
+
+    @tracing.traced("analytics.rotation.load")
+    def load(self, interval, candles):
+        closes = close_matrix(candles)
+        self.closes[interval] = closes
+        self.stock_returns[interval] = closes.pct_change(fill_method=None).iloc[1:]
+        weights = membership(self.sector_map, closes.columns)
+        self.sector_returns[interval] = sector_returns(self.stock_returns[interval], weights)
+        window = CORR_WINDOW[interval]
+        self.corr[interval] = rolling_corr(self.sector_returns[interval], window)
+        self.corr_dates[interval] = self.sector_returns[interval].index[window - 1:]
+        return self
+
+    @tracing.traced("analytics.rotation.update")
+    def update(self, interval, candles):
+        """Append bars newer than the cached matrix; only the new windows are computed."""
+        if interval not in self.closes:
+            return self.load(interval, candles)
+        old = self.closes[interval]
+        new = close_matrix(candles)
+        new = new[new.index > old.index.max()]
+        if new.empty:
+            return self
+
+        closes = pd.concat([old, new]).sort_index()
+        self.closes[interval] = closes
+        # Returns need one prior row to difference against
+        tail = closes.iloc[len(old) - 1:]
+        fresh = tail.pct_change(fill_method=None).iloc[1:]
+        self.stock_returns[interval] = pd.concat([self.stock_returns[interval].reindex(columns=closes.columns), fresh])
+        weights = membership(self.sector_map, closes.columns)
+        fresh_sector = sector_returns(fresh, weights)
+        self.sector_returns[interval] = pd.concat([self.sector_returns[interval], fresh_sector])
+
+        window = CORR_WINDOW[interval]
+        span = self.sector_returns[interval].iloc[-(len(fresh_sector) + window - 1):]
+        fresh_corr = rolling_corr(span, window)
+        self.corr[interval] = np.concatenate([self.corr[interval], fresh_corr]) if len(self.corr[interval]) else fresh_corr
+        self.corr_dates[interval] = self.sector_returns[interval].index[window - 1:]
+        return self
+
+    def correlation(self, interval, at=-1):
+        """Sector correlation matrix of the window ending at position `at`."""
+        sectors = self.sector_returns[interval].columns
+        if not len(self.corr[interval]):
+            return pd.DataFrame(index=sectors, columns=sectors, dtype="float64")
+        return pd.DataFrame(self.corr[interval][at], index=sectors, columns=sectors)
+
+    def rotation(self, interval):
+        """Latest RS-Ratio, RS-Momentum, quadrant and rank for every sector."""
+        returns = self.sector_returns[interval]
+        if BENCHMARK not in returns.columns:
+            raise ValueError(f"Benchmark '{BENCHMARK}' has no constituents in the candle store")
+        ratio, momentum = relative_strength(returns.drop(columns=BENCHMARK), returns[BENCHMARK],
+                                            RS_WINDOW[interval], MOMENTUM_LAG[interval])
+        table = pd.DataFrame({
+            "RS-Ratio": ratio.iloc[-1],
+            "RS-Momentum": momentum.iloc[-1],
+            "Return %": ((1 + returns.drop(columns=BENCHMARK).iloc[-RS_WINDOW[interval]:]).prod() - 1) * 100,
+        })
+        table["Quadrant"] = quadrant(table["RS-Ratio"], table["RS-Momentum"])
+        table["Rank"] = (table["RS-Ratio"] + table["RS-Momentum"] - 200).rank(ascending=False, method="min")
+        return table.sort_values("Rank").rename_axis("Sector").reset_index()
+
+    def stock_strength(self, interval, window=None):
+        """RS-Ratio of every stock against the NIFTY 50 basket."""
+        returns = self.sector_returns[interval]
+        ratio, momentum = relative_strength(self.stock_returns[interval], returns[BENCHMARK],
+                                            window or RS_WINDOW[interval], MOMENTUM_LAG[interval])
+        return pd.DataFrame({"RS-Ratio": ratio.iloc[-1], "RS-Momentum": momentum.iloc[-1]}).rename_axis("Symbol")
+
+
+def load_bundled(json_path=None, folder=None):
+    folder = folder or config.data_path()
+    engine = RotationEngine.from_json(json_path or os.path.join(folder, "sector_data.json"))
+    for interval in ("1d", "30"):
+        engine.load(interval, schema.load_candles(os.path.join(folder, f"stock_{interval}.csv")))
+    return engine
+
+
+if __name__ == "__main__":
+    engine = load_bundled()
+    print(engine.rotation("1d"))
+    print(engine.correlation("1d").round(2).iloc[:5, :5])
@@ -0,0 +1,199 @@
+## Compact frame schemas
+# Enforces small dtypes on every loader/fetcher: int32 tokens, categorical
+# symbols, float32 prices and datetime64 timestamps/expiries. Kite tokens are
+# all below 2**31, and float32 keeps ~7 significant digits which is exact to
+# the paisa for prices under 1,00,000. Quantities and OI stay 64-bit because
+# they can exceed float32's 16.7M exact-integer range.
+
+import pandas as pd
+
+from utils import quality
+
+TOKEN = "int32"
+PRICE = "float32"
+COUNT = "int64"
+LABEL = "category"
+TIME = "datetime64[ns]"
+
+CANDLE_SCHEMA = {
+    "Symbol": LABEL,
+    "instrument_token": TOKEN,
+    "date": TIME,
+    "open": PRICE,
+    "high": PRICE,
+    "low": PRICE,
+    "close": PRICE,
+    "volume": COUNT,
+}
+
+QUOTE_SCHEMA = {
+    "Symbol": LABEL,
+    "instrument_token": TOKEN,
+    "open": PRICE,
+    "high": PRICE,
+    "low": PRICE,
+    "close": PRICE,
+    "last_price": PRICE,
+    "average_price": PRICE,
+    "buy_quantity": COUNT,
+    "sell_quantity": COUNT,
+    "oi": COUNT,
+    "volume": COUNT,
+    "last_trade_time": TIME,
+}
+
+HISTORIC_SCHEMA = {
+    "symbol": LABEL,
+    "date": TIME,
+    "open": PRICE,
+    "high": PRICE,
+    "low": PRICE,
+    "close": PRICE,
+    "prev_close": PRICE,
+    "total_trade": COUNT,
+    "volume": COUNT,
+    "delivery_qty": COUNT,
+    "delivery_per": PRICE,
+    "vwap": PRICE,
+}
+
+ACTIVE_SCHEMA = {
+    "symbol": LABEL,
+    "lastPrice": PRICE,
+    "%Change": PRICE,
+    "volume": COUNT,
+    "lastUpdateTime": TIME,
+}
+
+SPURTS_SCHEMA = {
+    "symbol": LABEL,
+    "cmp": PRICE,
+    "volume": COUNT,
+    "changeInOI": COUNT,
+    "%changeInOI": PRICE,
+}
+
+INSTRUMENT_SCHEMA = {
+    "instrument_token": TOKEN,
+    "exchange_token": TOKEN,
+    "name": LABEL,
+    "last_price": PRICE,
+    "expiry": TIME,
+    "strike": PRICE,
+    "tick_size": PRICE,
+    "lot_size": TOKEN,
+    "instrument_type": LABEL,
+    "segment": LABEL,
+    "exchange": LABEL,
+}
+
+# Per-leg option-chain fields after json_normalize (prefixed with CE./PE.)
+OPTION_PRICE_FIELDS = ("strikePrice", "lastPrice", "change", "pChange", "bidprice", "askPrice",
+                       "impliedVolatility", "pchangeinOpenInterest", "underlyingValue")
+OPTION_LABEL_FIELDS = ("underlying", "identifier")
+OPTION_TIME_FIELDS = ("expiryDate",)
+
+# NSE date strings that pandas cannot infer on its own
+TIME_FORMATS = {"expiryDate": "%d-%b-%Y", "lastUpdateTime": "%d-%b-%Y %H:%M:%S"}
+
+_savings = {}
+
+
+def _matches(series, dtype):
+    if dtype == TIME:
+        return series.dtype.kind == "M" and getattr(series.dt, "tz", None) is None
+    return str(series.dtype) == dtype
+
+
+def _cast(series, dtype):
+    if dtype == TIME:
+        out = pd.to_datetime(series, format=TIME_FORMATS.get(series.name.split(".")[-1]))
+        return out.dt.tz_localize(None) if out.dt.tz is not None else out
+    if dtype == TOKEN and series.dtype.kind == "f":
+        # Tokens read from CSV arrive as floats such as 3329.0
+        return series.round().astype(TOKEN)
+    if dtype == COUNT and series.isna().any():
+        return series.astype("float64")
+    return series.astype(dtype)
+
+
+def enforce(df, schema, name=None):
+    """Cast the columns of `df` listed in `schema`; unknown columns are kept."""
+    before = df.memory_usage(deep=True).sum()
+    df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed:")])
+    for column, dtype in schema.items():
+        if column in df.columns and not _matches(df[column], dtype):
+            df[column] = _cast(df[column], dtype)
+    if name:
+        _savings[name] = (int(before), int(df.memory_usage(deep=True).sum()))
+    return df
+
+
+def compact_candles(df, name=None):
+    return enforce(df, CANDLE_SCHEMA, name)
+
+
+def compact_quotes(df, name=None):
+    return enforce(df, QUOTE_SCHEMA, name)
+
+
+def compact_active(df, name=None):
+    return enforce(df, ACTIVE_SCHEMA, name)
+
+
+def compact_spurts(df, name=None):
+    return enforce(df, SPURTS_SCHEMA, name)
+
+
+def compact_instruments(df, name=None):
+    return enforce(df, INSTRUMENT_SCHEMA, name)
+
+
+def compact_historic(df, name=None):
+    return enforce(df, HISTORIC_SCHEMA, name)
+
+
+def option_chain_schema(columns):
+    """Schema for a json_normalize()d option chain with the given columns."""
+    schema = {}
+    for column in columns:
+        field = column.split(".", 1)[-1]
+        if field in OPTION_PRICE_FIELDS:
+            schema[column] = PRICE
+        elif field in OPTION_LABEL_FIELDS:
+            schema[column] = LABEL
+        elif field in OPTION_TIME_FIELDS:
+            schema[column] = TIME
+    return schema
+
+
+def compact_option_chain(df, name=None):
+    return enforce(df, option_chain_schema(df.columns), name)
+
+
+def load_candles(path, name=None):
+    """Read a stock_30/stock_1h/stock_1d style file with compact dtypes; bad rows are quarantined."""
+    name = name or path
+    return compact_candles(quality.validate(pd.read_csv(path), "candles", name), name)
+
+
+def load_historic(path, name=None):
+    """Read fno_stocks_historic_data.csv with compact dtypes; bad rows are quarantined."""
+    name = name or path
+    return compact_historic(quality.validate(pd.read_csv(path), "historic", name), name)
+
+
+def memory_savings():
+    """Bytes before/after compaction for every named frame seen so far."""
+    rows = [{"frame": name, "before_mb": b / 2**20, "after_mb": a / 2**20,
+             "saved_pct": 100 * (1 - a / b) if b else 0.0} for name, (b, a) in _savings.items()]
+    return pd.DataFrame(rows, columns=["frame", "before_mb", "after_mb", "saved_pct"])
+
+
+if __name__ == "__main__":
+    from utils import config
+
+    for interval in ("30", "1h", "1d"):
+        load_candles(config.data_path(f"stock_{interval}.csv"))
+    load_historic(config.data_path("fno_stocks_historic_data.csv"))
+    print(memory_savings().round(2))
@@ -0,0 +1,187 @@
+## Screener and watchlists
+# Saved screens are filter expressions (utils/expr.py) over one row per stock
+# that joins quotes and R-Scores, indicators and OI spurts. Every screen is
+# compiled once; a refresh builds the column arrays once and evaluates all
+# screens on them, so dozens of screens over the F&O universe take milliseconds.
+'''
+Screens and watchlists live in data/screens.json:
+{"watchlists": {"Banks": ["HDFCBANK", "ICICIBANK", "SBIN"]},
+ "screens": [{"name": "Momentum", "when": "`R-Score` > 70 and rsi_14_1d < 70",
+              "sort": "R-Score", "limit": 20, "watchlist": null}]}
+
+Universe columns (whichever sources are passed to build_universe):
+quotes      Symbol, Sector, Last Price, Prev Close, % Change, Volume, OI, Buy, Sell
+scores      R-Score, Z-Volume, Z-Turnover, Z-Return
+indicators  <indicator>_<interval>, e.g. rsi_14_1d, ema_stack_30, rel_volume_1h, orb_30
+oi          changeInOI, %changeInOI (stocks in the NSE OI-spurts list, NaN otherwise)
+'''
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from utils import config, expr, tracing
+
+SCREENS_PATH = config.data_path("screens.json")
+
+DEFAULT_SCREENS = [
+    {"name": "R-Score momentum", "when": "`Z-Volume` > 1 and `Z-Turnover` > 1 and `Z-Return` > 0.6",
+     "sort": "R-Score"},
+    {"name": "Breakout with volume", "when": "orb_30 == 1 and rel_volume_30 > 1.5 and `% Change` > 0",
+     "sort": "rel_volume_30"},
+    {"name": "Oversold in uptrend", "when": "rsi_14_1d < 35 and ema_stack_1d >= 1", "sort": "rsi_14_1d",
+     "ascending": True},
+    {"name": "Long buildup", "when": "`%changeInOI` > 5 and `% Change` > 0.5", "sort": "%changeInOI"},
+    {"name": "Short buildup", "when": "`%changeInOI` > 5 and `% Change` < -0.5", "sort": "%changeInOI"},
+]
+
+
+class Screen:
+    """A saved filter expression with its display options."""
+
+    def __init__(self, name, when, sort=None, ascending=False, limit=None, watchlist=None, columns=None):
+        self.name = name
+        self.when = when
+        self.sort = sort
+        self.ascending = ascending
+        self.limit = limit
+        self.watchlist = watchlist
+        self.columns = columns
+        self.condition = expr.compile_expr(when)
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+    def to_dict(self):
+        spec = {"name": self.name, "when": self.when, "sort": self.sort, "ascending": self.ascending,
+                "limit": self.limit, "watchlist": self.watchlist, "columns": self.columns}
+        return {k: v for k, v in spec.items() if v not in (None, False)}
+
+
+def build_universe(cube=None, indicators=None, oi=None):
+    """One row per Symbol from the score cube, an indicator scan and OI spurts."""
+    parts = []
+    if cube is not None and not cube.empty:
+        quotes = cube.reset_index() if "Symbol" not in cube.columns else cube
+        quotes = quotes.drop_duplicates("Symbol").copy()
+        if "Sector" in quotes:
+            # A stock listed in several sectors keeps the first one
+            quotes["Sector"] = quotes["Sector"].astype(str)
+        quotes["Symbol"] = quotes["Symbol"].astype(str)
+        parts.append(quotes.set_index("Symbol"))
+    if indicators is not None and not indicators.empty:
+        ind = indicators.copy()
+        ind.index = ind.index.astype(str)
+        parts.append(ind)
+    if oi is not None and not oi.empty:
+        spurts = oi.assign(Symbol=oi["symbol"].astype(str)).drop_duplicates("Symbol").set_index("Symbol")
+        parts.append(spurts[[c for c in ("changeInOI", "%changeInOI") if c in spurts]])
+    if not parts:
+        return pd.DataFrame(columns=["Symbol"])
+    # Quotes define the universe when present; other sources only add columns
+    universe = parts[0].join(parts[1:], how="left") if len(parts) > 1 else parts[0]
+    universe.index.name = "Symbol"
+    return universe.reset_index()
+
+
+class Screener:
+    """Saved screens and watchlists, evaluated together on one universe."""
+
+    def __init__(self, screens=(), watchlists=None):
+        self.screens = {}
+        self.watchlists = dict(watchlists or {})
+        for screen in screens:
+            self.add(screen)
+
+    def add(self, screen):
+        screen = screen if isinstance(screen, Screen) else Screen.from_dict(screen)
+        self.screens[screen.name] = screen
+        return screen
+
+    def remove(self, name):
+        self.screens.pop(name, None)
+
+    @classmethod
+    def load(cls, path=SCREENS_PATH):
+        """Screener from `path`, or the built-in screens when it does not exist."""
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                saved = json.load(f)
+            return cls(saved.get("screens", []), saved.get("watchlists", {}))
+        return cls(DEFAULT_SCREENS)
+
+    def save(self, path=SCREENS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"watchlists": self.watchlists,
+                       "screens": [s.to_dict() for s in self.screens.values()]}, f, indent=2)
+
+    def _select(self, universe, screen, mask, members):
+        if screen.watchlist:
+            mask = mask & members[screen.watchlist]
+        rows = universe.iloc[np.flatnonzero(mask)]
+        if screen.sort in rows.columns:
+            rows = rows.sort_values(screen.sort, ascending=screen.ascending)
+        if screen.limit:
+            rows = rows.head(screen.limit)
+        if screen.columns:
+            rows = rows[["Symbol"] + [c for c in screen.columns if c in rows.columns and c != "Symbol"]]
+        return rows.reset_index(drop=True)
+
+    @tracing.traced("analytics.screener.run")
+    def run(self, universe, names=None, strict=False):
+        """{screen name: matching rows} for every screen (or `names`) on `universe`.
+
+        Screens that reference a column missing from the universe are skipped
+        with a message, so a screen on indicators still works while OI is down;
+        with strict=True the ExpressionError is raised instead.
+        """
+        screens = [self.screens[n] for n in (names or self.screens) if n in self.screens]
+        columns = set().union(*(s.condition.columns for s in screens)) if screens else set()
+        arrays = expr.column_arrays(universe, columns)
+        symbols = universe["Symbol"].astype(str).to_numpy()
+        members = {name: np.isin(symbols, list(stocks)) for name, stocks in self.watchlists.items()}
+        results = {}
+        for screen in screens:
+            if screen.watchlist and screen.watchlist not in members:
+                if strict:
+                    raise expr.ExpressionError(f"no watchlist '{screen.watchlist}'")
+                print(f"Screen '{screen.name}' skipped: no watchlist '{screen.watchlist}'")
+                continue
+            try:
+                mask = screen.condition.evaluate(arrays, len(universe))
+            except expr.ExpressionError as e:
+                if strict:
+                    raise
+                print(f"Screen '{screen.name}' skipped: {e}")
+                continue
+            results[screen.name] = self._select(universe, screen, mask, members)
+        return results
+
+
+def screen(universe, when, **options):
+    """Rows of `universe` matching an ad-hoc expression; raises expr.ExpressionError if it cannot run."""
+    return Screener([Screen("adhoc", when, **options)]).run(universe, strict=True)["adhoc"]
+
+
+if __name__ == "__main__":
+    import time
+    from utils import indicators as ind
+
+    scan = ind.load_bundled().scan()
+    rng = np.random.default_rng(0)
+    quotes = pd.DataFrame({"Symbol": scan.index.astype(str), "% Change": rng.normal(0, 1.5, len(scan)),
+                           "R-Score": rng.uniform(0, 100, len(scan)), "Z-Volume": rng.normal(0, 1, len(scan)),
+                           "Z-Turnover": rng.normal(0, 1, len(scan)), "Z-Return": rng.normal(0, 1, len(scan))})
+    universe = build_universe(quotes, scan)
+    screener = Screener(DEFAULT_SCREENS[:3] + [
+        {"name": f"screen {i}", "when": f"`R-Score` > {i} and rsi_14_1d < {40 + i}", "sort": "R-Score", "limit": 20}
+        for i in range(50)])
+    start = time.perf_counter()
+    results = screener.run(universe)
+    print(f"{len(results)} screens over {len(universe)} stocks in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for name in list(results)[:3]:
+        print(name, results[name]["Symbol"].tolist()[:10])
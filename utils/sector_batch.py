@@ -0,0 +1,166 @@
+## Batch sector scoring
+# Scores every sector in sector_data.json in one run: the candle history is
+# loaded and aggregated once, quotes for the whole universe are fetched in a
+# few batched calls, and R-Score work can be spread across a process pool. The
+# result is a (Sector, Symbol) score cube that pages slice without refetching.
+'''
+R-Score depends only on a stock's own history, so a stock listed in several
+sectors is scored once (by the first sector that lists it) and its row is
+shared by every sector in the cube.
+
+python -m utils.sector_batch                  # all sectors, default pool size
+python -m utils.sector_batch --workers 1      # serial, e.g. for profiling
+
+score_all() is serial unless asked for workers (the CLI and the data-plane
+producer do), and even then only pools histories of POOL_MIN_ROWS rows or more:
+below that, starting the pool costs more than it saves (the full F&O universe
+scores faster serially).
+'''
+
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils import config, fetch, quality, schema, sectorial_stock, tracing
+
+JSON_PATH = config.data_path("sector_data.json")
+QUOTE_BATCH = 500        # instruments per kite.quote() call
+POOL_MIN_ROWS = 250_000  # candle rows below which score_all() stays serial
+AGG_COLUMNS = ['Symbol', 'instrument_token', 'date', 'open', 'high', 'low', 'close', 'volume']
+SECTOR_COLUMNS = ["Symbol", "Last Price", "Prev Close", "% Change", "Volume", "OI", "Buy", "Sell",
+                  "R-Score", "Z-Volume", "Z-Turnover", "Z-Return", "Last Trade Time"]
+
+
+@tracing.traced("fetch.sector_quotes")
+def get_quotes(kite, stocks, batch=QUOTE_BATCH):
+    """get_data() rows for `stocks`, QUOTE_BATCH instruments per quote call (partial on failure)."""
+    symbols = {int(s["instrument_token"]): s["symbol"] for s in stocks}
+    quotes, status = fetch.kite_quotes(kite, list(symbols), batch=batch)
+    rows = [sectorial_stock.quote_row(symbol, token, quotes[str(token)])
+            for token, symbol in symbols.items() if str(token) in quotes]
+    df = schema.compact_quotes(quality.validate(pd.DataFrame(rows), "quotes", "kite_quotes"), "kite_quotes")
+    status.insert(0, "Symbol", status["key"].map(symbols))
+    df.attrs["fetch_status"] = status
+    return df
+
+
+def _score_tokens(task):
+    """Pool worker: R-Scores for one sector's share of the combined history."""
+    sector, combined, min_days = task
+    if combined.empty:
+        return sector, pd.DataFrame()
+    return sector, sectorial_stock.calculate_r_score(combined, min_days)
+
+
+def assign(sector_map):
+    """{sector: [tokens it scores]}; each token belongs to the first sector listing it."""
+    seen, owned = set(), {}
+    for sector, stocks in sector_map.items():
+        tokens = [int(s["instrument_token"]) for s in stocks if int(s["instrument_token"]) not in seen]
+        seen.update(tokens)
+        owned[sector] = tokens
+    return owned
+
+
+@tracing.traced("analytics.sector_batch.score_all")
+def score_all(kite, json_path=JSON_PATH, min_days=18, history_path=sectorial_stock.HISTORY_PATH,
+              workers=1, sectors=None):
+    """Score cube indexed by (Sector, Symbol) with the get_sector_data() columns.
+
+    workers=None uses one process per CPU; small histories are scored serially regardless.
+    """
+    with open(json_path, "r") as f:
+        sector_map = json.load(f)
+    if sectors is not None:
+        sector_map = {name: sector_map[name] for name in sectors if name in sector_map}
+
+    # Shared preprocessing, done once for every sector
+    universe = list({int(s["instrument_token"]): s for stocks in sector_map.values() for s in stocks}.values())
+    historical_data = sectorial_stock.add_prev_data(schema.load_candles(history_path))
+    today_data = get_quotes(kite, universe)
+    status = today_data.attrs.get("fetch_status")
+    if today_data.empty:
+        cube = pd.DataFrame(columns=SECTOR_COLUMNS[1:], index=pd.MultiIndex.from_arrays([[], []], names=["Sector", "Symbol"]))
+        cube.attrs["fetch_status"] = status
+        return cube
+    today_data['instrument_token'] = today_data['instrument_token'].astype(int)
+    combined = pd.concat([historical_data, today_data[AGG_COLUMNS]], ignore_index=True)
+    combined = quality.validate(combined, "daily", "r_score_input")
+    combined['instrument_token'] = combined['instrument_token'].astype(int)
+
+    by_token = combined.groupby('instrument_token', sort=False).indices
+    tasks = []
+    for sector, tokens in assign(sector_map).items():
+        rows = [by_token[t] for t in tokens if t in by_token]
+        part = combined.iloc[sorted(i for r in rows for i in r)].reset_index(drop=True) if rows else combined.iloc[:0]
+        tasks.append((sector, part, min_days))
+
+    if workers == 1 or len(tasks) < 2 or len(combined) < POOL_MIN_ROWS:
+        results = [_score_tokens(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_score_tokens, tasks))
+    scored = [df for _, df in results if not df.empty]
+    r_scores = pd.concat(scored, ignore_index=True) if scored else pd.DataFrame(
+        columns=['instrument_token', 'r_score', 'z_volume', 'z_turnover', 'z_return'])
+    cube = build_cube(sector_map, today_data, r_scores)
+    cube.attrs["fetch_status"] = status
+    return cube
+
+
+def build_cube(sector_map, today_data, r_scores):
+    """Join quotes and R-Scores to every (sector, stock) pair."""
+    stocks = pd.DataFrame(
+        [(sector, s["symbol"], int(s["instrument_token"])) for sector, members in sector_map.items() for s in members],
+        columns=["Sector", "Symbol", "instrument_token"])
+    today = today_data.drop(columns=["Symbol"]).drop_duplicates("instrument_token")
+    cube = stocks.merge(today, on="instrument_token", how="inner").merge(
+        r_scores[['instrument_token', 'r_score', 'z_volume', 'z_turnover', 'z_return']],
+        on="instrument_token", how="left")
+    close = cube["close"].astype("float64")
+    cube = cube.assign(**{
+        "Last Price": cube["last_price"],
+        "Prev Close": cube["close"],
+        "% Change": ((cube["last_price"] - close) / close * 100).round(2),
+        "Volume": cube["volume"],
+        "OI": cube["oi"],
+        "Buy": cube["buy_quantity"],
+        "Sell": cube["sell_quantity"],
+        "R-Score": cube["r_score"],
+        "Z-Volume": cube["z_volume"],
+        "Z-Turnover": cube["z_turnover"],
+        "Z-Return": cube["z_return"],
+        "Last Trade Time": cube["last_trade_time"],
+    })
+    cube["Sector"] = pd.Categorical(cube["Sector"], categories=list(sector_map))
+    return cube.set_index(["Sector", "Symbol"])[SECTOR_COLUMNS[1:]].sort_index()
+
+
+def sector_view(cube, sector):
+    """One sector in the get_sector_data() shape."""
+    if sector not in cube.index.get_level_values("Sector"):
+        return pd.DataFrame(columns=SECTOR_COLUMNS)
+    return cube.xs(sector, level="Sector").reset_index()
+
+
+def stock_view(cube, symbol):
+    """Every sector a stock belongs to, with its scores."""
+    return cube.xs(symbol, level="Symbol").reset_index()
+
+
+def score_matrix(cube, value="R-Score"):
+    """Sector x stock matrix of one column (NaN where a stock is not a member)."""
+    return cube[value].unstack("Symbol")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every sector in sector_data.json")
+    parser.add_argument("--json", default=JSON_PATH)
+    parser.add_argument("--history", default=sectorial_stock.HISTORY_PATH)
+    parser.add_argument("--workers", type=int, help="processes (default one per CPU)")
+    args = parser.parse_args()
+
+    cube = score_all(sectorial_stock.gen_ses(), args.json, history_path=args.history, workers=args.workers)
+    print(cube.groupby(level="Sector", observed=True)["R-Score"].describe().round(2))
@@ -1,17 +1,12 @@
-from kiteconnect import KiteConnect
 import pandas as pd
 import json
-import time
-from datetime import datetime, timedelta
+from utils import replay, tracing, schema, kite_session, fetch, config, quality
 
 def gen_ses():
-    """Generate KiteConnect session"""
-    with open(r"kite\data\api.txt", "r") as f:
-        key = f.read().split()
-    kite = KiteConnect(api_key=key[0])
-    kite.set_access_token(key[2])
-    return kite
+    """Generate KiteConnect session (replayed from snapshots in replay mode)"""
+    return kite_session.gen_ses()
 
+@tracing.traced("analytics.calculate_r_score")
 def calculate_r_score(df, min_days=18):
     """
     Enhanced R-Score calculation combining both approaches
@@ -73,6 +68,7 @@ def calculate_r_score(df, min_days=18):
     
     return pd.DataFrame(results)
 
+@tracing.traced("analytics.add_prev_data")
 def add_prev_data(data):
     """
     Aggregate 1-minute data for each day up to the current intraday time (e.g., 12:28).
@@ -84,8 +80,11 @@ def add_prev_data(data):
     data['time'] = data['date'].dt.time
     data['day'] = data['date'].dt.date
 
+    # Hide candles from the simulated future when replaying
+    data = replay.visible(data)
+
     # Set the intraday cutoff time (now or simulated)
-    now = datetime.now()
+    now = replay.now()
     current_cutoff_time = now.time()
     
     # for backtesting
@@ -115,45 +114,52 @@ def add_prev_data(data):
 
     return agg_data
 
+def quote_row(symbol, token, q):
+    """Flatten one kite.quote() entry into a get_data() row."""
+    return {
+        'Symbol': symbol,
+        'instrument_token': token,
+        'date': q['last_trade_time'].date(),
+        'open': q['ohlc']['open'],
+        'high': q['ohlc']['high'],
+        'low': q['ohlc']['low'],
+        'close': q['ohlc']['close'],
+        'last_price': q['last_price'],
+        'average_price': q.get('average_price'),
+        'buy_quantity': q['buy_quantity'],
+        'sell_quantity': q['sell_quantity'],
+        'oi': q['oi'],
+        'volume': q['volume'],
+        'last_trade_time': q['last_trade_time']
+    }
+
+@tracing.traced("fetch.kite_quotes")
 def get_data(kite,l):
-    stocks = pd.read_csv(r"data\data_stock_fo.csv")
+    """Quotes for the stocks in `l`; df.attrs["fetch_status"] holds one status row per stock."""
     stocks = pd.DataFrame(l)
     all_rows = []
-    
-    for _, stock in stocks.iterrows():
-        token = int(stock["instrument_token"])
-        symbol = stock["symbol"]
+    symbols = dict(zip(stocks["instrument_token"].astype(int), stocks["symbol"]))
+    quotes, status = fetch.kite_quotes(kite, list(symbols))
 
+    for token, symbol in symbols.items():
+        q = quotes.get(str(token))
+        if q is None:
+            continue
         try:
-            quote = kite.quote([token])
-            q = quote[str(token)]
-
-            row = {
-                'Symbol': symbol,
-                'instrument_token': token,
-                'date': q['last_trade_time'].date(),
-                'open': q['ohlc']['open'],
-                'high': q['ohlc']['high'],
-                'low': q['ohlc']['low'],
-                'close': q['ohlc']['close'],
-                'last_price': q['last_price'],
-                'buy_quantity': q['buy_quantity'],
-                'sell_quantity': q['sell_quantity'],
-                'oi': q['oi'],                
-                'volume': q['volume'],
-                'last_trade_time': q['last_trade_time']
-            }
-
-            all_rows.append(row)
-
+            all_rows.append(quote_row(symbol, token, q))
         except Exception as e:
             print(f"Error fetching data for {symbol} - {e}")
+            status.loc[status["key"] == token, ["status", "error"]] = ["error", str(e)]
 
-        time.sleep(0.35)
-    df = pd.DataFrame(all_rows)
+    df = schema.compact_quotes(quality.validate(pd.DataFrame(all_rows), "quotes", "kite_quotes"), "kite_quotes")
+    status.insert(0, "Symbol", status["key"].map(symbols))
+    df.attrs["fetch_status"] = status
     return df
 
-def get_sector_data(kite, sector_name, json_path, min_days=18):
+HISTORY_PATH = config.data_path('stock_1.csv')
+
+@tracing.traced("analytics.get_sector_data")
+def get_sector_data(kite, sector_name, json_path, min_days=18, history_path=HISTORY_PATH):
     
     with open(json_path, "r") as f:
         sector_map = json.load(f)
@@ -165,14 +171,19 @@ def get_sector_data(kite, sector_name, json_path, min_days=18):
     all_data = []
     
     # First collect all historical data
-    historical_data = pd.read_csv(r'data\stock_1.csv')
+    historical_data = schema.load_candles(history_path)
     historical_data = add_prev_data(historical_data)
     today_data = get_data(kite,stocks)
+    status = today_data.attrs.get("fetch_status")
+    if today_data.empty:
+        empty = pd.DataFrame()
+        empty.attrs["fetch_status"] = status
+        return empty
    #print(today_data)
     today_data['instrument_token'] = today_data['instrument_token'].astype(int)
     # Prepare today's data for R-score calculation (without extra columns)
     today_agg = today_data[['Symbol', 'instrument_token', 'date', 'open', 'high', 'low', 'close', 'volume']].copy()
-    combined = pd.concat([historical_data, today_agg], ignore_index=True)
+    combined = quality.validate(pd.concat([historical_data, today_agg], ignore_index=True), "daily", "r_score_input")
     
     # Calculate R-Scores in one go
     if not combined.empty:
@@ -186,7 +197,9 @@ def get_sector_data(kite, sector_name, json_path, min_days=18):
         today_row = today_data[today_data["instrument_token"] == token]
         #print(today_row,"type: ",type(today_row))
         if today_row.empty:
-            raise ValueError(f"No data for token: {token} ({symbol})")
+            # Partial result: the page shows the stocks that did load
+            print(f"No data for token: {token} ({symbol})")
+            continue
         
         try:
             
@@ -225,13 +238,15 @@ def get_sector_data(kite, sector_name, json_path, min_days=18):
         except Exception as e:
             print(f"Error processing {symbol}: {str(e)}")
     
-    return pd.DataFrame(all_data)
+    result = pd.DataFrame(all_data)
+    result.attrs["fetch_status"] = status
+    return result
 if __name__ == "__main__":
     kite = gen_ses()
     print("Kite session active.")
 
     sector = input("Enter the Sector Ex: NIFTY 50, NIFTY FMCG  : ")
-    json_path = r"data/sector_data.json"
+    json_path = config.data_path("sector_data.json")
 
     df = get_sector_data(kite, sector, json_path)
     
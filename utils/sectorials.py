@@ -1,46 +1,41 @@
-from kiteconnect import KiteConnect
 import pandas as pd
-import time
+from utils import tracing, kite_session, config, fetch
 
 def gen_ses():
-    key = open(r"kite\data\api.txt","r").read().split()
-    kite = KiteConnect(api_key=key[0])
-    kite.set_access_token(key[2])
-    return kite
+    return kite_session.gen_ses()
 
-def sectorials():
-    kite = gen_ses()
-    print("Kite Session Generated")
-    
-    sect_data = pd.read_csv(r'kite\data\data_sect.csv')  # Read sector data
+@tracing.traced("fetch.sector_indices")
+def sectorials(kite):
+    """LTP and % change of every sector index in one batched quote call.
+
+    Indices that could not be fetched are left out; df.attrs["fetch_status"] holds one status row per index.
+    """
+    sect_data = pd.read_csv(config.data_path('data_sect.csv'))  # Read sector data
+    names = dict(zip(sect_data['instrument_token'].astype(int), sect_data['name']))
+    quotes, status = fetch.kite_quotes(kite, list(names))
     all_quotes = []
 
-    for _, row in sect_data.iterrows():
-        instrument_token = row['instrument_token']
-        tradingsymbol = row['name']
-        try:
-            quote = kite.quote(instrument_token)
-            instrument_quote = quote[str(instrument_token)]
+    for instrument_token, tradingsymbol in names.items():
+        instrument_quote = quotes.get(str(instrument_token))
+        if instrument_quote is None:
+            continue
+        last_price = instrument_quote.get('last_price', 0)
+        prev_close = instrument_quote.get('ohlc', {}).get('close', 0)
+        change_pct = ((last_price - prev_close) / prev_close) * 100 if prev_close else 0
 
-            last_price = instrument_quote.get('last_price', 0)
-            prev_close = instrument_quote.get('ohlc', {}).get('close', 0)
-            change_pct = ((last_price - prev_close) / prev_close) * 100 if prev_close else 0
-            
-            all_quotes.append({
-                'Index': tradingsymbol,
-                'LTP': last_price,
-                '% Change': round(change_pct, 2),
-                'net_change': instrument_quote.get('net_change', 0)
-                #'volume': instrument_quote.get('volume', 0)
-            })
-            time.sleep(1)  # Respect rate limit
-        except Exception as e:
-            print(f"Error fetching {instrument_token} - {tradingsymbol}: {str(e)}")
-            time.sleep(1)  # Sleep even on failure
+        all_quotes.append({
+            'Index': tradingsymbol,
+            'LTP': last_price,
+            '% Change': round(change_pct, 2),
+            'net_change': instrument_quote.get('net_change', 0)
+            #'volume': instrument_quote.get('volume', 0)
+        })
 
-    df = pd.DataFrame(all_quotes)
+    df = pd.DataFrame(all_quotes, columns=['Index', 'LTP', '% Change', 'net_change'])
+    status.insert(0, "Symbol", status["key"].map(names))
+    df.attrs["fetch_status"] = status
     return df
 
 if __name__ == "__main__":
-    data = sectorials()
+    data = sectorials(gen_ses())
     print(data.head())
\ No newline at end of file
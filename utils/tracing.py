@@ -0,0 +1,131 @@
+## Hot-path tracing
+# Lightweight spans around fetchers, rate-limit waits, retries and analytics.
+# Each span name keeps a latency histogram that the dashboard's hidden
+# Diagnostics page and export() read from.
+
+import json
+import time
+import threading
+import functools
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram upper bounds in milliseconds (last bucket is open ended)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, float("inf"))
+RECENT_SAMPLES = 512
+
+
+class SpanStats:
+    """Latency histogram for one span name."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, ms, error=False):
+        self.count += 1
+        self.errors += int(error)
+        self.total_ms += ms
+        self.min_ms = min(self.min_ms, ms)
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+        self.recent.append(ms)
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min_ms, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {("inf" if b == float("inf") else str(b)): n for b, n in zip(BUCKETS_MS, self.buckets)},
+        }
+
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def record(name, seconds, error=False):
+    """Add one observation of `seconds` to span `name`."""
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = SpanStats()
+        stats.add(seconds * 1000, error)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block under `name`."""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - start, error)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def traced_sleep(name, seconds, sleeper=time.sleep):
+    """Sleep through `sleeper` and record the wait under `name`."""
+    with span(name):
+        sleeper(seconds)
+
+
+def snapshot():
+    """{span name: stats dict} for every span seen so far."""
+    with _lock:
+        return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+def to_frame():
+    """Summary table of all spans, slowest total time first."""
+    import pandas as pd
+    rows = [{"span": name, **{k: v for k, v in s.items() if k != "buckets"}} for name, s in snapshot().items()]
+    if not rows:
+        return pd.DataFrame(columns=["span", "count", "errors", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms"])
+    return pd.DataFrame(rows).sort_values("total_ms", ascending=False).reset_index(drop=True)
+
+
+def export(path=None):
+    """Machine-readable JSON export; written to `path` when given."""
+    payload = json.dumps({"generated_at": time.time(), "buckets_ms": [str(b) for b in BUCKETS_MS],
+                          "spans": snapshot()}, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(payload)
+    return payload
+
+
+def reset():
+    with _lock:
+        _stats.clear()